@@ -0,0 +1,69 @@
+"""Time the BVH over a million boxes.
+
+Run from the root of the repository:
+
+    python benchmarks/bench_bvh.py [count]
+
+It builds a BVH over `count` small random boxes (a million by default), refits
+it after every box has moved, and reports the throughput of box queries, ray
+queries and the enumeration of every overlapping pair. It needs numpy; the
+pure python tree is much too slow for a million boxes.
+"""
+import sys
+import os
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from geometry.core import numpy
+from geometry.spatial import BVH
+
+COUNT = 10 ** 6
+QUERIES = 10 ** 4
+RAYS = 10 ** 4
+
+
+def random_boxes(random, count, size):
+    """boxes in a unit cube, each about `size` wide"""
+    lowers = random.random((count, 3))
+    uppers = lowers + random.random((count, 3)) * size
+    return lowers, uppers
+
+
+def timed(function):
+    start = timeit.default_timer()
+    result = function()
+    return timeit.default_timer() - start, result
+
+
+def main():
+    if numpy is None:
+        print('numpy is not installed')
+        return
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else COUNT
+    random = numpy.random.default_rng(0)
+    # about ten boxes across each axis of a box
+    size = 2.0 / count ** (1 / 3.0)
+    boxes = random_boxes(random, count, size)
+    seconds, tree = timed(lambda: BVH(boxes))
+    print('%-10s %12.3f s   %d nodes' % ('build', seconds, len(tree.starts)))
+    lowers, uppers = boxes
+    shift = random.random((count, 3)) * size * 0.1
+    seconds, _ = timed(lambda: tree.refit((lowers + shift, uppers + shift)))
+    print('%-10s %12.3f s' % ('refit', seconds))
+    queries = random_boxes(random, QUERIES, size * 2)
+    seconds, (found, _) = timed(lambda: tree.overlapping_many(queries))
+    print('%-10s %12.0f /s  %.1f boxes each' % ('boxes', QUERIES / seconds,
+        len(found) / float(QUERIES)))
+    origins = random.random((RAYS, 3))
+    directions = random.standard_normal((RAYS, 3))
+    seconds, (rays, _, _) = timed(lambda: tree.rays(origins, directions,
+        limit=0.1))
+    print('%-10s %12.0f /s  %.1f boxes each' % ('rays', RAYS / seconds,
+        len(rays) / float(RAYS)))
+    seconds, (first, _) = timed(tree.pairs)
+    print('%-10s %12.3f s   %d pairs' % ('pairs', seconds, len(first)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Compare the numpy and pure python Matrix backends.
+
+Run from the root of the repository:
+
+    python benchmarks/bench_matrix.py
+
+For each size it times the product, sum, difference, scalar product and
+transpose with both backends, and checks that both give the same results.
+The pure python product of two 512x512 matrices takes a while.
+"""
+import sys
+import os
+import random
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from geometry import matrix
+from geometry.matrix import Matrix
+
+SIZES = (4, 64, 512)
+
+OPERATIONS = [
+        ('product', lambda a, b: a * b),
+        ('add', lambda a, b: a + b),
+        ('sub', lambda a, b: a - b),
+        ('scalar', lambda a, b: a * 2.5),
+        ('transpose', lambda a, b: a.transpose()),
+        ]
+
+
+def random_table(size):
+    return [[random.uniform(-1, 1) for j in range(size)] for i in range(size)]
+
+
+def run(operation, a, b, numpy):
+    """time one operation with one backend. Each matrix is rebuilt from its
+    table so that no cached array is reused between backends."""
+    matrix.numpy = numpy
+    a = Matrix(a)
+    b = Matrix(b)
+    if a.rows() >= 512:
+        # too slow in pure python to repeat
+        start = timeit.default_timer()
+        result = operation(a, b)
+        return timeit.default_timer() - start, result.table
+    number = max(1, 20000 // a.rows() ** 2)
+    seconds = min(timeit.repeat(lambda: operation(a, b), number=number,
+        repeat=3)) / number
+    return seconds, operation(a, b).table
+
+
+def main():
+    numpy = matrix.numpy
+    if numpy is None:
+        print('numpy is not installed, so there is nothing to compare')
+        return
+    random.seed(0)
+    print('%-10s %6s %14s %14s %9s %12s' % ('operation', 'size', 'numpy (s)',
+        'python (s)', 'speedup', 'max diff'))
+    for size in SIZES:
+        a, b = random_table(size), random_table(size)
+        for name, operation in OPERATIONS:
+            fast, fast_result = run(operation, a, b, numpy)
+            slow, slow_result = run(operation, a, b, None)
+            difference = max(abs(x - y) for r, s in zip(fast_result,
+                slow_result) for x, y in zip(r, s))
+            print('%-10s %6s %14.6f %14.6f %8.1fx %12.2e' % (name, size, fast,
+                slow, slow / fast, difference))
+    matrix.numpy = numpy
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Memory and throughput benchmark for the Vector and Point classes.
+
+Run from the root of the repository:
+
+    python benchmarks/bench_vectors.py
+
+It prints the memory used per instance (measured with tracemalloc, including
+the instance's coordinate storage) and the number of operations per second
+for the common vector operations. Each class is compared with a copy of it
+that keeps its coordinates in an instance `__dict__` instead of `__slots__`,
+which is how vectors and points stored them before.
+"""
+import sys
+import os
+import types
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from geometry import Vector2d, Vector3d, Point2d, Point3d
+
+
+def footprint(cls, args, number=100000):
+    """the average number of bytes allocated per instance"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    instances = [cls(*args) for i in range(number)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # don't count the list holding the instances
+    return (after - before - sys.getsizeof(instances)) / float(number)
+
+
+def with_dict(cls):
+    """a copy of a vector class with the same methods, but whose instances
+    keep their coordinates in a `__dict__`"""
+    namespace = {}
+    for base in reversed(cls.__mro__[:-1]):
+        for key, value in vars(base).items():
+            if key in ('__slots__', '__dict__', '__weakref__') or isinstance(
+                    value, types.MemberDescriptorType):
+                continue
+            namespace[key] = value
+    return type(cls.__name__ + 'WithDict', (object,), namespace)
+
+
+def throughput(statement, cls, args, number=200000):
+    """operations per second, best of three runs"""
+    names = {'cls': cls, 'a': cls(*args), 'b': cls(*args[::-1])}
+    best = min(timeit.repeat(statement, number=number, repeat=3,
+        globals=names))
+    return number / best
+
+
+OPERATIONS = [
+        ('construct', 'cls(1.5, 2.5, 3.5)'),
+        ('attribute', 'a.x; a.y; a.z'),
+        ('add', 'a + b'),
+        ('sub', 'a - b'),
+        ('scale', 'a * 2.0'),
+        ('dot', 'a.dot(b)'),
+        ('length', 'a.length'),
+        ('cross', 'a.cross(b)'),
+        ('hash', 'hash(a)'),
+        ]
+
+
+def main():
+    for cls in (Vector2d, Point2d, Vector3d, Point3d):
+        dim = 3 if issubclass(cls, Vector3d) else 2
+        args = (1.5, 2.5, 3.5)[:dim]
+        reference = with_dict(cls)
+        sizes = footprint(reference, args), footprint(cls, args)
+        print('%s: %.1f bytes per instance with __dict__, %.1f with '
+                '__slots__' % ((cls.__name__,) + sizes))
+        print('    %-10s %14s %14s %8s' % ('ops/sec', '__dict__', '__slots__',
+            'speedup'))
+        for name, statement in OPERATIONS:
+            if dim == 2:
+                if name == 'cross':
+                    continue
+                statement = statement.replace('; a.z', '').replace(
+                        ', 3.5', '')
+            before = throughput(statement, reference, args)
+            after = throughput(statement, cls, args)
+            print('    %-10s %14.0f %14.0f %7.2fx' % (name, before, after,
+                after / before))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,10 @@
+from .core import (
+        Tolerance,
+        )
 from .intervals import (
         Interval,
         Scale,
+        IntervalTree,
 )
 from .boxes import (
         Box2d,
@@ -17,6 +21,10 @@ from .vector3d import (
         WorldY,
         WorldZ
 )
+from .vectors import (
+        Vector2dArray,
+        Vector3dArray,
+)
 from .point2d import (
         Point2d,
 )
@@ -26,12 +34,29 @@ from .point3d import (
 from .points import (
         PointSet,
         )
+from .pointfile import (
+        PointFile,
+        )
 from .matrix import (
         Matrix,
         MatrixError,
 )
+from .sparse import (
+        SparseMatrix,
+)
+from .transform import (
+        Transform2d,
+        Transform3d,
+)
 from .plane import (
         Plane3d,
+        PlaneSet,
+        )
+from .mesh import (
+        WingedEdgeMesh,
+        )
+from .delaunay import (
+        Delaunay2d,
         )
 from .line import (
         Line3d,
@@ -39,8 +64,10 @@ from .line import (
         )
 
 __all__ = [
+        'Tolerance',
         'Interval',
         'Scale',
+        'IntervalTree',
         'Box2d',
         'Box3d',
         'Vector2d',
@@ -48,15 +75,24 @@ __all__ = [
         'Point2d',
         'Point3d',
         'PointSet',
+        'PointFile',
         'PageX',
         'PageY',
         'WorldX',
         'WorldY',
-        'WorldZ'
+        'WorldZ',
+        'Vector2dArray',
+        'Vector3dArray',
         'Matrix',
+        'SparseMatrix',
+        'Transform2d',
+        'Transform3d',
         'Line3d',
         'LineSegment2d',
         'Plane3d',
+        'PlaneSet',
+        'WingedEdgeMesh',
+        'Delaunay2d',
         ]
 
 
@@ -1,46 +1,319 @@
+"""This module contains axis-aligned bounding boxes.
+
+A box is one Interval for each axis, so like intervals, boxes are half-open:
+a point is inside a box if each of its coordinates is at least the start of
+the interval for that axis and less than its end.
+
+Boxes can be initialized with:
+    width/height/depth - a box with one corner at the origin
+    intervals          - see `fromIntervals`
+    two corner points  - see `fromCorners`
+    points             - the bounds of a PointSet, a vector array, a numpy
+                         array, a list of points or a mesh, see `fromPoints`
+
+Bounds are found with a single vectorized min/max pass over packed
+coordinates. Because boxes are half-open, the end of each interval of a
+bounding box is the next float after the largest coordinate, so that the box
+contains every one of its points.
+
+Boxes can be combined with `union` (|) and `intersection` (&), grown or
+shrunk with `expand`, and tested against points and other boxes with
+`contains` and `overlaps`, which also take many points or boxes at once and
+return a boolean mask.
+
+Like intervals, boxes can be divided into a grid of smaller boxes with
+`divide`, which gives a lazy BoxGrid.
+"""
+import numbers
+import struct
+from functools import reduce
+from operator import mul
+
+from .core import numpy
 from .point2d import Point2d
 from .point3d import Point3d
+from .vector import VectorBase
+from .vectors import pack
 from .intervals import Interval, Scale
 
-"""
-increase to encompass a point
-increase/decrease by a margin
-addition between two boxes
-boolean operations?
-two corner points
-initialized with:
-    intervals
-    interval tuples
-    width/height/depth
-    points
-    arbitrary geometry
-"""
 
-class Box2d(object):
+def _above(value):
+    """the next float after a number. Positive floats are ordered like the
+    integers with the same bits, and negative floats the other way."""
+    value = float(value)
+    if value != value or value == float('inf'):
+        return value
+    if value == 0:
+        return 5e-324
+    bits = struct.unpack('<q', struct.pack('<d', value))[0]
+    bits += 1 if value > 0 else -1
+    return struct.unpack('<d', struct.pack('<q', bits))[0]
+
+
+def _columns(values, dim):
+    """the first `dim` coordinates of some points, as one sequence for each
+    axis: numpy arrays, or slices of an `array('d')`"""
+    if hasattr(values, 'vertices'):
+        # meshes
+        values = values.vertices
+    if hasattr(values, 'asArray'):
+        values = values.asArray()
+    width = getattr(values, 'dim', None)
+    if width is None and numpy is not None and isinstance(values,
+            numpy.ndarray) and values.ndim == 2:
+        width = values.shape[1]
+    width = width or dim
+    data = pack(values, width)
+    if numpy is not None:
+        rows = data.reshape(-1, width)
+        return [rows[:, k] for k in range(dim)]
+    return [data[k::width] for k in range(dim)]
+
+
+def bounds(values, dim=3):
+    """Get the smallest and largest coordinates of some points along each
+    axis, as two tuples."""
+    columns = _columns(values, dim)
+    if not len(columns[0]):
+        raise ValueError("Can't find the bounds of no points")
+    if numpy is not None:
+        return (tuple(float(c.min()) for c in columns),
+                tuple(float(c.max()) for c in columns))
+    return tuple(min(c) for c in columns), tuple(max(c) for c in columns)
+
+
+def _is_point(value):
+    """True for a single point, rather than many"""
+    if isinstance(value, VectorBase):
+        return True
+    return isinstance(value, (tuple, list)) and bool(value) and isinstance(
+            value[0], numbers.Number)
+
+
+class BoxBase(object):
+    """Should not be instantiated directly
+
+    Subclasses name their intervals in `axes`.
+    """
+    axes = ()
+    point_class = None
+
+    @classmethod
+    def fromIntervals(cls, *intervals):
+        """Build a box from one Interval, or (start, end) pair, for each
+        axis."""
+        box = cls.__new__(cls)
+        for name, interval in zip(cls.axes, intervals):
+            if not isinstance(interval, Interval):
+                interval = Interval(*interval)
+            setattr(box, name, interval)
+        return box
+
+    @classmethod
+    def fromCorners(cls, lower, upper):
+        """Build a box from the starts and the ends of its intervals"""
+        return cls.fromIntervals(*zip(lower, upper))
+
+    @classmethod
+    def fromPoints(cls, values):
+        """Build the smallest box that contains every one of some points"""
+        lower, upper = bounds(values, len(cls.axes))
+        return cls.fromCorners(lower, [_above(c) for c in upper])
+
+    @property
+    def intervals(self):
+        return tuple(getattr(self, name) for name in self.axes)
+
+    @property
+    def lower(self):
+        """the start of each interval"""
+        return tuple(i.start for i in self.intervals)
+
+    @property
+    def upper(self):
+        """the end of each interval"""
+        return tuple(i.end for i in self.intervals)
+
+    def center(self):
+        """Get or set the center of the box"""
+        return self.point_class(*(i(0.5) for i in self.intervals))
+
+    def is_empty(self):
+        """True if no point can be inside the box"""
+        return any(i.end <= i.start for i in self.intervals)
+
+    def union(self, other):
+        """Get the smallest box that contains this box and another box.
+            self | other
+        """
+        return self.fromCorners(
+                [min(a, b) for a, b in zip(self.lower, other.lower)],
+                [max(a, b) for a, b in zip(self.upper, other.upper)])
+    def __or__(self, other):
+        return self.union(other)
+
+    def intersection(self, other):
+        """Get the box that is inside both this box and another box, or None
+        if they don't overlap.
+            self & other
+        """
+        lower = [max(a, b) for a, b in zip(self.lower, other.lower)]
+        upper = [min(a, b) for a, b in zip(self.upper, other.upper)]
+        if any(e <= s for s, e in zip(lower, upper)):
+            return None
+        return self.fromCorners(lower, upper)
+    def __and__(self, other):
+        return self.intersection(other)
+
+    def expand(self, margin):
+        """Get a new box that is larger by `margin` on every side, or smaller
+        if `margin` is negative"""
+        return self.fromCorners([s - margin for s in self.lower],
+                [e + margin for e in self.upper])
+
+    def include(self, point):
+        """Get a new box that also contains a point. If this box contains
+        the point already, this is a copy of this box."""
+        return self.fromCorners(
+                [min(s, c) for s, c in zip(self.lower, point)],
+                [max(e, _above(c)) for e, c in zip(self.upper, point)])
+
+    def contains(self, points):
+        """Check whether points are inside this box.
+
+        `points` can be a single point, which gives a boolean, a box, which
+        is contained if it is entirely inside this box, or many points, which
+        give a mask with one boolean for each point: a numpy array of bool if
+        numpy is available, and a list otherwise.
+        """
+        if isinstance(points, BoxBase):
+            return all(s <= os and oe <= e for s, e, os, oe in zip(
+                self.lower, self.upper, points.lower, points.upper))
+        if _is_point(points):
+            return all(i.start <= c < i.end
+                    for i, c in zip(self.intervals, points))
+        columns = _columns(points, len(self.axes))
+        if numpy is not None:
+            mask = numpy.ones(len(columns[0]), dtype=bool)
+            for i, c in zip(self.intervals, columns):
+                mask &= (c >= i.start) & (c < i.end)
+            return mask
+        limits = [(i.start, i.end) for i in self.intervals]
+        return [all(s <= c < e for c, (s, e) in zip(point, limits))
+                for point in zip(*columns)]
+
+    def overlaps(self, boxes):
+        """Check whether boxes share any points with this box.
+
+        `boxes` can be a single box, which gives a boolean, or many boxes,
+        which give a mask like `contains`. Many boxes are given as a list of
+        boxes, or as a pair of packed coordinates (see `vectors.pack`) for
+        their lower and upper corners, which is much faster for millions of
+        boxes.
+        """
+        if isinstance(boxes, BoxBase):
+            return all(s < oe and os < e for s, e, os, oe in zip(
+                self.lower, self.upper, boxes.lower, boxes.upper))
+        dim = len(self.axes)
+        if len(boxes) and isinstance(boxes[0], BoxBase):
+            lowers = [box.lower for box in boxes]
+            uppers = [box.upper for box in boxes]
+        else:
+            lowers, uppers = boxes
+        lowers, uppers = _columns(lowers, dim), _columns(uppers, dim)
+        if numpy is not None:
+            mask = numpy.ones(len(lowers[0]), dtype=bool)
+            for i, s, e in zip(self.intervals, lowers, uppers):
+                mask &= (s < i.end) & (i.start < e)
+            return mask
+        limits = [(i.start, i.end) for i in self.intervals]
+        return [all(s < end and start < e for (start, end), s, e in zip(
+            limits, low, high)) for low, high in zip(zip(*lowers),
+                zip(*uppers))]
+
+    def divide(self, *counts):
+        """Divide the box into a grid of smaller boxes, dividing the
+        interval of each axis like `Interval.divide`. Give one number for
+        every axis, or a single number for all of them. Returns a BoxGrid.
+        """
+        if len(counts) == 1:
+            counts = counts * len(self.axes)
+        return BoxGrid(self, [i.divide(n) for i, n in zip(self.intervals,
+            counts)])
+
+    def __repr__(self):
+        return '%s(%s)' % (self.__class__.__name__, ', '.join(
+            repr(i) for i in self.intervals))
+
+
+class Box2d(BoxBase):
+    axes = ('x', 'y')
+    point_class = Point2d
+
     def __init__(self, width=200, height=100, *args, **kwargs):
         self.x = Interval(0, width)
         self.y = Interval(0, height)
 
-    def center(self):
-        """Get or set the center of the box"""
-        return Point2d(
-                self.x(0.5),
-                self.y(0.5),
-                )
 
-class Box3d(object):
+class Box3d(BoxBase):
+    axes = ('x', 'y', 'z')
+    point_class = Point3d
+
     def __init__(self, width=200, length=200, height=200,
             *args, **kwargs):
         self.x = Interval(0, width)
         self.y = Interval(0, length)
         self.z = Interval(0, height)
 
-    def center(self):
-        """Get or set the center of the box"""
-        return Point3d(
-                self.x(0.5),
-                self.y(0.5),
-                self.z(0.5),
-                )
 
+class BoxGrid(object):
+    """The cells of a box divided along each axis, as a lazy sequence.
+
+    Like `Subdivision`, which it holds one of for each axis in `parts`, it
+    only makes a cell when it is asked for. Cells are numbered with the last
+    axis changing fastest, like `numpy.ndindex`, and can be found in O(1)
+    either by that number or by a tuple with one index for each axis.
+    """
+    def __init__(self, box, parts):
+        self.box_class = box.__class__
+        self.parts = tuple(parts)
+
+    @property
+    def shape(self):
+        """the number of parts along each axis"""
+        return tuple(len(p) for p in self.parts)
+
+    def __len__(self):
+        return reduce(mul, self.shape, 1)
+
+    def index(self, number):
+        """the index along each axis of a cell, from its number"""
+        indices = []
+        for size in reversed(self.shape):
+            number, index = divmod(number, size)
+            indices.append(index)
+        return tuple(reversed(indices))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if isinstance(index, numbers.Integral):
+            if index < 0:
+                index += len(self)
+            if not 0 <= index < len(self):
+                raise IndexError("cell %s of %s" % (index, len(self)))
+            index = self.index(index)
+        return self.box_class.fromIntervals(*(p[i] for p, i in zip(
+            self.parts, index)))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def breakpoints(self):
+        """the breakpoints of each axis, see `Subdivision.breakpoints`"""
+        return tuple(p.breakpoints() for p in self.parts)
 
+    def __repr__(self):
+        return 'BoxGrid(%s, shape=%r)' % (self.box_class.__name__,
+                self.shape)
@@ -1,8 +1,12 @@
-"""
+"""This module contains helpers used throughout the library: python version
+compatibility, the optional numpy import and the tolerance policy for float
+comparisons.
 """
 
+import math
 import numbers
 import sys
+import threading
 
 PY3 = sys.version_info[0] == 3
 
@@ -11,15 +15,155 @@ if PY3:
 else:
     string_type = basestring
 
-# For float comparison:
-def isRoughlyZero(number):
-    return round(number, 7) == 0
-# though there are better ways to do this.
-# It would be nice if this could handle all sorts of numbers
-# see:
-# http://floating-point-gui.de/errors/comparison/
-# http://stackoverflow.com/questions/9528421/value-for-epsilon-in-python
-# http://stackoverflow.com/questions/4028889/floating-point-equality-in-python
-# http://stackoverflow.com/questions/3049101/floating-point-equality-in-python-and-in-general
+# numpy is optional. Modules that work on batches of coordinates use it when
+# it is available and fall back to the `array` module otherwise.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _ulp(value):
+    """the distance from a float to the next larger float"""
+    value = abs(value)
+    if value == 0 or value != value or value == float('inf'):
+        return 5e-324
+    mantissa, exponent = math.frexp(value)
+    return max(math.ldexp(1.0, exponent - 53), 5e-324)
+
+
+class Tolerance(object):
+    """A policy for deciding when floating point numbers are close enough to
+    count as equal.
+
+    A number is roughly zero if its size is at most the largest of:
+
+        absolute - a fixed amount
+        relative - a fraction of the scale of the numbers it was computed
+                   from, such as the size of the coordinates involved
+        ulps     - a number of units in the last place of that scale
+
+    Functions that compare numbers read the current tolerance once, with
+    `current_tolerance()`, and use it for the whole operation. A Tolerance
+    can be used as a context manager to change the current tolerance for a
+    block of code:
+
+        with Tolerance(relative=1e-12):
+            plane.side(points)
+
+    The default is an absolute tolerance of 5e-8, which is what rounding to
+    7 decimal places used to give.
+    """
+    __slots__ = ('absolute', 'relative', 'ulps')
+
+    def __init__(self, absolute=0.0, relative=0.0, ulps=0):
+        self.absolute = absolute
+        self.relative = relative
+        self.ulps = ulps
+
+    @property
+    def uses_scale(self):
+        """True if the scale of the numbers makes a difference"""
+        return bool(self.relative or self.ulps)
+
+    def bound(self, scale=0.0):
+        """the largest size that counts as zero, for numbers of a given
+        scale"""
+        bound = self.absolute
+        if self.relative:
+            bound = max(bound, self.relative * abs(scale))
+        if self.ulps:
+            bound = max(bound, self.ulps * _ulp(scale))
+        return bound
+
+    def is_zero(self, value, scale=0.0):
+        """True if a number is roughly zero"""
+        return abs(value) <= self.bound(scale)
+
+    def is_close(self, a, b):
+        """True if two numbers are roughly equal"""
+        return abs(a - b) <= self.bound(max(abs(a), abs(b)))
+
+    def bounds(self, scale):
+        """`bound` for a numpy array of scales"""
+        bound = self.absolute
+        if self.relative:
+            bound = numpy.maximum(bound, self.relative * numpy.abs(scale))
+        if self.ulps:
+            bound = numpy.maximum(bound,
+                    self.ulps * numpy.spacing(numpy.abs(scale)))
+        return bound
 
+    def __enter__(self):
+        _stack().append(self)
+        return self
 
+    def __exit__(self, *args):
+        _stack().pop()
+
+    def __repr__(self):
+        return 'Tolerance(absolute=%r, relative=%r, ulps=%r)' % (
+                self.absolute, self.relative, self.ulps)
+
+
+DEFAULT_TOLERANCE = Tolerance(absolute=5e-8)
+
+_local = threading.local()
+
+
+def _stack():
+    """the stack of tolerances in use in this thread"""
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = [DEFAULT_TOLERANCE]
+    return stack
+
+
+def current_tolerance():
+    """Get the tolerance in use"""
+    return _stack()[-1]
+
+
+def is_zero(values, scale=0.0, tolerance=None):
+    """Check if a number, or each of an array of numbers, is roughly zero.
+
+    `scale` is the size of the numbers the values were computed from, as a
+    single number or as an array like `values`. Arrays give a numpy array of
+    booleans if numpy is available, and a list of booleans otherwise.
+    """
+    if tolerance is None:
+        tolerance = current_tolerance()
+    if isinstance(values, numbers.Number):
+        return tolerance.is_zero(values, scale)
+    if numpy is not None:
+        return numpy.abs(values) <= tolerance.bounds(scale)
+    if isinstance(scale, numbers.Number):
+        bound = tolerance.bound(scale)
+        return [abs(v) <= bound for v in values]
+    return [tolerance.is_zero(v, s) for v, s in zip(values, scale)]
+
+
+def is_close(a, b, tolerance=None):
+    """Check if two numbers, or each pair of numbers in two arrays, are
+    roughly equal. Arrays give booleans like `is_zero`."""
+    if tolerance is None:
+        tolerance = current_tolerance()
+    if isinstance(a, numbers.Number) and isinstance(b, numbers.Number):
+        return tolerance.is_close(a, b)
+    if numpy is not None:
+        a = numpy.asarray(a, dtype=float)
+        b = numpy.asarray(b, dtype=float)
+        scale = numpy.maximum(numpy.abs(a), numpy.abs(b))
+        return numpy.abs(a - b) <= tolerance.bounds(scale)
+    if isinstance(a, numbers.Number):
+        a = [a] * len(b)
+    if isinstance(b, numbers.Number):
+        b = [b] * len(a)
+    return [tolerance.is_close(x, y) for x, y in zip(a, b)]
+
+
+def isRoughlyZero(number):
+    """Check if a number is roughly zero with the current tolerance. This is
+    kept for compatibility; new code should read `current_tolerance()` once
+    and use it for every comparison."""
+    return current_tolerance().is_zero(number)
@@ -0,0 +1,409 @@
+"""This module contains an incremental Delaunay triangulation of 2d points,
+and the Voronoi diagram that is its dual.
+
+Points are inserted one at a time with the Bowyer-Watson algorithm: the
+triangles whose circumcircles contain the new point are removed, and the
+hole is filled with triangles that meet at the new point. Building from many
+points at once inserts them in a biased randomized order that is sorted
+along a Hilbert curve within each round, so that each point is found by a
+short walk from the last one, in expected O(n log n) time overall.
+
+The outside of the hull is covered by "ghost" triangles, which have one
+real edge on the hull and a third vertex at infinity (`GHOST`). A ghost
+triangle's circumcircle is taken to be the open half-plane outside its edge,
+along with the edge itself, so points outside the hull are inserted just
+like points inside it. All decisions are made with the robust `orient2d` and
+`incircle` predicates.
+"""
+import random
+from array import array
+
+from .core import numpy
+from .point2d import Point2d
+from .predicates import orient2d, incircle
+from .vectors import Vector2dArray, pack, index_buffer
+
+# the vertex at infinity that every ghost triangle has as its third vertex
+GHOST = -1
+
+# the number of bits of each coordinate used for the Hilbert curve order
+HILBERT_BITS = 16
+
+
+def _hilbert_key(x, y):
+    """the distance along a Hilbert curve of a point on a grid of integers"""
+    key = 0
+    side = 1 << (HILBERT_BITS - 1)
+    while side:
+        rx = 1 if x & side else 0
+        ry = 1 if y & side else 0
+        key += side * side * ((3 * rx) ^ ry)
+        if not ry:
+            if rx:
+                x, y = side - 1 - x, side - 1 - y
+            x, y = y, x
+        side >>= 1
+    return key
+
+
+def _insertion_order(indices, points, rng):
+    """Get an order to insert points in: random rounds that double in size,
+    each sorted along a Hilbert curve."""
+    indices = list(indices)
+    if len(indices) < 2:
+        return indices
+    rng.shuffle(indices)
+    xs = [points[i][0] for i in indices]
+    ys = [points[i][1] for i in indices]
+    left, bottom = min(xs), min(ys)
+    size = max(max(xs) - left, max(ys) - bottom) or 1.0
+    scale = ((1 << HILBERT_BITS) - 1) / size
+    keys = {}
+    for i, x, y in zip(indices, xs, ys):
+        keys[i] = _hilbert_key(int((x - left) * scale),
+                int((y - bottom) * scale))
+    rounds = []
+    while indices:
+        split = len(indices) // 2 if len(indices) > 64 else 0
+        rounds.append(sorted(indices[split:], key=keys.__getitem__))
+        indices = indices[:split]
+    return [i for chunk in reversed(rounds) for i in chunk]
+
+
+def _circumcenter(a, b, c):
+    """the center of the circle through three points"""
+    bx, by = b[0] - a[0], b[1] - a[1]
+    cx, cy = c[0] - a[0], c[1] - a[1]
+    d = 2.0 * (bx * cy - by * cx)
+    b2, c2 = bx * bx + by * by, cx * cx + cy * cy
+    return (a[0] + (cy * b2 - by * c2) / d, a[1] + (bx * c2 - cx * b2) / d)
+
+
+class Delaunay2d(object):
+    """A Delaunay triangulation of a set of unique 2d points.
+
+    Points are numbered in the order they are first added, and repeated
+    points are merged, like in a PointSet. The triangles are stored as flat
+    lists with three entries for each triangle: `_vertices` holds its corners
+    in counterclockwise order, and `_neighbors` holds the triangles across
+    its edges, where edge k runs from corner k to corner k + 1. Removed
+    triangles leave free slots that are reused by later insertions.
+
+    Until three points that are not on a line have been added, there are no
+    triangles and the points wait to be inserted.
+    """
+    def __init__(self, points=None, seed=0):
+        self.points = []
+        self._lookup = {}
+        self._vertices = []
+        self._neighbors = []
+        self._alive = []
+        self._free = []
+        # a triangle using each vertex, for walking around it
+        self._incident = []
+        # a live triangle to start the next walk from
+        self._last = -1
+        self._waiting = []
+        self._random = random.Random(seed)
+        if points is not None:
+            self.extend(points)
+
+    def __len__(self):
+        return len(self.points)
+
+    def _add(self, point):
+        """add a point to the list of points, and return its index and
+        whether it is new"""
+        key = (float(point[0]), float(point[1]))
+        index = self._lookup.get(key)
+        if index is not None:
+            return index, False
+        index = len(self.points)
+        self.points.append(key)
+        self._lookup[key] = index
+        self._incident.append(-1)
+        return index, True
+
+    def insert(self, point):
+        """Add a point to the triangulation, and return its index."""
+        index, new = self._add(point)
+        if new:
+            self._triangulate(index)
+        return index
+
+    def extend(self, points):
+        """Add many points to the triangulation.
+
+        Returns an array with the index of each of the points, so that data
+        kept for the points can be matched to the vertices of the triangles.
+        """
+        data = pack(points, 2)
+        if numpy is not None:
+            data = data.tolist()
+        rows = zip(*[iter(data)] * 2)
+        indices, added = [], []
+        for row in rows:
+            index, new = self._add(row)
+            indices.append(index)
+            if new:
+                added.append(index)
+        for index in _insertion_order(added, self.points, self._random):
+            self._triangulate(index)
+        return index_buffer(indices)
+
+    def _new_triangle(self, vertices, neighbors):
+        if self._free:
+            t = self._free.pop()
+            self._vertices[3 * t:3 * t + 3] = vertices
+            self._neighbors[3 * t:3 * t + 3] = neighbors
+            self._alive[t] = True
+        else:
+            t = len(self._alive)
+            self._vertices.extend(vertices)
+            self._neighbors.extend(neighbors)
+            self._alive.append(True)
+        for v in vertices:
+            if v != GHOST:
+                self._incident[v] = t
+        return t
+
+    def _start(self, a, b, c):
+        """make the first triangle and the three ghost triangles around it"""
+        points = self.points
+        if orient2d(points[a], points[b], points[c]) < 0:
+            b, c = c, b
+        first = len(self._alive)
+        self._new_triangle((a, b, c), (first + 1, first + 2, first + 3))
+        self._new_triangle((b, a, GHOST), (first, first + 3, first + 2))
+        self._new_triangle((c, b, GHOST), (first, first + 1, first + 3))
+        self._new_triangle((a, c, GHOST), (first, first + 2, first + 1))
+        self._last = first
+
+    def _triangulate(self, index):
+        if self._last >= 0:
+            self._insert(index, self._locate(self.points[index]))
+            return
+        waiting = self._waiting
+        waiting.append(index)
+        if len(waiting) < 3:
+            return
+        # every waiting point is on the line through the first two
+        points = self.points
+        a, b = waiting[0], waiting[1]
+        if orient2d(points[a], points[b], points[index]) == 0:
+            return
+        self._waiting = []
+        self._start(a, b, index)
+        for other in waiting[2:-1]:
+            self._insert(other, self._locate(points[other]))
+
+    def _locate(self, p):
+        """Walk from the last triangle towards p. Returns the real triangle
+        containing p, or the ghost triangle whose edge p is outside of."""
+        points, vertices, neighbors = self.points, self._vertices, \
+                self._neighbors
+        t = self._last
+        previous = -1
+        while True:
+            base = 3 * t
+            a, b, c = vertices[base:base + 3]
+            if c == GHOST:
+                return t
+            for k, (u, v) in enumerate(((a, b), (b, c), (c, a))):
+                other = neighbors[base + k]
+                if other != previous and orient2d(points[u], points[v],
+                        p) < 0:
+                    previous, t = t, other
+                    break
+            else:
+                return t
+
+    def _conflicts(self, t, p):
+        """True if p is inside the circumcircle of a triangle"""
+        points = self.points
+        a, b, c = self._vertices[3 * t:3 * t + 3]
+        if c != GHOST:
+            return incircle(points[a], points[b], points[c], p) > 0
+        pa, pb = points[a], points[b]
+        turn = orient2d(pa, pb, p)
+        if turn:
+            return turn > 0
+        # on the line of the edge, so only inside if it is on the edge
+        k = 0 if pa[0] != pb[0] else 1
+        return min(pa[k], pb[k]) < p[k] < max(pa[k], pb[k])
+
+    def _insert(self, index, start):
+        """replace the triangles in conflict with a point, starting from one
+        of them, with triangles that meet at the point"""
+        p = self.points[index]
+        vertices, neighbors = self._vertices, self._neighbors
+        cavity = [start]
+        inside = set(cavity)
+        outside = set()
+        boundary = []
+        for t in cavity:
+            base = 3 * t
+            for k in range(3):
+                other = neighbors[base + k]
+                if other in inside:
+                    continue
+                if other not in outside:
+                    if self._conflicts(other, p):
+                        inside.add(other)
+                        cavity.append(other)
+                        continue
+                    outside.add(other)
+                boundary.append((vertices[base + k],
+                    vertices[base + (k + 1) % 3], other))
+        for t in cavity:
+            self._alive[t] = False
+        self._free.extend(cavity)
+        starts, ends = {}, {}
+        created = []
+        for u, w, other in boundary:
+            t = self._new_triangle((u, w, index), (other, -1, -1))
+            starts[u] = ends[w] = t
+            created.append(t)
+            # point the triangle across the edge at the new one
+            base = 3 * other
+            corner = vertices[base:base + 3].index(w)
+            neighbors[base + corner] = t
+        for t in created:
+            base = 3 * t
+            u, w = vertices[base], vertices[base + 1]
+            neighbors[base + 1] = starts[w]
+            neighbors[base + 2] = ends[u]
+        for t in created:
+            # ghost triangles keep GHOST as their last corner
+            base = 3 * t
+            corners = vertices[base:base + 3]
+            if GHOST in corners[:2]:
+                shift = corners.index(GHOST) + 1
+                for values in (vertices, neighbors):
+                    row = values[base:base + 3]
+                    values[base:base + 3] = row[shift:] + row[:shift]
+            else:
+                self._last = t
+            self._incident[index] = t
+
+    def locate(self, point):
+        """Find a triangle that contains a point (including its edges).
+        Returns its three vertex indices, counterclockwise, or None if the
+        point is outside the triangulation."""
+        if self._last < 0:
+            return None
+        t = self._locate((float(point[0]), float(point[1])))
+        corners = tuple(self._vertices[3 * t:3 * t + 3])
+        if GHOST in corners:
+            return None
+        return corners
+
+    def _live(self):
+        """the real triangles that are in use"""
+        vertices = self._vertices
+        return [t for t, alive in enumerate(self._alive)
+                if alive and vertices[3 * t + 2] != GHOST]
+
+    def triangle_count(self):
+        return len(self._live())
+
+    def triangles(self):
+        """Get the triangles as a flat array of point indices, three for each
+        triangle, counterclockwise. This is the face list of a mesh, see
+        `toMesh`."""
+        vertices = self._vertices
+        return index_buffer(v for t in self._live()
+                for v in vertices[3 * t:3 * t + 3])
+
+    def hull(self):
+        """Get the indices of the points on the hull, counterclockwise"""
+        ghosts = {}
+        vertices = self._vertices
+        for t, alive in enumerate(self._alive):
+            if alive and vertices[3 * t + 2] == GHOST:
+                # ghost edges run clockwise around the hull
+                ghosts[vertices[3 * t + 1]] = vertices[3 * t]
+        if not ghosts:
+            return index_buffer()
+        start = min(ghosts)
+        ring = [start]
+        while ghosts[ring[-1]] != start:
+            ring.append(ghosts[ring[-1]])
+        return index_buffer(ring)
+
+    def circumcenters(self):
+        """Get the circumcenter of each triangle, in the order of
+        `triangles`, as a Vector2dArray. These are the vertices of the
+        Voronoi diagram."""
+        corners = pack([self.points[v] for v in self.triangles()], 2)
+        if numpy is not None:
+            rows = corners.reshape(-1, 3, 2)
+            a = rows[:, 0]
+            b, c = rows[:, 1] - a, rows[:, 2] - a
+            d = 2.0 * (b[:, 0] * c[:, 1] - b[:, 1] * c[:, 0])
+            b2, c2 = (b * b).sum(axis=1), (c * c).sum(axis=1)
+            centers = a + numpy.column_stack((
+                c[:, 1] * b2 - b[:, 1] * c2, b[:, 0] * c2 - c[:, 0] * b2)
+                ) / d[:, None]
+            return Vector2dArray.fromBuffer(centers.ravel())
+        centers = array('d')
+        rows = list(zip(*[iter(corners)] * 2))
+        for i in range(0, len(rows), 3):
+            centers.extend(_circumcenter(*rows[i:i + 3]))
+        return Vector2dArray.fromBuffer(centers)
+
+    def _around(self, index):
+        """the triangles around a vertex, counterclockwise"""
+        vertices, neighbors = self._vertices, self._neighbors
+        start = t = self._incident[index]
+        ring = []
+        while True:
+            ring.append(t)
+            base = 3 * t
+            corner = vertices[base:base + 3].index(index)
+            t = neighbors[base + (corner + 2) % 3]
+            if t == start:
+                return ring
+
+    def voronoi_cell(self, index):
+        """Get the Voronoi cell of a point, as a list of Point2d corners in
+        counterclockwise order. Returns None for points on the hull, whose
+        cells are unbounded, and for points that are not triangulated yet."""
+        if self._incident[index] < 0:
+            return None
+        ring = self._around(index)
+        vertices = self._vertices
+        if any(vertices[3 * t + 2] == GHOST for t in ring):
+            return None
+        points = self.points
+        return [Point2d(*_circumcenter(*[points[v]
+            for v in vertices[3 * t:3 * t + 3]])) for t in ring]
+
+    def voronoi_cells(self):
+        """Get the Voronoi cell of every point, see `voronoi_cell`"""
+        return [self.voronoi_cell(i) for i in range(len(self.points))]
+
+    def neighbors(self, index):
+        """Get the indices of the points joined to a point by an edge,
+        counterclockwise"""
+        if self._incident[index] < 0:
+            return []
+        vertices = self._vertices
+        found = []
+        for t in self._around(index):
+            base = 3 * t
+            corner = vertices[base:base + 3].index(index)
+            other = vertices[base + (corner + 1) % 3]
+            if other != GHOST:
+                found.append(other)
+        return found
+
+    def toMesh(self):
+        """Get the triangulation as a WingedEdgeMesh on the plane z = 0"""
+        from .mesh import WingedEdgeMesh
+        return WingedEdgeMesh([(x, y, 0.0) for x, y in self.points],
+                self.triangles())
+
+    def __repr__(self):
+        return '<Delaunay2d with %s points and %s triangles>' % (
+                len(self.points), self.triangle_count())
@@ -0,0 +1,433 @@
+"""This module finds the convex hulls of points given as packed coordinates
+(see `vectors.pack`).
+
+`convex_hull_2d` finds the corners of the hull of 2d points with Andrew's
+monotone chain, and `convex_hull_3d` finds the triangles of the hull of 3d
+points with quickhull. Every decision is made with the robust predicates of
+`predicates`, so the hull is exact for float coordinates: points that lie on
+an edge or a face of the hull are never made into corners.
+
+With numpy, both start by throwing away the points that are certainly inside
+a small hull of extreme points (the Akl-Toussaint heuristic), checking all of
+them at once, so that only the points near the boundary are handled one at a
+time.
+"""
+import itertools
+from array import array
+
+from .core import numpy
+from .predicates import orient2d, orient3d, EPSILON, _orient2d_columns
+from .vectors import pack, index_buffer
+
+# one of each pair of opposite directions that extreme points are taken in
+DIRECTIONS_3D = [d for d in itertools.product((-1, 0, 1), repeat=3)
+        if d > (0, 0, 0)]
+
+# the number of points checked against the faces of a hull at once
+CHUNK_SIZE = 1 << 16
+
+# below this many points, prefiltering isn't worth it
+PREFILTER_SIZE = 64
+
+# below this many point and face pairs, points are assigned to faces one at a
+# time rather than with numpy
+SMALL_ASSIGN = 256
+
+
+class HullError(Exception):
+    def __init__(self, msg):
+        self.msg = msg
+    def __str__(self):
+        return self.msg
+
+
+def _monotone_chain(points):
+    """the positions of the corners of the hull of points that are sorted by
+    x and then y, counterclockwise from the first point"""
+    # only the first of any repeated points can be a corner
+    unique = [k for k in range(len(points))
+            if k == 0 or points[k] != points[k - 1]]
+    if len(unique) < 2:
+        return unique
+
+    def half(positions):
+        chain = []
+        for k in positions:
+            p = points[k]
+            while len(chain) > 1 and orient2d(points[chain[-2]],
+                    points[chain[-1]], p) <= 0:
+                chain.pop()
+            chain.append(k)
+        return chain
+    lower = half(unique)
+    upper = half(reversed(unique))
+    return lower[:-1] + upper[:-1]
+
+
+def _prefilter_2d(rows):
+    """the indices of the points that are not certainly inside the polygon
+    of the extreme points in eight directions"""
+    everything = numpy.arange(len(rows))
+    if len(rows) < PREFILTER_SIZE:
+        return everything
+    x, y = rows[:, 0], rows[:, 1]
+    extremes = set()
+    for values in (x, y, x + y, x - y):
+        extremes.update((int(values.argmin()), int(values.argmax())))
+    extremes = sorted(extremes, key=lambda i: (x[i], y[i]))
+    corners = [tuple(rows[extremes[k]].tolist())
+            for k in _monotone_chain([tuple(rows[i].tolist())
+                for i in extremes])]
+    if len(corners) < 3:
+        return everything
+    keep = numpy.zeros(len(rows), dtype=bool)
+    for a, b in zip(corners, corners[1:] + corners[:1]):
+        # a point is inside if it is certainly to the left of every edge
+        det, bound = _orient2d_columns(a, b, (x, y))
+        keep |= det <= bound
+    return numpy.flatnonzero(keep)
+
+
+def convex_hull_2d(coords):
+    """Find the convex hull of 2d points.
+
+    Returns an array with the indices of the corners of the hull, going
+    counterclockwise from the point with the smallest x (and the smallest y
+    of those). Points on the edges of the hull and repeated points are left
+    out.
+    """
+    data = pack(coords, 2)
+    if numpy is not None:
+        rows = data.reshape(-1, 2)
+        candidates = _prefilter_2d(rows)
+        order = candidates[numpy.lexsort((rows[candidates, 1],
+            rows[candidates, 0]))]
+        points = [tuple(p) for p in rows[order].tolist()]
+        order = order.tolist()
+    else:
+        points = list(zip(*[iter(data)] * 2))
+        order = sorted(range(len(points)), key=points.__getitem__)
+        points = [points[i] for i in order]
+    return index_buffer(order[k] for k in _monotone_chain(points))
+
+
+class _Quickhull(object):
+    """The hull of some 3d points as it is being built.
+
+    Faces are kept in lists indexed by face number: `faces` holds the three
+    vertices of each face, counterclockwise when seen from outside the hull,
+    and `neighbors` holds the faces across its edges ab, bc and ca. Faces
+    that are replaced are marked as dead rather than removed. Each face with
+    points outside it has them in `outside`, and the point furthest from it
+    in `furthest`.
+    """
+    def __init__(self, rows):
+        self.rows = rows
+        self.faces = []
+        self.neighbors = []
+        self.alive = []
+        self.outside = {}
+        self.furthest = {}
+        self._points = {}
+
+    def point(self, i):
+        """the coordinates of a point as a tuple of floats"""
+        p = self._points.get(i)
+        if p is None:
+            p = self._points[i] = tuple(self.rows[i].tolist()) if (
+                    numpy is not None) else self.rows[i]
+        return p
+
+    def add_face(self, a, b, c):
+        self.faces.append((a, b, c))
+        self.neighbors.append([None, None, None])
+        self.alive.append(True)
+        return len(self.faces) - 1
+
+    def visible(self, face, p):
+        """True if p is strictly outside a face"""
+        a, b, c = self.faces[face]
+        return orient3d(self.point(a), self.point(b), self.point(c), p) < 0
+
+    def assign(self, indices, faces):
+        """Give each of the points a face it is outside of, if it is outside
+        of any of the faces. Points that aren't are dropped."""
+        if not len(indices) or not faces:
+            return
+        if numpy is None or len(indices) * len(faces) < SMALL_ASSIGN:
+            return self._assign_each(indices, faces)
+        rows = self.rows
+        corners = numpy.array([[self.point(v) for v in self.faces[f]]
+            for f in faces])
+        first = corners[:, 0]
+        e1, e2 = corners[:, 1] - first, corners[:, 2] - first
+        normals = numpy.cross(e1, e2)
+        offsets = (first * normals).sum(axis=1)
+        # a bound on the rounding error of the normals, for the error bound
+        # of the distances below
+        spread = (numpy.abs(e1[:, [1, 2, 0]] * e2[:, [2, 0, 1]]) +
+                numpy.abs(e1[:, [2, 0, 1]] * e2[:, [1, 2, 0]]))
+        base = (numpy.abs(first) * spread).sum(axis=1)
+        spread = spread.sum(axis=1)
+        found, owners, heights = [], [], []
+        step = max(1, CHUNK_SIZE // len(faces))
+        for start in range(0, len(indices), step):
+            chunk = indices[start:start + step]
+            points = rows[chunk]
+            # each column is proportional to the distance of the points
+            # outside a face, and is positive for the points outside it
+            distances = points.dot(normals.T) - offsets
+            bounds = 16 * EPSILON * (numpy.abs(points).max() * spread + base)
+            best = distances.argmax(axis=1)
+            top = distances[numpy.arange(len(chunk)), best]
+            sure = top > bounds[best]
+            found.append(chunk[sure])
+            owners.append(best[sure])
+            heights.append(top[sure])
+            unsure = numpy.flatnonzero(~sure & (distances >= -bounds).any(
+                axis=1))
+            for k in unsure.tolist():
+                # check the faces that the float test couldn't rule out
+                i = int(chunk[k])
+                p = self.point(i)
+                for j in numpy.flatnonzero(distances[k] >= -bounds).tolist():
+                    if self.visible(faces[j], p):
+                        found.append(numpy.array([i]))
+                        owners.append(numpy.array([j]))
+                        heights.append(numpy.array([distances[k, j]]))
+                        break
+        found = numpy.concatenate(found)
+        owners = numpy.concatenate(owners)
+        heights = numpy.concatenate(heights)
+        order = numpy.argsort(owners, kind='stable')
+        found, owners, heights = found[order], owners[order], heights[order]
+        splits = numpy.searchsorted(owners, numpy.arange(len(faces) + 1))
+        for j, face in enumerate(faces):
+            start, stop = splits[j], splits[j + 1]
+            if start == stop:
+                continue
+            self.outside[face] = found[start:stop]
+            self.furthest[face] = int(found[start +
+                heights[start:stop].argmax()])
+
+    def _assign_each(self, indices, faces):
+        best = {}
+        for i in indices:
+            p = self.point(i)
+            for face in faces:
+                a, b, c = self.faces[face]
+                height = -orient3d(self.point(a), self.point(b),
+                        self.point(c), p)
+                if height > 0:
+                    self.outside.setdefault(face, array('l')).append(i)
+                    if height > best.get(face, 0):
+                        best[face] = height
+                        self.furthest[face] = i
+                    break
+
+    def add_point(self, face):
+        """Add the point furthest outside a face to the hull, replacing the
+        faces it can see with new faces that meet at it. Returns the new
+        faces."""
+        apex = self.furthest.pop(face)
+        p = self.point(apex)
+        visible = [face]
+        seen = set(visible)
+        horizon = []
+        for current in visible:
+            vertices = self.faces[current]
+            for k, other in enumerate(self.neighbors[current]):
+                if other in seen:
+                    continue
+                if self.visible(other, p):
+                    seen.add(other)
+                    visible.append(other)
+                else:
+                    horizon.append((vertices[k], vertices[(k + 1) % 3],
+                        other))
+        orphans = []
+        for current in visible:
+            self.alive[current] = False
+            self.furthest.pop(current, None)
+            points = self.outside.pop(current, None)
+            if points is not None:
+                orphans.append(points)
+        starts, ends, new = {}, {}, []
+        for u, v, other in horizon:
+            created = self.add_face(u, v, apex)
+            starts[u] = ends[v] = created
+            new.append(created)
+            # point the face across the horizon edge at the new face
+            vertices = self.faces[other]
+            self.neighbors[other][vertices.index(v)] = created
+            self.neighbors[created][0] = other
+        for u, v, other in horizon:
+            created = starts[u]
+            self.neighbors[created][1] = starts[v]
+            self.neighbors[created][2] = ends[u]
+        # the apex is on every new face, so it is never outside of one
+        if numpy is not None:
+            orphans = numpy.concatenate(orphans)
+            orphans = orphans[orphans != apex]
+        else:
+            orphans = [i for points in orphans for i in points if i != apex]
+        self.assign(orphans, new)
+        return new
+
+    def run(self):
+        """add points until none are left outside the hull"""
+        pending = list(self.outside)
+        while pending:
+            face = pending.pop()
+            if self.alive[face] and face in self.furthest:
+                pending.extend(f for f in self.add_point(face)
+                        if f in self.furthest)
+
+    def start(self, a, b, c, d):
+        """make the first four faces, from four points that are not on a
+        plane"""
+        if orient3d(self.point(a), self.point(b), self.point(c),
+                self.point(d)) < 0:
+            b, c = c, b
+        faces = [self.add_face(*f) for f in ((a, b, c), (a, d, b),
+            (b, d, c), (c, d, a))]
+        # the neighbors across each edge, in the order of the edges
+        links = ((1, 2, 3), (3, 2, 0), (1, 3, 0), (2, 1, 0))
+        for face, across in zip(faces, links):
+            self.neighbors[face] = [faces[k] for k in across]
+        return faces
+
+    def triangles(self):
+        return index_buffer(v for face, alive in zip(self.faces, self.alive)
+                if alive for v in face)
+
+    def corners(self):
+        """the vertices of the hull that are corners. Quickhull can keep a
+        point that was extreme when it was added, but that ended up on a
+        face or an edge as the hull grew. A corner is on at least three
+        planes of the triangles around it."""
+        around = {}
+        for face, alive in zip(self.faces, self.alive):
+            if alive:
+                for v in face:
+                    around.setdefault(v, []).append(face)
+        corners = []
+        for v in sorted(around):
+            planes = []
+            for face in around[v]:
+                a, b, c = [self.point(u) for u in face]
+                if not any(orient3d(p, q, r, a) == 0 and orient3d(p, q, r, b)
+                        == 0 and orient3d(p, q, r, c) == 0
+                        for p, q, r in planes):
+                    planes.append((a, b, c))
+                    if len(planes) == 3:
+                        corners.append(v)
+                        break
+        return corners, len(around)
+
+
+def _collinear(a, b, c):
+    """True if three 3d points are on a line"""
+    return all(orient2d((a[i], a[j]), (b[i], b[j]), (c[i], c[j])) == 0
+            for i, j in ((0, 1), (1, 2), (2, 0)))
+
+
+def _simplex(hull, candidates):
+    """four points of `candidates` that are not on a plane, chosen to be far
+    apart, or None if they are all on a plane"""
+    point = hull.point
+    points = [point(i) for i in candidates]
+    if len(set(points)) < 4:
+        return None
+
+    def distance(p, q):
+        return sum((x - y) ** 2 for x, y in zip(p, q))
+    a = min(range(len(points)), key=points.__getitem__)
+    b = max(range(len(points)), key=lambda k: distance(points[a], points[k]))
+    pa, pb = points[a], points[b]
+    u = [y - x for x, y in zip(pa, pb)]
+
+    def off_line(k):
+        w = [y - x for x, y in zip(pa, points[k])]
+        return ((u[1] * w[2] - u[2] * w[1]) ** 2 +
+                (u[2] * w[0] - u[0] * w[2]) ** 2 +
+                (u[0] * w[1] - u[1] * w[0]) ** 2)
+    c = max(range(len(points)), key=off_line)
+    if _collinear(pa, pb, points[c]):
+        c = next((k for k in range(len(points))
+            if not _collinear(pa, pb, points[k])), None)
+        if c is None:
+            return None
+    pc = points[c]
+    d = max(range(len(points)), key=lambda k: abs(orient3d(pa, pb, pc,
+        points[k])))
+    if orient3d(pa, pb, pc, points[d]) == 0:
+        return None
+    return [candidates[k] for k in (a, b, c, d)]
+
+
+def convex_hull_3d(coords):
+    """Find the convex hull of 3d points.
+
+    Returns a flat array of point indices, three for each triangle of the
+    hull. Triangles go counterclockwise when seen from outside the hull.
+    Points on the faces or edges of the hull are never corners of the
+    triangles, so flat parts of the hull are split into triangles between
+    their corners: if quickhull keeps a point that ends up on a face, the
+    hull of the corners alone is found again. Raises a HullError if the
+    points are all on a plane.
+    """
+    data = pack(coords, 3)
+    if numpy is not None:
+        rows = data.reshape(-1, 3)
+        count = len(rows)
+    else:
+        rows = list(zip(*[iter(data)] * 3))
+        count = len(rows)
+    hull = _Quickhull(rows)
+    seeds = None
+    if numpy is not None and count >= PREFILTER_SIZE:
+        # the extreme points in a spread of directions
+        directions = numpy.array(DIRECTIONS_3D, dtype=float).T
+        lows, highs = [], []
+        step = max(1, CHUNK_SIZE // len(DIRECTIONS_3D))
+        for start in range(0, count, step):
+            projected = rows[start:start + step].dot(directions)
+            low, high = projected.argmin(axis=0), projected.argmax(axis=0)
+            columns = numpy.arange(len(DIRECTIONS_3D))
+            lows.append((projected[low, columns], low + start))
+            highs.append((projected[high, columns], high + start))
+        seeds = set()
+        for picks, better in ((lows, numpy.less), (highs, numpy.greater)):
+            values, found = picks[0]
+            for other_values, other_found in picks[1:]:
+                replace = better(other_values, values)
+                values = numpy.where(replace, other_values, values)
+                found = numpy.where(replace, other_found, found)
+            seeds.update(found.tolist())
+        seeds = sorted(seeds)
+        corners = _simplex(hull, seeds)
+        if corners is None:
+            seeds = None
+    if seeds is None:
+        corners = _simplex(hull, range(count))
+        if corners is None:
+            raise HullError("The points are all on a plane")
+    faces = hull.start(*corners)
+    if seeds is not None:
+        # the hull of the extreme points rules out most of the other points
+        hull.assign(numpy.array(seeds), faces)
+        hull.run()
+        faces = [f for f, alive in enumerate(hull.alive) if alive]
+    everything = numpy.arange(count) if numpy is not None else range(count)
+    hull.assign(everything, faces)
+    hull.run()
+    corners, vertices = hull.corners()
+    if len(corners) == vertices:
+        return hull.triangles()
+    # start again from the corners alone, which are all extreme
+    if numpy is not None:
+        corners = numpy.array(corners)
+        return corners[convex_hull_3d(rows[corners])]
+    return index_buffer(corners[i] for i in convex_hull_3d([rows[i]
+        for i in corners]))
@@ -1,5 +1,22 @@
 import numbers
 import math
+from array import array
+from bisect import bisect_left, bisect_right
+
+from .core import numpy
+
+
+def _many(value):
+    """True for an array or sequence of numbers, rather than one number"""
+    return not isinstance(value, numbers.Number)
+
+
+def _affine(values, start, factor, offset):
+    """(value - start) * factor + offset for each of an array of values, as a
+    numpy array, or an `array('d')` without numpy"""
+    if numpy is not None:
+        return (numpy.asarray(values, dtype=float) - start) * factor + offset
+    return array('d', [(v - start) * factor + offset for v in values])
 
 class Interval(object):
     """
@@ -18,6 +35,11 @@ class Interval(object):
         divide using a float (into pieces with a remainder)
         convert a set of numbers, instead of just one
 
+       Calling an interval, `fraction` and `contains` also take a single array
+       or sequence of numbers, and convert all of them in one vectorized pass.
+       They return a numpy array if numpy is available, and an `array('d')`
+       (or a list of booleans for `contains`) otherwise.
+
        The interval is half-open by default. In other words, the start value is
        included in the interval, but the end value is not . [start, end)
     """
@@ -57,18 +79,28 @@ class Interval(object):
         """
         if len( args ) > 1:
             return [(arg - self.start) / self.length for arg in args]
+        elif _many(args[0]):
+            return _affine(args[0], self.start, 1.0 / self.length, 0.0)
         else:
             return ( args[0] - self.start ) / self.length
 
     def contains( self, value):
-        """tests if a value falls within the interval's bounds"""
-        return self.start <= value < self.end
+        """tests if a value falls within the interval's bounds. For an array
+        of values, this gives a mask with one boolean for each value."""
+        if not _many(value):
+            return self.start <= value < self.end
+        if numpy is not None:
+            value = numpy.asarray(value)
+            return (value >= self.start) & (value < self.end)
+        return [self.start <= v < self.end for v in value]
 
     def __call__( self, *args):
         """given a fractional value along the interval (between
         0.0 and 1.0), this returns the actual value"""
         if len( args ) > 1:
             return [((self.length * arg) + self.start) for arg in args]
+        elif _many(args[0]):
+            return _affine(args[0], 0.0, self.length, self.start)
         else:
             return (self.length * args[0]) + self.start
 
@@ -76,36 +108,25 @@ class Interval(object):
         """
             given an integer n, divide into n equal parts
             given a float n, divide into m parts of size n, and one remainder
-            returns an iterator that yeilds new Interval objects
+            returns a Subdivision, a sequence of the parts as new Interval
+            objects, which only makes each one when it is asked for
         """
-        if isinstance( number, int ):
+        if isinstance( number, numbers.Integral ):
             # divide into n parts
-            step = self.length / number
-            start = self.start
-            end = self.start
-            for i in range(number):
-                steps = i + 1
-                if steps < number:
-                    end = steps * step
-                else:
-                    end = self.end
-                interval = Interval( start, end )
-                start = end
-                yield interval
-        else:
-            # use this number to divide
-            steps = int( math.ceil( abs(self.length / number) ) )
-            start = self.start
-            end = self.start
-            for i in range(steps):
-                this_step = i + 1
-                if this_step < steps:
-                    end = this_step * number
-                else:
-                    end = self.end
-                interval = Interval( start, end )
-                start = end
-                yield interval
+            return Subdivision(self.start, self.end, self.length / number,
+                    number)
+        # use this number to divide
+        steps = int( math.ceil( abs(self.length / number) ) )
+        # rounding can make one part too many, which starts at the end
+        if steps > 1 and (self.start + (steps - 1) * number -
+                self.end) * self.length >= 0:
+            steps -= 1
+        return Subdivision(self.start, self.end, number, steps)
+
+    def breakpoints(self, number):
+        """the starts of the parts that `divide` gives, followed by the end of
+        the interval, as one numpy array or `array('d')`"""
+        return self.divide(number).breakpoints()
 
     def include(self, number):
         """Returns a new interval containing the number
@@ -133,21 +154,456 @@ class Interval(object):
 
 
 
+class Subdivision(object):
+    """The parts of an Interval divided into `count` pieces of size `step`,
+    where the last piece ends at `end` instead.
+
+    This is a lazy sequence: it only stores the numbers above, and makes each
+    part as a new Interval when it is asked for, so dividing into millions of
+    parts costs nothing until they are used. Any part can be found in O(1)
+    by its index, and `breakpoints` gives all of the boundaries at once.
+    """
+    def __init__(self, start, end, step, count):
+        self.start = start
+        self.end = end
+        self.step = step
+        self.count = max(0, count)
+
+    def __len__(self):
+        return self.count
+
+    def breakpoint(self, index):
+        """the start of part `index`, or the end for index == len(self)"""
+        if index >= self.count:
+            return self.end
+        return self.start + index * self.step
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("part %s of %s" % (index, self.count))
+        return Interval(self.breakpoint(index), self.breakpoint(index + 1))
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self[index]
+
+    def breakpoints(self):
+        """the starts of every part and the end of the last one, as a numpy
+        array, or an `array('d')` without numpy"""
+        if numpy is not None:
+            points = numpy.arange(self.count + 1) * float(self.step)
+            points += self.start
+        else:
+            points = array('d', [self.start + i * self.step
+                for i in range(self.count + 1)])
+        points[-1] = self.end
+        return points
+
+    def __repr__(self):
+        return "Subdivision(%s, %s, step=%s, count=%s)" % (self.start,
+                self.end, self.step, self.count)
+
+
 class Scale(object):
+    """A linear map from one interval, the domain, to another, the range.
+
+    The ratio of the lengths of the intervals is computed once, when either
+    interval is set, so each value only costs a subtraction, a multiplication
+    and an addition. Like intervals, a scale also converts a whole array of
+    values at once.
+    """
     def __init__(self, domain=(0.0, 1.0), range=(0.0, 1.0) ):
-        self.domain = Interval(*domain)
+        self._domain = Interval(*domain)
         self.range = Interval(*range)
 
+    @property
+    def domain(self):
+        return self._domain
+
+    @domain.setter
+    def domain(self, interval):
+        self._domain = interval
+        self._ratios()
+
+    @property
+    def range(self):
+        return self._range
+
+    @range.setter
+    def range(self, interval):
+        self._range = interval
+        self._ratios()
+
+    def _ratios(self):
+        """precompute the ratios of the lengths of the intervals, or None
+        when one of them is empty"""
+        domain, range = self._domain, self._range
+        self._forward = (range.length / domain.length
+                if domain.length else None)
+        self._backward = (domain.length / range.length
+                if range.length else None)
+
     def __call__(self, value ):
         """converts a value in the domain to a proportional
         value in the range"""
-        return self.range( self.domain.fraction( value ) )
+        if self._forward is None:
+            return self.range( self.domain.fraction( value ) )
+        if _many(value):
+            return _affine(value, self.domain.start, self._forward,
+                    self.range.start)
+        return (value - self.domain.start) * self._forward + self.range.start
 
     def reverse(self, value ):
         """converts a value in the range to a proportional
         value in the domain"""
-        return self.domain( self.range.fraction( value ) )
+        if self._backward is None:
+            return self.domain( self.range.fraction( value ) )
+        if _many(value):
+            return _affine(value, self.range.start, self._backward,
+                    self.domain.start)
+        return (value - self.range.start) * self._backward + self.domain.start
+
+
+def _spans(items):
+    """the starts and ends of some Intervals or (start, end) pairs"""
+    spans = [(i.start, i.end) if isinstance(i, Interval) else tuple(i)
+            for i in items]
+    return [s for s, e in spans], [e for s, e in spans]
+
 
+def _node(first, last):
+    """The node of the implicit tree holding an interval that covers the
+    centers first + 1 to last, counting from 1. Nodes are numbered in order,
+    so the node at depth d is a multiple of 2 ** (height - d - 1), and the
+    highest node in the range is the one divisible by the largest power of
+    two: the last center, with the bits below the highest bit where it
+    differs from first cleared."""
+    low = (first ^ last).bit_length() - 1
+    return (last >> low) << low
 
 
+class _CenteredIndex(object):
+    """A static centered interval tree over some of the intervals of an
+    IntervalTree.
 
+    The centers are the distinct starts of the intervals, and the tree over
+    them is implicit: the nodes are numbered 1 to m in order, and a node that
+    is a multiple of 2 ** t has children 2 ** (t - 1) below and above it.
+    Each interval is stored at the highest node whose center it contains,
+    twice: sorted by start, and sorted by end from the last. The intervals
+    of each node take a contiguous range, from first[node] to
+    first[node + 1], of both orderings. All the intervals are also kept
+    sorted by start, for the intervals that start inside a query.
+
+    Empty intervals contain nothing and are left out.
+    """
+    def __init__(self, ids, starts, ends):
+        if numpy is not None:
+            self._build_arrays(numpy.asarray(ids, dtype=numpy.intp), starts,
+                    ends)
+        else:
+            self._build_lists(ids, starts, ends)
+
+    def _build_lists(self, ids, starts, ends):
+        ids = [i for i in ids if starts[i] < ends[i]]
+        self.centers = centers = sorted(set(starts[i] for i in ids))
+        self.height = len(centers).bit_length()
+        nodes = dict((i, _node(bisect_left(centers, starts[i]),
+            bisect_left(centers, ends[i]))) for i in ids)
+        by_start = sorted(ids, key=lambda i: (nodes[i], starts[i]))
+        by_end = sorted(ids, key=lambda i: (nodes[i], -ends[i]))
+        self.start_ids = by_start
+        self.start_keys = [starts[i] for i in by_start]
+        self.end_ids = by_end
+        self.end_keys = [ends[i] for i in by_end]
+        counts = [0] * (len(centers) + 1)
+        for node in nodes.values():
+            counts[node] += 1
+        self.first = [0]
+        for count in counts:
+            self.first.append(self.first[-1] + count)
+        self.all_ids = sorted(ids, key=lambda i: starts[i])
+        self.all_starts = [starts[i] for i in self.all_ids]
+
+    def _build_arrays(self, ids, starts, ends):
+        ids = ids[starts[ids] < ends[ids]]
+        s, e = starts[ids], ends[ids]
+        self.centers = centers = numpy.unique(s)
+        self.height = len(centers).bit_length()
+        first = numpy.searchsorted(centers, s)
+        last = numpy.searchsorted(centers, e)
+        # the bit length of first ^ last is the exponent frexp gives
+        low = numpy.frexp((first ^ last).astype(float))[1] - 1
+        nodes = (last >> low) << low
+        order = numpy.lexsort((s, nodes))
+        self.start_ids, self.start_keys = ids[order], s[order]
+        order = numpy.lexsort((-e, nodes))
+        self.end_ids, self.end_keys = ids[order], e[order]
+        counts = numpy.bincount(nodes, minlength=len(centers) + 1)
+        self.first = numpy.concatenate(([0], numpy.cumsum(counts)))
+        order = numpy.argsort(s, kind='stable')
+        self.all_ids, self.all_starts = ids[order], s[order]
+
+    def containing(self, x):
+        """the ids of the intervals that contain x, one node at a time"""
+        found = []
+        count = len(self.centers)
+        node = 1 << (self.height - 1) if count else 0
+        step = node >> 1
+        while node:
+            if node <= count:
+                first, stop = self.first[node], self.first[node + 1]
+                if x < self.centers[node - 1]:
+                    keys, ids, below = self.start_keys, self.start_ids, True
+                else:
+                    keys, ids, below = self.end_keys, self.end_ids, False
+                for k in range(first, stop):
+                    if (keys[k] > x) if below else (keys[k] <= x):
+                        break
+                    found.append(ids[k])
+            else:
+                below = True
+            if not step:
+                break
+            node = node - step if below else node + step
+            step >>= 1
+        return found
+
+    def starting(self, start, end):
+        """the ids of the intervals that start after `start` and before
+        `end`"""
+        first = bisect_right(self.all_starts, start)
+        stop = bisect_left(self.all_starts, end)
+        return self.all_ids[first:stop] if first < stop else []
+
+    def containing_many(self, values):
+        """the query and interval ids of the intervals that contain each of
+        a numpy array of values. Every query walks down the same number of
+        levels, so they all walk together."""
+        queries = numpy.arange(len(values))
+        found_queries, found_ids = [], []
+        count = len(self.centers)
+        if not count:
+            return queries[:0], queries[:0]
+        node = numpy.full(len(values), 1 << (self.height - 1))
+        step = int(node[0]) >> 1 if len(values) else 0
+        while True:
+            real = node <= count
+            index = numpy.minimum(node, count)
+            below = ~real | (values < self.centers[index - 1])
+            for side, keys, ids in ((below, self.start_keys, self.start_ids),
+                    (~below, self.end_keys, self.end_ids)):
+                asked = numpy.flatnonzero(side & real)
+                x = values[asked]
+                first = self.first[index[asked]]
+                stop = self.first[index[asked] + 1]
+                # how many of the sorted keys of each node match
+                low, high = first.copy(), stop.copy()
+                while True:
+                    active = low < high
+                    if not active.any():
+                        break
+                    middle = (low + high) >> 1
+                    key = keys[numpy.where(active, middle, 0)]
+                    match = (key <= x) if keys is self.start_keys else (
+                            key > x)
+                    low = numpy.where(active & match, middle + 1, low)
+                    high = numpy.where(active & ~match, middle, high)
+                sizes = low - first
+                total = int(sizes.sum())
+                groups = numpy.repeat(numpy.arange(len(asked)), sizes)
+                offsets = numpy.arange(total) - (numpy.cumsum(sizes) -
+                        sizes)[groups]
+                found_queries.append(asked[groups])
+                found_ids.append(ids[first[groups] + offsets])
+            if not step:
+                break
+            node = numpy.where(below, node - step, node + step)
+            step >>= 1
+        return numpy.concatenate(found_queries), numpy.concatenate(found_ids)
+
+    def starting_many(self, starts, ends):
+        """`starting` for numpy arrays of queries"""
+        first = numpy.searchsorted(self.all_starts, starts, 'right')
+        stop = numpy.maximum(first, numpy.searchsorted(self.all_starts,
+            ends, 'left'))
+        sizes = stop - first
+        groups = numpy.repeat(numpy.arange(len(starts)), sizes)
+        offsets = numpy.arange(int(sizes.sum())) - (numpy.cumsum(sizes) -
+                sizes)[groups]
+        return groups, self.all_ids[first[groups] + offsets]
+
+
+class IntervalTree(object):
+    """An index over many Intervals, for finding the ones that contain a
+    value or that overlap another interval.
+
+    Like Interval, the intervals are half-open: an interval contains a value
+    if its start is at most the value and its end is greater than the
+    value, and two intervals overlap if they share any value, so intervals
+    that only touch don't overlap. Empty intervals contain nothing.
+
+    Intervals can be given as Interval objects or (start, end) pairs, and
+    are known by their index: the order they were given in, followed by the
+    order they were inserted in. All queries return sorted indices, and
+    `intervals` holds the intervals by index, with None for removed ones.
+
+    The intervals are kept in a few static centered interval trees of
+    roughly doubling sizes. A tree built from many intervals at once is a
+    single one of them, built in O(n log n). Inserting an interval adds a
+    tree of one interval, and merges the smallest trees together while they
+    are of similar sizes, so that there are never more than O(log n) of
+    them. A query walks down each tree, costing O(log n) for each, plus the
+    number of intervals found. Removed intervals are left out of the results
+    until more than half of the intervals have been removed, when the index
+    is rebuilt.
+
+    With numpy, many queries can be answered at once with `containing_many`
+    and `overlapping_many`, which walk every query down each tree together.
+    """
+    def __init__(self, intervals=()):
+        intervals = list(intervals)
+        starts, ends = _spans(intervals)
+        self.intervals = [i if isinstance(i, Interval) else Interval(*i)
+                for i in intervals]
+        self.starts = array('d', starts)
+        self.ends = array('d', ends)
+        self._alive = bytearray([1]) * len(intervals)
+        self._removed = 0
+        self._levels = []
+        self._rebuild()
+
+    def __len__(self):
+        return len(self.intervals) - self._removed
+
+    def _index(self, ids):
+        if numpy is not None:
+            starts = numpy.frombuffer(self.starts)
+            ends = numpy.frombuffer(self.ends)
+            return _CenteredIndex(ids, starts, ends)
+        return _CenteredIndex(ids, self.starts, self.ends)
+
+    def insert(self, interval):
+        """Add an interval, and return its index"""
+        if not isinstance(interval, Interval):
+            interval = Interval(*interval)
+        index = len(self.intervals)
+        self.intervals.append(interval)
+        self.starts.append(interval.start)
+        self.ends.append(interval.end)
+        self._alive.append(1)
+        ids = array('l', [index])
+        while self._levels and len(self._levels[-1][0]) <= 2 * len(ids):
+            ids = self._levels.pop()[0] + ids
+        self._levels.append((ids, self._index(ids)))
+        return index
+
+    def remove(self, index):
+        """Remove the interval with an index"""
+        if not self._alive[index]:
+            raise KeyError("interval %s was already removed" % index)
+        self._alive[index] = 0
+        self.intervals[index] = None
+        self._removed += 1
+        self._stale += 1
+        if 2 * self._stale > sum(len(ids) for ids, level in self._levels):
+            self._rebuild()
+
+    def _rebuild(self):
+        """build a single index of every interval that hasn't been removed"""
+        ids = array('l', [i for i, alive in enumerate(self._alive) if alive])
+        self._levels = [(ids, self._index(ids))] if ids else []
+        self._stale = 0
+
+    def _alive_mask(self):
+        return numpy.frombuffer(self._alive, dtype=bool)
+
+    def containing(self, value):
+        """Get the sorted indices of the intervals that contain a value"""
+        found = []
+        for ids, level in self._levels:
+            found.extend(int(i) for i in level.containing(value)
+                    if self._alive[i])
+        found.sort()
+        return found
+
+    def overlapping(self, interval):
+        """Get the sorted indices of the intervals that overlap an
+        Interval or (start, end) pair"""
+        (start,), (end,) = _spans([interval])
+        if not start < end:
+            return []
+        found = []
+        for ids, level in self._levels:
+            # the intervals that contain the start of the query, and the
+            # ones that start inside it
+            found.extend(int(i) for i in level.containing(start)
+                    if self._alive[i])
+            found.extend(int(i) for i in level.starting(start, end)
+                    if self._alive[i])
+        found.sort()
+        return found
+
+    def _results(self, found):
+        """sort (query, index) pairs found in each level, leaving out
+        removed intervals"""
+        if not found:
+            empty = numpy.zeros(0, dtype=numpy.intp)
+            return empty, empty.copy()
+        queries = numpy.concatenate([q for q, i in found])
+        indices = numpy.concatenate([i for q, i in found])
+        alive = self._alive_mask()[indices]
+        queries, indices = queries[alive], indices[alive]
+        order = numpy.lexsort((indices, queries))
+        return queries[order], indices[order]
+
+    def containing_many(self, values):
+        """Find the intervals that contain each of many values.
+
+        Returns two arrays: the index of a value and the index of an
+        interval that contains it, for every such pair, sorted by value and
+        then by interval.
+        """
+        if numpy is None:
+            queries, indices = array('l'), array('l')
+            for q, value in enumerate(values):
+                found = self.containing(value)
+                queries.extend([q] * len(found))
+                indices.extend(found)
+            return queries, indices
+        values = numpy.asarray(values, dtype=float)
+        return self._results([level.containing_many(values)
+            for ids, level in self._levels])
+
+    def overlapping_many(self, intervals):
+        """Find the intervals that overlap each of many intervals.
+
+        The queries are a list of Intervals or (start, end) pairs, or a numpy
+        array with a column of starts and a column of ends. Returns two
+        arrays like `containing_many`: the index of a query and the index of
+        an interval that overlaps it, for every such pair.
+        """
+        if numpy is None:
+            queries, indices = array('l'), array('l')
+            for q, interval in enumerate(intervals):
+                found = self.overlapping(interval)
+                queries.extend([q] * len(found))
+                indices.extend(found)
+            return queries, indices
+        if isinstance(intervals, numpy.ndarray):
+            starts, ends = intervals[:, 0], intervals[:, 1]
+        else:
+            starts, ends = _spans(intervals)
+        starts = numpy.asarray(starts, dtype=float)
+        ends = numpy.asarray(ends, dtype=float)
+        asked = numpy.flatnonzero(starts < ends)
+        found = []
+        for ids, level in self._levels:
+            queries, indices = level.containing_many(starts[asked])
+            found.append((asked[queries], indices))
+            found.append(level.starting_many(starts, ends))
+        return self._results(found)
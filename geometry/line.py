@@ -1,5 +1,138 @@
+"""This module contains line and line segment objects, along with batch
+intersection kernels that work on many lines or segments at once.
+
+The batch kernels take packed coordinates (see `vectors.pack`) for the start
+points and directions of the lines, and compare them pairwise: line i of the
+first group with line i of the second. Pairs without a solution, such as
+parallel lines, get `nan` parameters. Lines count as parallel when the sine
+of the angle between them is roughly zero for the current tolerance (see
+`core.Tolerance`).
+"""
+import math
+from array import array
+
+from .core import current_tolerance, numpy
 from .vector3d import Vector3d
+from .point2d import Point2d
+from .point import PointBase
 from .point3d import Point3d
+from .vectors import Vector2dArray, pack
+
+NAN = float('nan')
+
+
+def _degenerate():
+    raise ValueError("A line needs a direction that is not zero")
+
+
+def _closest_parameters(p, u, q, v, tolerance):
+    """the parameters s and t of the closest points p + s * u and q + t * v
+    of two lines, or None if the lines are parallel"""
+    wx, wy, wz = p[0] - q[0], p[1] - q[1], p[2] - q[2]
+    a = u[0] * u[0] + u[1] * u[1] + u[2] * u[2]
+    b = u[0] * v[0] + u[1] * v[1] + u[2] * v[2]
+    c = v[0] * v[0] + v[1] * v[1] + v[2] * v[2]
+    d = u[0] * wx + u[1] * wy + u[2] * wz
+    e = v[0] * wx + v[1] * wy + v[2] * wz
+    if a == 0 or c == 0:
+        _degenerate()
+    denominator = a * c - b * b
+    # relative to a * c, the denominator is the squared sine of the angle
+    # between the lines
+    if tolerance.is_zero(denominator / (a * c), 1.0):
+        return None
+    return (b * e - c * d) / denominator, (a * e - b * d) / denominator
+
+
+def closest_parameters(origins, directions, other_origins, other_directions):
+    """Find the closest points between many pairs of 3d lines.
+
+    Returns two arrays of parameters, s and t, so that the closest points are
+    `origins + s * directions` and `other_origins + t * other_directions`.
+    Parallel pairs get `nan`, and a direction of zero raises a ValueError.
+    """
+    tolerance = current_tolerance()
+    p, u = pack(origins, 3), pack(directions, 3)
+    q, v = pack(other_origins, 3), pack(other_directions, 3)
+    if numpy is not None:
+        p, u, q, v = [x.reshape(-1, 3) for x in (p, u, q, v)]
+        w = p - q
+        a = (u * u).sum(axis=1)
+        b = (u * v).sum(axis=1)
+        c = (v * v).sum(axis=1)
+        d = (u * w).sum(axis=1)
+        e = (v * w).sum(axis=1)
+        if not (a * c).all():
+            _degenerate()
+        denominator = a * c - b * b
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            parallel = (numpy.abs(denominator / (a * c)) <=
+                    tolerance.bounds(1.0))
+            denominator = numpy.where(parallel, NAN, denominator)
+            return (b * e - c * d) / denominator, (a * e - b * d) / denominator
+    s, t = array('d'), array('d')
+    rows = zip(*[zip(*[iter(x)] * 3) for x in (p, u, q, v)])
+    for row in rows:
+        found = _closest_parameters(*row, tolerance=tolerance)
+        s.append(NAN if found is None else found[0])
+        t.append(NAN if found is None else found[1])
+    return s, t
+
+
+def _segment_parameters(a, b, c, d, tolerance):
+    """the parameters t and u where the 2d lines through segments ab and cd
+    cross, or None if they are parallel"""
+    rx, ry = b[0] - a[0], b[1] - a[1]
+    sx, sy = d[0] - c[0], d[1] - c[1]
+    denominator = rx * sy - ry * sx
+    scale = math.sqrt((rx * rx + ry * ry) * (sx * sx + sy * sy))
+    if scale == 0 or tolerance.is_zero(denominator / scale, 1.0):
+        return None
+    qx, qy = c[0] - a[0], c[1] - a[1]
+    return ((qx * sy - qy * sx) / denominator,
+            (qx * ry - qy * rx) / denominator)
+
+
+def intersect_segments(starts, ends, other_starts, other_ends):
+    """Intersect many pairs of 2d line segments.
+
+    Returns a mask that is true for the pairs that cross (endpoints
+    included), and a Vector2dArray of the crossing points, which are `nan`
+    for the pairs that don't cross. Parallel segments never cross, even if
+    they overlap.
+    """
+    tolerance = current_tolerance()
+    a, b = pack(starts, 2), pack(ends, 2)
+    c, d = pack(other_starts, 2), pack(other_ends, 2)
+    if numpy is not None:
+        a, b, c, d = [x.reshape(-1, 2) for x in (a, b, c, d)]
+        r, s, q = b - a, d - c, c - a
+        denominator = r[:, 0] * s[:, 1] - r[:, 1] * s[:, 0]
+        scale = numpy.sqrt((r * r).sum(axis=1) * (s * s).sum(axis=1))
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            parallel = (scale == 0) | (numpy.abs(denominator / scale) <=
+                    tolerance.bounds(1.0))
+            denominator = numpy.where(parallel, NAN, denominator)
+            t = (q[:, 0] * s[:, 1] - q[:, 1] * s[:, 0]) / denominator
+            u = (q[:, 0] * r[:, 1] - q[:, 1] * r[:, 0]) / denominator
+            hits = (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+        points = numpy.where(hits[:, None], a + t[:, None] * r, NAN)
+        return hits, Vector2dArray.fromBuffer(points.ravel())
+    hits, points = [], array('d')
+    rows = zip(*[zip(*[iter(x)] * 2) for x in (a, b, c, d)])
+    for row in rows:
+        found = _segment_parameters(*row, tolerance=tolerance)
+        hit = found is not None and 0 <= found[0] <= 1 and 0 <= found[1] <= 1
+        hits.append(hit)
+        if hit:
+            start, end = row[0], row[1]
+            t = found[0]
+            points.extend((start[0] + t * (end[0] - start[0]),
+                start[1] + t * (end[1] - start[1])))
+        else:
+            points.extend((NAN, NAN))
+    return hits, Vector2dArray.fromBuffer(points)
+
 
 class Line3d(object):
     """A 3d line object
@@ -15,7 +148,8 @@ class Line3d(object):
 
     """
     def __init__(self, *args):
-        if isinstance(args[0], Vector3d):
+        if isinstance(args[0], Vector3d) and not isinstance(args[0],
+                PointBase):
             # assume we have a parallel vector then a point
             self.vector = args[0]
             self.point = args[1]
@@ -24,6 +158,39 @@ class Line3d(object):
             self.vector = args[1] - args[0]
             self.point = args[0]
 
+    def pointAt(self, t):
+        """Get the point at `point + t * vector`"""
+        p, v = self.point, self.vector
+        return Point3d(p[0] + t * v[0], p[1] + t * v[1], p[2] + t * v[2])
+
+    def closest_points(self, other):
+        """Get the closest points between this line and another line, as a
+        pair with the point on this line first, or None if the lines are
+        parallel."""
+        found = _closest_parameters(self.point, self.vector, other.point,
+                other.vector, current_tolerance())
+        if found is None:
+            return None
+        return self.pointAt(found[0]), other.pointAt(found[1])
+
+    def intersect(self, other):
+        """Finds the intersection of this line with another line or a plane.
+
+        Two lines intersect if their closest points are roughly the same, and
+        parallel lines never intersect. Returns a Point3d or None.
+        """
+        if isinstance(other, Line3d):
+            closest = self.closest_points(other)
+            if closest is None:
+                return None
+            a, b = closest
+            scale = max(abs(c) for c in tuple(a) + tuple(b))
+            if current_tolerance().is_zero((a - b).length, scale):
+                return a
+            return None
+        # planes know how to intersect lines
+        return other.intersect(self)
+
     def __repr__(self):
         return 'Line3d( %s, %s )' % (self.vector, self.point)
 
@@ -33,6 +200,21 @@ class Line3d(object):
 class LineSegment2d(object):
     def __init__(self, start_point, end_point):
         self.coords = (start_point, end_point)
+
+    def intersect(self, other):
+        """Finds the point where this segment crosses another segment,
+        including their endpoints. Returns a Point2d, or None if they don't
+        cross or are parallel."""
+        start, end = self.coords
+        found = _segment_parameters(start, end, other.coords[0],
+                other.coords[1], current_tolerance())
+        if found is None:
+            return None
+        t, u = found
+        if 0 <= t <= 1 and 0 <= u <= 1:
+            return Point2d(start[0] + t * (end[0] - start[0]),
+                    start[1] + t * (end[1] - start[1]))
+        return None
+
     def __repr__(self):
         return 'LineSegment2d( %s, %s )' % self.coords
-
@@ -1,5 +1,8 @@
-"""This module contains classes for matrices in pure python (no numpy).
-    Matrices are represented as lists of lists
+"""This module contains classes for matrices.
+    Matrices are represented as tuples of tuples. When numpy is available,
+    products, sums, differences, scalar operations and transposes are
+    computed with numpy instead, and the pure python versions are used as
+    a fallback.
 
     Relevant reading:
         * matrix api of numpy - http://stackoverflow.com/questions/3127404/how-to-represent-matrices-in-python
@@ -9,9 +12,8 @@
 
 import math
 import numbers
-import itertools
 
-from .core import isRoughlyZero
+from .core import numpy, current_tolerance
 
 class MatrixError(Exception):
     def __init__(self, msg):
@@ -22,14 +24,32 @@ class MatrixError(Exception):
 class Matrix(object):
     """A class for all kinds of matrix objects.
         Matrices are immutable.
+
+    Because they are immutable, transposes, row and column slices and
+    submatrices are views that share the storage of the matrix they came
+    from, instead of copying it. Use `m[i, j]` to get a single value,
+    `m[a:b]` for a slice of rows, and `m[a:b, c:d]` or `submatrix` for a
+    block of the matrix. `m[i]` still returns row i as a tuple.
     """
     def __init__(self, table=None, rows=3, columns=3):
         """Nested iterables of values can be passed, or you can designate a size
         of the matrix. The default is 3x3 identity matrix."""
-        if table:
+        self._array = None
+        self._lu = None
+        if numpy is not None and isinstance(table, numpy.ndarray):
+            # keep a copy of the array, and only build the table if it is
+            # asked for
+            if table.ndim != 2 or not table.size:
+                raise MatrixError(
+                    "Matrices can only be made from 2 dimensional arrays")
+            self._array = numpy.array(table, dtype=float)
+            self._array.flags.writeable = False
+            self._table = None
+            return
+        elif table:
             # just use the given table, iterate through it and convert it to
             # tuples
-            self.table = tuple( [ tuple( r ) for r in table ] )
+            self._table = tuple( [ tuple( r ) for r in table ] )
             if not self.is_rectangular():
                 msg = """The iterable used to produce this Matrix had unclear
                 dimensions. Either the rows or the columns (or both) are not even
@@ -38,7 +58,7 @@ class Matrix(object):
                 raise MatrixError( msg )
         else:
             # build an identity matrix
-            self.table = []
+            table = []
             for i in range(rows):
                 row = []
                 for j in range(columns):
@@ -47,8 +67,79 @@ class Matrix(object):
                     else:
                         val = 0.0
                     row.append( val )
-                self.table.append( tuple(row) )
-            self.table = tuple(self.table)
+                table.append( tuple(row) )
+            self._table = tuple(table)
+        # a matrix built from a table is a view of all of that table
+        self._base = self._table
+        self._row_range = range(len(self._table))
+        self._col_range = range(len(self._table[0]))
+        self._transposed = False
+
+    @classmethod
+    def _from_array(cls, array):
+        """wrap a numpy array, which may be a view of another matrix's array,
+        without copying it"""
+        new = cls.__new__(cls)
+        new._array = array
+        if array.flags.writeable:
+            array.flags.writeable = False
+        new._table = None
+        new._lu = None
+        return new
+
+    @classmethod
+    def _view(cls, base, row_range, col_range, transposed):
+        """make a matrix that reads its values from the table of another"""
+        if not len(row_range) or not len(col_range):
+            raise MatrixError("A Matrix must have at least one row and column")
+        new = cls.__new__(cls)
+        new._array = None
+        new._table = None
+        new._lu = None
+        new._base = base
+        new._row_range = row_range
+        new._col_range = col_range
+        new._transposed = transposed
+        return new
+
+    def _row(self, i):
+        """get row i as a tuple"""
+        if self._table is not None:
+            return self._table[i]
+        if self._array is not None:
+            return tuple(self._array[i].tolist())
+        base = self._base
+        if self._transposed:
+            column = self._col_range[i]
+            return tuple(base[r][column] for r in self._row_range)
+        row = base[self._row_range[i]]
+        return tuple(row[c] for c in self._col_range)
+
+    @property
+    def table(self):
+        """the values of the matrix, as a tuple of row tuples"""
+        if self._table is None:
+            if self._array is not None:
+                self._table = tuple(map(tuple, self._array.tolist()))
+            else:
+                self._table = tuple(self._row(i) for i in range(self.rows()))
+        return self._table
+
+    @property
+    def array(self):
+        """the values of the matrix as a read-only numpy array of floats.
+        This is only available if numpy is installed."""
+        if self._array is None:
+            self._array = numpy.array(self.table, dtype=float)
+            self._array.flags.writeable = False
+        return self._array
+
+    def _check_shape(self, other):
+        if (self.rows(), self.cols()) != (other.rows(), other.cols()):
+            msg = """Matrices must have the same dimensions to be added or
+            subtracted. This matrix is %sx%s and the other matrix is
+            %sx%s.""" % (self.rows(), self.cols(), other.rows(), other.cols())
+            raise MatrixError( msg )
 
     def __iter__(self):
         """iterate through the table of the matrix"""
@@ -62,22 +153,57 @@ class Matrix(object):
                 yield item
 
     def __getitem__(self, key):
-        """gets the row from the table of the Matrix"""
-        return self.table[key]
+        """gets a row from the table of the Matrix as a tuple, a single value
+        with m[i, j], or a view of part of the Matrix when slices are used.
+        """
+        if isinstance(key, tuple):
+            i, j = key
+            if isinstance(i, slice) or isinstance(j, slice):
+                return self.submatrix(i, j)
+            if self._array is not None:
+                return float(self._array[i, j])
+            if self._table is not None:
+                return self._table[i][j]
+            if self._transposed:
+                i, j = j, i
+            return self._base[self._row_range[i]][self._col_range[j]]
+        if isinstance(key, slice):
+            return self.submatrix(key, slice(None))
+        return self._row(key)
+
+    def submatrix(self, rows=slice(None), cols=slice(None)):
+        """Get a view of a block of this matrix. `rows` and `cols` can be
+        slices or single indices."""
+        if not isinstance(rows, slice):
+            rows = range(self.rows())[rows]
+            rows = slice(rows, rows + 1)
+        if not isinstance(cols, slice):
+            cols = range(self.cols())[cols]
+            cols = slice(cols, cols + 1)
+        if self._array is not None:
+            view = self._array[rows, cols]
+            if not view.size:
+                raise MatrixError(
+                        "A Matrix must have at least one row and column")
+            return self._from_array(view)
+        if self._transposed:
+            return self._view(self._base, self._row_range[cols],
+                    self._col_range[rows], True)
+        return self._view(self._base, self._row_range[rows],
+                self._col_range[cols], False)
 
     def __len__(self):
         """gets the number of rows in the matrix"""
-        return len(self.table)
+        return self.rows()
 
     def is_rectangular(self):
-        """This method is used to ensure that all rows are the smae length and
-        all columns are the same length."""
-        rows = self.rows()
-        for col in self.iter_cols():
-            if len(col) != rows:
-                return False
-        cols = self.cols()
-        for row in self:
+        """This method is used to ensure that all rows are the same length,
+        which also means that all the columns are the same length."""
+        if self._table is None:
+            # views and arrays are always rectangular
+            return True
+        cols = len(self._table[0])
+        for row in self._table:
             if len(row) != cols:
                 return False
         return True
@@ -88,19 +214,30 @@ class Matrix(object):
 
     def cols(self):
         """return the number of columns in this matrix"""
-        return len( self.table[0] )
+        if self._array is not None:
+            return self._array.shape[1]
+        if self._transposed:
+            return len(self._row_range)
+        return len(self._col_range)
 
     def rows(self):
         """return the number of rows in this matrix"""
-        return len( self.table )
+        if self._array is not None:
+            return self._array.shape[0]
+        if self._transposed:
+            return len(self._col_range)
+        return len(self._row_range)
 
     def transpose(self):
-        """Return a new Matrix with columns and rows transposed"""
-        return Matrix( tuple(zip( *self.table ) ) )
+        """Return a view of this Matrix with columns and rows transposed"""
+        if self._array is not None:
+            return self._from_array(self._array.T)
+        return self._view(self._base, self._row_range, self._col_range,
+                not self._transposed)
 
     def iter_cols(self):
         """iterate through a transposed version of this Matrix"""
-        return itertools.izip( *self.table )
+        return zip( *self.table )
 
     def row_map(self, function, *args):
         """map a function to each row of this matrix, and return the resulting
@@ -118,7 +255,7 @@ class Matrix(object):
         matrices.
         """
         row_map = lambda *r: map(function, *r)
-        return Matrix( itertools.imap( row_map, self, *args ) )
+        return Matrix( map( row_map, self, *args ) )
 
     def __mul__( self, other ):
         """get matrix product, be sure that sizes fit.
@@ -136,6 +273,8 @@ class Matrix(object):
                 other matrix. This matrix has %s columns and the other matrix
                 has %s rows.""" % (cols, rows)
                 raise MatrixError( msg )
+            if numpy is not None:
+                return self._from_array( numpy.dot( self.array, other.array ) )
             # get the product
             new = []
             # for each row in this
@@ -157,6 +296,8 @@ class Matrix(object):
             return Matrix( new )
         else:
             # assume it's a number
+            if numpy is not None:
+                return self._from_array( self.array * other )
             mult = lambda x: x * other
             return self.cell_map( mult )
 
@@ -164,10 +305,15 @@ class Matrix(object):
         """add this matrix to another, or add a number
         """
         if isinstance(other, Matrix):
+            self._check_shape(other)
+            if numpy is not None:
+                return self._from_array( self.array + other.array )
             add = lambda x, y: x + y
             return self.cell_map(add, other)
         else:
             # assume it's a number
+            if numpy is not None:
+                return self._from_array( self.array + other )
             add = lambda x: x + other
             return self.cell_map( add )
 
@@ -175,13 +321,51 @@ class Matrix(object):
         """subtract another Matrix from this one, or subtract a number.
         """
         if isinstance(other, Matrix):
+            self._check_shape(other)
+            if numpy is not None:
+                return self._from_array( self.array - other.array )
             sub = lambda x, y: x - y
             return self.cell_map(sub, other)
         else:
             # assume it's a number
+            if numpy is not None:
+                return self._from_array( self.array - other )
             sub = lambda x: x - other
             return self.cell_map( sub )
 
+    @property
+    def lu(self):
+        """The LU factorization of this matrix, with partial pivoting. It is
+        computed the first time it is needed and then kept, since matrices
+        are immutable. It is computed again if the current tolerance has
+        changed since, as that decides whether the matrix is singular."""
+        if self._lu is None or self._lu.tolerance is not current_tolerance():
+            if not self.is_square():
+                msg = """Only square matrices can be factorized. This matrix
+                is %sx%s.""" % (self.rows(), self.cols())
+                raise MatrixError( msg )
+            self._lu = LU(self)
+        return self._lu
+
+    def det(self):
+        """the determinant of this matrix"""
+        return self.lu.det()
+
+    def inverse(self):
+        """Return the inverse of this matrix"""
+        return self.lu.solve_many(Matrix(rows=self.rows(),
+            columns=self.rows()))
+
+    def solve(self, b):
+        """Solve the linear system self * x = b for x, where b is a sequence
+        of numbers with one number per row. Returns x as a tuple."""
+        return self.lu.solve(b)
+
+    def solve_many(self, B):
+        """Solve self * X = B for X, where each column of the Matrix B is a
+        right hand side. Returns X as a Matrix."""
+        return self.lu.solve_many(B)
+
     def __repr__(self):
         row_repr = lambda r: ', '.join([str(c) for c in r])
         return '<Matrix([\n%s\n])>' % '\n'.join(
@@ -189,3 +373,142 @@ class Matrix(object):
             )
 
 
+
+
+class LU(object):
+    """The LU factorization of a square Matrix, with partial pivoting:
+
+        P * A = L * U
+
+    L (below the diagonal, with an implicit diagonal of ones) and U (on and
+    above the diagonal) are stored together in `table`, and `perm` gives the
+    row of A that ended up in each row. Once a matrix is factorized, each
+    solve only costs a forward and a backward substitution.
+
+    Pivots are chosen and tested in proportion to the size of the row they
+    came from (its sum of absolute values), so rows of very different sizes
+    don't hide each other. The matrix is singular if a pivot is roughly zero
+    next to its row, with the current tolerance (see `core.Tolerance`), which
+    is kept as `tolerance`.
+    """
+    def __init__(self, matrix):
+        self.size = size = matrix.rows()
+        self.sign = 1
+        self.singular = False
+        perm = list(range(size))
+        self.tolerance = tolerance = current_tolerance()
+        if numpy is not None:
+            a = numpy.array(matrix.array)
+            scale = numpy.abs(a).sum(axis=1)
+            if size and not scale.all():
+                # a row of zeros
+                self.singular = True
+                scale[scale == 0] = 1.0
+            for k in range(size):
+                p = k + int(numpy.argmax(numpy.abs(a[k:, k]) / scale[k:]))
+                if tolerance.is_zero(a[p, k] / scale[p], 1.0):
+                    self.singular = True
+                    continue
+                if p != k:
+                    a[[k, p]] = a[[p, k]]
+                    scale[[k, p]] = scale[[p, k]]
+                    perm[k], perm[p] = perm[p], perm[k]
+                    self.sign = -self.sign
+                a[k + 1:, k] /= a[k, k]
+                a[k + 1:, k + 1:] -= numpy.outer(a[k + 1:, k], a[k, k + 1:])
+            self.table = a
+        else:
+            a = [list(r) for r in matrix]
+            scale = [sum(abs(c) for c in r) for r in a]
+            if 0 in scale:
+                # a row of zeros
+                self.singular = True
+                scale = [s or 1.0 for s in scale]
+            for k in range(size):
+                p = max(range(k, size), key=lambda i: abs(a[i][k]) / scale[i])
+                if tolerance.is_zero(a[p][k] / scale[p], 1.0):
+                    self.singular = True
+                    continue
+                if p != k:
+                    a[k], a[p] = a[p], a[k]
+                    scale[k], scale[p] = scale[p], scale[k]
+                    perm[k], perm[p] = perm[p], perm[k]
+                    self.sign = -self.sign
+                pivot_row = a[k]
+                pivot = pivot_row[k]
+                for i in range(k + 1, size):
+                    row = a[i]
+                    factor = row[k] / pivot
+                    row[k] = factor
+                    if factor:
+                        for j in range(k + 1, size):
+                            row[j] -= factor * pivot_row[j]
+            self.table = a
+        self.perm = perm
+
+    def det(self):
+        """the determinant of the factorized matrix"""
+        if self.singular:
+            return 0.0
+        det = float(self.sign)
+        for i in range(self.size):
+            det *= self.table[i][i]
+        return float(det)
+
+    def _check(self, rows):
+        if self.singular:
+            raise MatrixError("This matrix is singular, so it cannot be "
+                    "inverted or used to solve a system")
+        if rows != self.size:
+            msg = """The right hand side has %s rows, but the matrix has %s
+            rows.""" % (rows, self.size)
+            raise MatrixError( msg )
+
+    def solve(self, b):
+        """Solve A * x = b for a single right hand side, returning x as a
+        tuple."""
+        b = list(b)
+        self._check(len(b))
+        x = self.solve_many(Matrix([[v] for v in b]))
+        return tuple(r[0] for r in x)
+
+    def solve_many(self, B):
+        """Solve A * X = B, where each column of B is a right hand side.
+        Returns X as a Matrix."""
+        if not isinstance(B, Matrix):
+            B = Matrix(B)
+        self._check(B.rows())
+        n = self.size
+        a = self.table
+        if numpy is not None:
+            x = numpy.array(B.array)[self.perm]
+            for i in range(1, n):
+                x[i] -= a[i, :i].dot(x[:i])
+            for i in range(n - 1, -1, -1):
+                x[i] -= a[i, i + 1:].dot(x[i + 1:])
+                x[i] /= a[i, i]
+            return Matrix._from_array(x)
+        x = [list(B[p]) for p in self.perm]
+        columns = range(B.cols())
+        # forward substitution with L
+        for i in range(n):
+            row = x[i]
+            for k in range(i):
+                factor = a[i][k]
+                if factor:
+                    other = x[k]
+                    for j in columns:
+                        row[j] -= factor * other[j]
+        # back substitution with U
+        for i in range(n - 1, -1, -1):
+            row = x[i]
+            for k in range(i + 1, n):
+                factor = a[i][k]
+                if factor:
+                    other = x[k]
+                    for j in columns:
+                        row[j] -= factor * other[j]
+            pivot = a[i][i]
+            for j in columns:
+                row[j] /= pivot
+        return Matrix(x)
@@ -1,10 +1,17 @@
-import math
+"""This module contains mesh classes.
+
+The WingedEdgeMesh stores its connectivity in flat integer arrays instead of
+per-element Python objects, so that meshes with tens of millions of faces
+stay small. Vertices, half-edges and faces are referred to by their index.
+"""
 import numbers
+from array import array
 
-from .core import isRoughlyZero
-from .vector3d import Vector3d
+from .core import numpy
 from .point3d import Point3d
 from .points import PointSet
+from .vectors import Vector3dArray, index_buffer
+from .sparse import SparseMatrix
 
 class Edge(object):
     """This is a class roughly equivalent to a line segment. It is basically a
@@ -15,12 +22,17 @@ class Edge(object):
         """The initialization methods assumes that it will receive two points
         """
         self.points = (start, end)
+        self.start = self.points[0]
+        self.end = self.points[1]
 
     def __getitem__(self, key):
         return self.points.__getitem__(key)
 
-    def __len__(self):
-        return self[0].distanceTo(self[1])
+    @property
+    def length(self):
+        """Get the length of this Edge (the distance between two points)
+        """
+        return self.end.distanceTo(self.start)
 
 class PlanarFace(object):
     """This is meant to hold triangles and polygon facets for mesh-lik
@@ -28,19 +40,6 @@ class PlanarFace(object):
     """
     pass
 
-class Edge(object):
-    """An object that links two points"""
-    def __init__(start, end):
-        self.points = (start, end)
-        self.start = self.points[0]
-        self.end = self.points[1]
-
-    @property
-    def length(self):
-        """Get the length of this Edge (the distance between two points)
-        """
-        return self.end.distanceTo(self.start)
-
 class Polyline(PointSet):
     """An object that contains a point set and links between the points."""
     pass
@@ -53,37 +52,247 @@ class Polygon(PointSet):
     """
     pass
 
-class MeshVertex(Point3D):
-    """A point3d for use within a mesh that has all the functionality of a
-    point, but also contains adjacency information.
-    """
-    def __init__(self):
-        self.adjacentEdges = []
 
-class MeshFace(object):
-    """A mesh face has a set of edges that are all connected into a closed
-    polygon.
-    """
-    def __init__(self):
-        self.edges = []
+class WingedEdgeMesh(object):
+    """A triangle mesh that stores adjacency information between faces,
+    edges and vertices as half-edges.
 
-class MeshEdge(Edge):
-    """An edge with adjacency information.
-    """
-    def __init__(self):
-        self.adjacentFaces = []
-        self.adjacentEdges = []
+    Each triangle f has three half-edges, 3f, 3f + 1 and 3f + 2, running
+    around it in order. Because of this layout, the face, next and previous
+    half-edge of any half-edge are computed rather than stored, and the
+    origin vertex of each half-edge is just the flattened face list. The only
+    connectivity arrays that are stored are:
 
+        faces    - the origin vertex of each half-edge, three per face
+        twins    - the opposite half-edge of each half-edge, or -1 if the
+                   half-edge is on the boundary
+        outgoing - one half-edge leaving each vertex, or -1 for vertices that
+                   are not used by any face. For boundary vertices, this is
+                   the boundary half-edge, so that walking around the vertex
+                   from it visits every face.
 
-class WingedEdgeMesh(object):
-    """A mesh that stores adjacency information between faces, edges and
-    vertices.
+    All lookups are O(1). Building the mesh pairs up twins by sorting the
+    half-edges by their vertices with numpy, which is O(n log n), or with a
+    dictionary of them without numpy. Meshes whose edges are shared by more
+    than two faces are not manifold, and raise a ValueError.
     """
-    def __init__(self):
-        self.faces = []
-        self.edges = []
-        self.vertices = []
-        pass
+    def __init__(self, vertices, faces):
+        """`vertices` can be a PointSet, a vector array, a numpy array or a
+        list of points. `faces` can be a flat sequence of vertex indices,
+        three per triangle, or a sequence of triangles."""
+        self.vertices = Vector3dArray(vertices)
+        if numpy is not None:
+            self.faces = numpy.asarray(faces, dtype=numpy.intp).ravel()
+        elif isinstance(faces, array):
+            self.faces = faces
+        else:
+            faces = list(faces)
+            if faces and not isinstance(faces[0], numbers.Integral):
+                faces = [v for face in faces for v in face]
+            self.faces = array('l', faces)
+        if len(self.faces) % 3:
+            raise ValueError("Faces must be triangles")
+        self._build()
+
+    def _build(self):
+        vertex_count = len(self.vertices)
+        size = len(self.faces)
+        origins = self.faces
+        if numpy is not None:
+            halfedges = numpy.arange(size)
+            targets = origins[halfedges - halfedges % 3 + (halfedges + 1) % 3]
+            keys = origins * vertex_count + targets
+            twin_keys = targets * vertex_count + origins
+            order = numpy.argsort(keys, kind='stable')
+            sorted_keys = keys[order]
+            edges = numpy.sort(numpy.minimum(keys, twin_keys))
+            shared = numpy.flatnonzero(edges[2:] == edges[:-2])
+            if len(shared):
+                key = int(edges[shared[0]])
+                self._non_manifold(key // vertex_count, key % vertex_count)
+            positions = numpy.searchsorted(sorted_keys, twin_keys)
+            positions = numpy.minimum(positions, size - 1)
+            if size:
+                found = sorted_keys[positions] == twin_keys
+                self.twins = numpy.where(found, order[positions], -1)
+            else:
+                self.twins = numpy.zeros(0, dtype=numpy.intp)
+            outgoing = numpy.full(vertex_count, -1, dtype=numpy.intp)
+            outgoing[origins] = halfedges
+            boundary = numpy.flatnonzero(self.twins < 0)
+            outgoing[origins[boundary]] = boundary
+            self.outgoing = outgoing
+            return
+        targets = [origins[h - h % 3 + (h + 1) % 3] for h in range(size)]
+        edges, counts = {}, {}
+        for h, (a, b) in enumerate(zip(origins, targets)):
+            edges.setdefault((a, b), h)
+            edge = (a, b) if a < b else (b, a)
+            counts[edge] = counts.get(edge, 0) + 1
+            if counts[edge] > 2:
+                self._non_manifold(*edge)
+        self.twins = array('l', [edges.get((b, a), -1)
+            for a, b in zip(origins, targets)])
+        outgoing = array('l', [-1]) * vertex_count
+        for h, v in enumerate(origins):
+            if outgoing[v] < 0 or self.twins[h] < 0:
+                outgoing[v] = h
+        self.outgoing = outgoing
+
+    @staticmethod
+    def _non_manifold(a, b):
+        raise ValueError("The edge between vertices %s and %s is shared by "
+                "more than two faces" % (a, b))
+
+    @classmethod
+    def from_triangles(cls, triangles):
+        """Build a mesh from a list of triangles given as three points each.
+        Shared corners are merged into single vertices."""
+        points = PointSet()
+        faces = points.extend(p for triangle in triangles for p in triangle)
+        return cls(points, faces)
+
+    def vertex_count(self):
+        """the number of vertices"""
+        return len(self.vertices)
+
+    def face_count(self):
+        """the number of faces"""
+        return len(self.faces) // 3
+
+    def halfedge_count(self):
+        """the number of half-edges, which is three per face"""
+        return len(self.faces)
+
+    def edge_count(self):
+        """the number of edges, counting each pair of twins once"""
+        boundary = self.boundary_count()
+        return (len(self.faces) - boundary) // 2 + boundary
+
+    def boundary_count(self):
+        """the number of half-edges on the boundary"""
+        if numpy is not None:
+            return int((self.twins < 0).sum())
+        return sum(1 for t in self.twins if t < 0)
+
+    def is_closed(self):
+        """True if every half-edge has a twin"""
+        return self.boundary_count() == 0
+
+    # half-edge navigation
+    def face(self, halfedge):
+        """the face that a half-edge belongs to"""
+        return halfedge // 3
+
+    def next(self, halfedge):
+        """the next half-edge around the same face"""
+        return halfedge - halfedge % 3 + (halfedge + 1) % 3
+
+    def prev(self, halfedge):
+        """the previous half-edge around the same face"""
+        return halfedge - halfedge % 3 + (halfedge + 2) % 3
+
+    def twin(self, halfedge):
+        """the opposite half-edge, or -1 on the boundary"""
+        return int(self.twins[halfedge])
+
+    def origin(self, halfedge):
+        """the vertex a half-edge starts from"""
+        return int(self.faces[halfedge])
+
+    def target(self, halfedge):
+        """the vertex a half-edge points to"""
+        return int(self.faces[self.next(halfedge)])
+
+    def face_vertices(self, face):
+        """the three vertices of a face"""
+        return tuple(int(v) for v in self.faces[3 * face:3 * face + 3])
+
+    def face_points(self, face):
+        """the three corners of a face as Point3d objects"""
+        return tuple(Point3d(*self.vertices[v])
+                for v in self.face_vertices(face))
+
+    def halfedge_points(self, halfedge):
+        """the start and end of a half-edge as Point3d objects"""
+        return (Point3d(*self.vertices[self.origin(halfedge)]),
+                Point3d(*self.vertices[self.target(halfedge)]))
+
+    # iterators
+    def outgoing_halfedges(self, vertex):
+        """iterate through the half-edges leaving a vertex. For boundary
+        vertices this starts from the boundary."""
+        start = int(self.outgoing[vertex])
+        if start < 0:
+            return
+        halfedge = start
+        while True:
+            yield halfedge
+            halfedge = int(self.twins[self.prev(halfedge)])
+            if halfedge < 0 or halfedge == start:
+                return
+
+    def vertex_ring(self, vertex):
+        """iterate through the vertices that share an edge with a vertex"""
+        halfedge = -1
+        for halfedge in self.outgoing_halfedges(vertex):
+            yield self.target(halfedge)
+        if halfedge >= 0 and self.twins[self.prev(halfedge)] < 0:
+            # on the boundary, the last neighbor is only reachable through
+            # an incoming half-edge
+            yield self.origin(self.prev(halfedge))
+
+    def vertex_faces(self, vertex):
+        """iterate through the faces around a vertex"""
+        for halfedge in self.outgoing_halfedges(vertex):
+            yield halfedge // 3
+
+    def face_ring(self, face):
+        """iterate through the faces that share an edge with a face"""
+        for halfedge in range(3 * face, 3 * face + 3):
+            twin = self.twins[halfedge]
+            if twin >= 0:
+                yield int(twin) // 3
+
+    def boundary_halfedges(self):
+        """all the half-edges without twins"""
+        return index_buffer(h for h in range(len(self.faces))
+                if self.twins[h] < 0) if numpy is None else numpy.flatnonzero(
+                        self.twins < 0)
 
+    def edges(self):
+        """iterate through each edge once, as pairs of vertex indices"""
+        for h in range(len(self.faces)):
+            twin = self.twins[h]
+            if twin < 0 or h < twin:
+                yield self.origin(h), self.target(h)
 
+    def laplacian(self):
+        """the uniform graph Laplacian of the mesh as a SparseMatrix: each
+        vertex has its number of neighbors on the diagonal and -1 for each
+        neighbor."""
+        size = len(self.faces)
+        count = len(self.vertices)
+        if numpy is not None:
+            halfedges = numpy.arange(size)
+            origins = self.faces
+            targets = origins[halfedges - halfedges % 3 + (halfedges + 1) % 3]
+            # each edge once, in both directions
+            keep = (self.twins < 0) | (halfedges < self.twins)
+            a, b = origins[keep], targets[keep]
+            rows = numpy.concatenate((a, b, a, b))
+            cols = numpy.concatenate((b, a, a, b))
+            values = numpy.concatenate((-numpy.ones(2 * len(a)),
+                numpy.ones(2 * len(a))))
+        else:
+            rows, cols, values = [], [], []
+            for a, b in self.edges():
+                rows += [a, b, a, b]
+                cols += [b, a, a, b]
+                values += [-1.0, -1.0, 1.0, 1.0]
+        return SparseMatrix.from_triplets(rows, cols, values,
+                shape=(count, count))
 
+    def __repr__(self):
+        return '<WingedEdgeMesh with %s vertices and %s faces>' % (
+                self.vertex_count(), self.face_count())
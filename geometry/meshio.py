@@ -0,0 +1,622 @@
+"""This module reads and writes meshes in the OBJ, PLY and STL formats.
+
+Files are parsed straight into packed arrays: a Vector3dArray of vertex
+coordinates and a flat buffer of vertex indices, three per triangle. Binary
+files (binary PLY and STL) are read through `mmap`, and output goes through
+large buffered writes.
+
+Every reader also has a chunked form (`iter_obj`, `iter_ply`, `iter_stl` or
+`iter_mesh`) that yields (vertices, faces) pieces of the file one after the
+other, and every writer can be given one piece at a time. Together they let a
+file much larger than memory pass through a transform, see `transform_file`.
+
+Face indices in chunks are always global: they count every vertex yielded in
+earlier chunks. Polygons with more than three sides are split into fans of
+triangles.
+"""
+import io
+import os
+import mmap
+import struct
+import shutil
+import tempfile
+from array import array
+
+from .core import numpy
+from .vectors import Vector3dArray, pack, index_buffer
+
+CHUNK_SIZE = 1 << 18
+
+BUFFER_SIZE = 1 << 20
+
+# PLY property types, as numpy dtypes and struct codes
+PLY_TYPES = {
+        'char': ('i1', 'b'), 'int8': ('i1', 'b'),
+        'uchar': ('u1', 'B'), 'uint8': ('u1', 'B'),
+        'short': ('i2', 'h'), 'int16': ('i2', 'h'),
+        'ushort': ('u2', 'H'), 'uint16': ('u2', 'H'),
+        'int': ('i4', 'i'), 'int32': ('i4', 'i'),
+        'uint': ('u4', 'I'), 'uint32': ('u4', 'I'),
+        'float': ('f4', 'f'), 'float32': ('f4', 'f'),
+        'double': ('f8', 'd'), 'float64': ('f8', 'd'),
+        }
+
+
+class MeshFormatError(Exception):
+    def __init__(self, msg):
+        self.msg = msg
+    def __str__(self):
+        return self.msg
+
+
+def _extension(path):
+    return os.path.splitext(path)[1].lower().lstrip('.')
+
+
+def _map(f):
+    """memory map an open file for reading. mmap can't map empty files."""
+    if not os.fstat(f.fileno()).st_size:
+        raise MeshFormatError("This file is empty")
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _join(chunks):
+    """join (vertices, faces) chunks into one pair of arrays"""
+    vertices, faces = [], []
+    for v, f in chunks:
+        vertices.append(v.data)
+        faces.append(f)
+    if numpy is not None:
+        data = numpy.concatenate(vertices) if vertices else numpy.zeros(0)
+        indices = numpy.concatenate(faces) if faces else index_buffer()
+        return Vector3dArray.fromBuffer(data), indices
+    data, indices = array('d'), index_buffer()
+    for v, f in zip(vertices, faces):
+        data.extend(v)
+        indices.extend(f)
+    return Vector3dArray.fromBuffer(data), indices
+
+
+def _fan(polygon):
+    """split a polygon, given as a list of vertex indices, into triangles"""
+    first = polygon[0]
+    for i in range(1, len(polygon) - 1):
+        yield first
+        yield polygon[i]
+        yield polygon[i + 1]
+
+
+def _pack_chunk(coords, faces):
+    """turn lists of coordinates and indices into a chunk"""
+    return Vector3dArray.fromBuffer(array('d', coords) if numpy is None
+            else numpy.array(coords, dtype=float)), index_buffer(faces)
+
+
+# OBJ
+
+def iter_obj(path, chunk_size=CHUNK_SIZE):
+    """yield (vertices, faces) chunks from an OBJ file, with about
+    `chunk_size` vertices and triangles in each chunk. Only vertex
+    positions and faces are read."""
+    coords = []
+    faces = []
+    vertex_count = 0
+    with io.open(path, 'rb', buffering=BUFFER_SIZE) as f:
+        for line in f:
+            if line.startswith(b'v '):
+                x, y, z = line.split()[1:4]
+                coords.append(float(x))
+                coords.append(float(y))
+                coords.append(float(z))
+                vertex_count += 1
+            elif line.startswith(b'f '):
+                polygon = []
+                for item in line.split()[1:]:
+                    index = int(item.split(b'/', 1)[0])
+                    # obj indices start at 1, and negative ones count back
+                    # from the latest vertex
+                    polygon.append(index - 1 if index > 0
+                            else vertex_count + index)
+                faces.extend(_fan(polygon))
+            else:
+                continue
+            if len(coords) + len(faces) >= 3 * chunk_size:
+                yield _pack_chunk(coords, faces)
+                coords, faces = [], []
+    if coords or faces:
+        yield _pack_chunk(coords, faces)
+
+
+def read_obj(path):
+    """read the vertices and triangles of an OBJ file"""
+    return _join(iter_obj(path))
+
+
+class ObjWriter(object):
+    """Writes meshes to an OBJ file, one chunk at a time.
+
+    Use it as a context manager, or call `close` when done.
+    """
+    def __init__(self, path):
+        self.file = io.open(path, 'wb', buffering=BUFFER_SIZE)
+        self.vertex_count = 0
+
+    def write(self, vertices, faces=()):
+        """Add some vertices and triangles. Faces use global vertex
+        indices."""
+        data = pack(vertices, 3)
+        if numpy is not None:
+            numpy.savetxt(self.file, data.reshape(-1, 3),
+                    fmt='v %.17g %.17g %.17g')
+            indices = numpy.asarray(faces, dtype=numpy.intp).reshape(-1, 3)
+            numpy.savetxt(self.file, indices + 1, fmt='f %d %d %d')
+        else:
+            rows = zip(*[iter(data)] * 3)
+            self.file.write(''.join('v %r %r %r\n' % row
+                for row in rows).encode('ascii'))
+            triangles = zip(*[iter(faces)] * 3)
+            self.file.write(''.join('f %d %d %d\n' % (a + 1, b + 1, c + 1)
+                for a, b, c in triangles).encode('ascii'))
+        self.vertex_count += len(data) // 3
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+# PLY
+
+def _read_ply_header(f):
+    """parse a PLY header from a binary file object. Returns the format and
+    a list of elements, each with a name, a count, and a list of properties.
+    Scalar properties are (name, type) and list properties are
+    (name, count type, item type)."""
+    if f.readline().strip() != b'ply':
+        raise MeshFormatError("This is not a PLY file")
+    file_format = None
+    elements = []
+    while True:
+        line = f.readline()
+        if not line:
+            raise MeshFormatError("The PLY header never ends")
+        words = line.decode('ascii').split()
+        if not words or words[0] in ('comment', 'obj_info'):
+            continue
+        if words[0] == 'format':
+            file_format = words[1]
+        elif words[0] == 'element':
+            elements.append((words[1], int(words[2]), []))
+        elif words[0] == 'property':
+            if words[1] == 'list':
+                elements[-1][2].append((words[4], words[2], words[3]))
+            else:
+                elements[-1][2].append((words[2], words[1]))
+        elif words[0] == 'end_header':
+            break
+    if file_format not in ('ascii', 'binary_little_endian',
+            'binary_big_endian'):
+        raise MeshFormatError("Unknown PLY format: %s" % file_format)
+    return file_format, elements
+
+
+def _ply_numpy_dtype(properties, endian, list_length=None):
+    """a numpy dtype for an element, if it only has scalar properties or one
+    list of a known length"""
+    fields = []
+    for prop in properties:
+        if len(prop) == 2:
+            fields.append((prop[0], endian + PLY_TYPES[prop[1]][0]))
+        elif list_length is None:
+            return None
+        else:
+            fields.append((prop[0] + '_count', endian + PLY_TYPES[prop[1]][0]))
+            fields.append((prop[0], endian + PLY_TYPES[prop[2]][0],
+                (list_length,)))
+    return numpy.dtype(fields)
+
+
+class _BinaryCursor(object):
+    """reads binary PLY records from a buffer with struct"""
+    def __init__(self, buffer, offset, endian):
+        self.buffer = buffer
+        self.offset = offset
+        self.endian = endian
+
+    def read(self, code, count=1):
+        fmt = self.endian + code * count
+        values = struct.unpack_from(fmt, self.buffer, self.offset)
+        self.offset += struct.calcsize(fmt)
+        return values
+
+    def record(self, properties):
+        """read one record as a dict of property values"""
+        values = {}
+        for prop in properties:
+            if len(prop) == 2:
+                values[prop[0]] = self.read(PLY_TYPES[prop[1]][1])[0]
+            else:
+                count = self.read(PLY_TYPES[prop[1]][1])[0]
+                values[prop[0]] = self.read(PLY_TYPES[prop[2]][1], count)
+        return values
+
+
+def _face_property(properties):
+    for prop in properties:
+        if len(prop) == 3 and prop[0] in ('vertex_indices', 'vertex_index'):
+            return prop[0]
+    raise MeshFormatError("The face element has no vertex_indices")
+
+
+def iter_ply(path, chunk_size=CHUNK_SIZE):
+    """yield (vertices, faces) chunks from an ASCII or binary PLY file. All
+    the vertex chunks come first, followed by the face chunks, since that is
+    how PLY files are laid out."""
+    with io.open(path, 'rb') as f:
+        file_format, elements = _read_ply_header(f)
+        if file_format == 'ascii':
+            for chunk in _iter_ascii_ply(f, elements, chunk_size):
+                yield chunk
+            return
+        offset = f.tell()
+        buffer = _map(f)
+        try:
+            endian = '<' if file_format == 'binary_little_endian' else '>'
+            chunks = _iter_binary_ply(buffer, offset, endian, elements,
+                    chunk_size)
+            for chunk in chunks:
+                yield chunk
+        finally:
+            # closing the reader drops its views of the mmap
+            chunks.close()
+            buffer.close()
+
+
+def _iter_binary_ply(buffer, offset, endian, elements, chunk_size):
+    no_faces = index_buffer()
+    for name, count, properties in elements:
+        if numpy is not None:
+            list_length = 3 if name == 'face' else None
+            dtype = _ply_numpy_dtype(properties, endian, list_length)
+            if dtype is not None and (offset + dtype.itemsize * count <=
+                    len(buffer)):
+                records = numpy.frombuffer(buffer, dtype=dtype, count=count,
+                        offset=offset)
+                if name != 'face' or (records[
+                        _face_property(properties) + '_count'] == 3).all():
+                    offset += dtype.itemsize * count
+                    for start in range(0, count, chunk_size):
+                        part = records[start:start + chunk_size]
+                        if name == 'vertex':
+                            data = numpy.empty((len(part), 3))
+                            for i, axis in enumerate('xyz'):
+                                data[:, i] = part[axis]
+                            yield (Vector3dArray.fromBuffer(data.ravel()),
+                                    no_faces)
+                        elif name == 'face':
+                            faces = part[_face_property(properties)]
+                            yield (Vector3dArray.fromBuffer(numpy.zeros(0)),
+                                    faces.astype(numpy.intp).ravel())
+                            del faces
+                        del part
+                    # release the views so that the mmap can be closed
+                    del records
+                    continue
+                del records
+        # read the records one at a time
+        cursor = _BinaryCursor(buffer, offset, endian)
+        coords, faces = [], []
+        key = _face_property(properties) if name == 'face' else None
+        for i in range(count):
+            record = cursor.record(properties)
+            if name == 'vertex':
+                coords.extend((record['x'], record['y'], record['z']))
+            elif name == 'face':
+                faces.extend(_fan(record[key]))
+            if len(coords) + len(faces) >= 3 * chunk_size:
+                yield _pack_chunk(coords, faces)
+                coords, faces = [], []
+        if coords or faces:
+            yield _pack_chunk(coords, faces)
+        offset = cursor.offset
+
+
+def _iter_ascii_ply(f, elements, chunk_size):
+    for name, count, properties in elements:
+        coords, faces = [], []
+        if name == 'vertex':
+            names = [p[0] for p in properties]
+            if any(len(p) == 3 for p in properties):
+                raise MeshFormatError("Vertices with list properties are "
+                        "not supported")
+            axes = [names.index(axis) for axis in 'xyz']
+        key = _face_property(properties) if name == 'face' else None
+        for i in range(count):
+            words = f.readline().split()
+            if name == 'vertex':
+                coords.extend(float(words[a]) for a in axes)
+            elif name == 'face':
+                # find the vertex indices among the other properties
+                position = 0
+                for prop in properties:
+                    if len(prop) == 2:
+                        position += 1
+                        continue
+                    length = int(words[position])
+                    values = words[position + 1:position + 1 + length]
+                    position += 1 + length
+                    if prop[0] == key:
+                        faces.extend(_fan([int(v) for v in values]))
+            if len(coords) + len(faces) >= 3 * chunk_size:
+                yield _pack_chunk(coords, faces)
+                coords, faces = [], []
+        if coords or faces:
+            yield _pack_chunk(coords, faces)
+
+
+def read_ply(path):
+    """read the vertices and triangles of an ASCII or binary PLY file"""
+    return _join(iter_ply(path))
+
+
+class PlyWriter(object):
+    """Writes meshes to a PLY file, one chunk at a time.
+
+    Vertices are written to the file as they arrive and faces are held in a
+    temporary file until `close`, since PLY needs every vertex before the
+    first face. The element counts in the header are padded so that they can
+    be filled in at the end.
+    """
+    COUNT_WIDTH = 15
+
+    def __init__(self, path, binary=True):
+        self.binary = binary
+        self.file = io.open(path, 'wb', buffering=BUFFER_SIZE)
+        self.faces = tempfile.TemporaryFile(buffering=BUFFER_SIZE)
+        self.vertex_count = 0
+        self.face_count = 0
+        self._write_header()
+
+    def _header(self):
+        width = self.COUNT_WIDTH
+        file_format = 'binary_little_endian' if self.binary else 'ascii'
+        return ('ply\nformat %s 1.0\n'
+                'element vertex %0*d\n'
+                'property double x\nproperty double y\nproperty double z\n'
+                'element face %0*d\n'
+                'property list uchar int vertex_indices\n'
+                'end_header\n' % (file_format, width, self.vertex_count,
+                    width, self.face_count)).encode('ascii')
+
+    def _write_header(self):
+        self.file.write(self._header())
+
+    def write(self, vertices, faces=()):
+        """Add some vertices and triangles. Faces use global vertex
+        indices."""
+        data = pack(vertices, 3)
+        if numpy is not None:
+            indices = numpy.asarray(faces, dtype=numpy.intp).reshape(-1, 3)
+            if self.binary:
+                self.file.write(data.astype('<f8').tobytes())
+                records = numpy.empty(len(indices),
+                        dtype=[('n', 'u1'), ('v', '<i4', (3,))])
+                records['n'] = 3
+                records['v'] = indices
+                self.faces.write(records.tobytes())
+            else:
+                numpy.savetxt(self.file, data.reshape(-1, 3),
+                        fmt='%.17g %.17g %.17g')
+                numpy.savetxt(self.faces, indices, fmt='3 %d %d %d')
+            face_count = len(indices)
+        else:
+            triangles = list(zip(*[iter(faces)] * 3))
+            if self.binary:
+                coords = array('d', data)
+                if struct.pack('=d', 1.0) != struct.pack('<d', 1.0):
+                    coords.byteswap()
+                self.file.write(coords.tobytes())
+                record = struct.Struct('<B3i')
+                self.faces.write(b''.join(record.pack(3, *t)
+                    for t in triangles))
+            else:
+                self.file.write(''.join('%r %r %r\n' % row for row in
+                    zip(*[iter(data)] * 3)).encode('ascii'))
+                self.faces.write(''.join('3 %d %d %d\n' % t
+                    for t in triangles).encode('ascii'))
+            face_count = len(triangles)
+        self.vertex_count += len(data) // 3
+        self.face_count += face_count
+
+    def close(self):
+        self.faces.seek(0)
+        shutil.copyfileobj(self.faces, self.file, BUFFER_SIZE)
+        self.faces.close()
+        self.file.seek(0)
+        self._write_header()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+# STL
+
+STL_RECORD = struct.Struct('<12fH')
+
+
+def _stl_triangle_count(buffer):
+    if len(buffer) < 84:
+        raise MeshFormatError("This file is too short to be a binary STL")
+    count = struct.unpack_from('<I', buffer, 80)[0]
+    if 84 + 50 * count != len(buffer):
+        raise MeshFormatError("Only binary STL files can be read, and this "
+                "file's size does not match its triangle count")
+    return count
+
+
+def iter_stl(path, chunk_size=CHUNK_SIZE):
+    """yield (vertices, faces) chunks of about `chunk_size` triangles from a
+    binary STL file. STL files do not share vertices between triangles, so
+    each triangle gets three vertices of its own."""
+    with io.open(path, 'rb') as f:
+        buffer = _map(f)
+        records = None
+        try:
+            count = _stl_triangle_count(buffer)
+            if numpy is not None:
+                records = numpy.frombuffer(buffer, count=count, offset=84,
+                        dtype=[('normal', '<f4', (3,)),
+                               ('corners', '<f4', (9,)),
+                               ('attributes', '<u2')])
+            for start in range(0, count, chunk_size):
+                stop = min(count, start + chunk_size)
+                faces = index_buffer(range(3 * start, 3 * stop))
+                if numpy is not None:
+                    data = records['corners'][start:stop].astype(float)
+                    yield Vector3dArray.fromBuffer(data.ravel()), faces
+                    continue
+                data = array('d')
+                for values in STL_RECORD.iter_unpack(buffer[
+                        84 + 50 * start:84 + 50 * stop]):
+                    data.extend(values[3:12])
+                yield Vector3dArray.fromBuffer(data), faces
+        finally:
+            # the mmap can only be closed once nothing views it
+            records = None
+            buffer.close()
+
+
+def read_stl(path):
+    """read the triangles of a binary STL file"""
+    return _join(iter_stl(path))
+
+
+class StlWriter(object):
+    """Writes meshes to a binary STL file, one chunk at a time. The normal
+    of each triangle is computed from its corners.
+
+    Since STL files hold coordinates rather than indices, the faces in each
+    chunk must only use vertices from that same chunk.
+    """
+    def __init__(self, path):
+        self.file = io.open(path, 'wb', buffering=BUFFER_SIZE)
+        self.file.write(b'binary STL written by python-geometry'.ljust(80))
+        self.file.write(struct.pack('<I', 0))
+        self.vertex_count = 0
+        self.face_count = 0
+
+    def write(self, vertices, faces=()):
+        """Add some vertices and the triangles that use them. Faces use
+        global vertex indices."""
+        data = pack(vertices, 3)
+        offset = self.vertex_count
+        if numpy is not None:
+            indices = numpy.asarray(faces, dtype=numpy.intp).reshape(-1, 3)
+            indices = indices - offset
+            if len(indices) and (indices.min() < 0 or
+                    indices.max() >= len(data) // 3):
+                raise ValueError("STL faces must use vertices from the "
+                        "same chunk")
+            corners = data.reshape(-1, 3)[indices]
+            normals = numpy.cross(corners[:, 1] - corners[:, 0],
+                    corners[:, 2] - corners[:, 0])
+            lengths = numpy.sqrt((normals * normals).sum(axis=1))
+            lengths[lengths == 0] = 1.0
+            records = numpy.zeros(len(indices), dtype=[
+                ('normal', '<f4', (3,)), ('corners', '<f4', (9,)),
+                ('attributes', '<u2')])
+            records['normal'] = normals / lengths[:, None]
+            records['corners'] = corners.reshape(-1, 9)
+            self.file.write(records.tobytes())
+            face_count = len(indices)
+        else:
+            out = []
+            face_count = 0
+            for a, b, c in zip(*[iter(faces)] * 3):
+                corners = []
+                for v in (a, b, c):
+                    v -= offset
+                    if not 0 <= v < len(data) // 3:
+                        raise ValueError("STL faces must use vertices from "
+                                "the same chunk")
+                    corners.append(tuple(data[3 * v:3 * v + 3]))
+                p, q, r = corners
+                u = [q[i] - p[i] for i in range(3)]
+                w = [r[i] - p[i] for i in range(3)]
+                n = (u[1] * w[2] - u[2] * w[1], u[2] * w[0] - u[0] * w[2],
+                        u[0] * w[1] - u[1] * w[0])
+                length = sum(c * c for c in n) ** 0.5 or 1.0
+                out.append(STL_RECORD.pack(*([c / length for c in n] +
+                    list(p + q + r) + [0])))
+                face_count += 1
+            self.file.write(b''.join(out))
+        self.vertex_count += len(data) // 3
+        self.face_count += face_count
+
+    def close(self):
+        self.file.seek(80)
+        self.file.write(struct.pack('<I', self.face_count))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+# any format, chosen by the file extension
+
+READERS = {'obj': iter_obj, 'ply': iter_ply, 'stl': iter_stl}
+
+WRITERS = {'obj': ObjWriter, 'ply': PlyWriter, 'stl': StlWriter}
+
+
+def iter_mesh(path, chunk_size=CHUNK_SIZE):
+    """yield (vertices, faces) chunks from an OBJ, PLY or STL file"""
+    try:
+        reader = READERS[_extension(path)]
+    except KeyError:
+        raise MeshFormatError("Unknown mesh format: %s" % path)
+    return reader(path, chunk_size)
+
+
+def read_mesh(path):
+    """read the vertices and triangles of an OBJ, PLY or STL file. The
+    result can be passed straight to WingedEdgeMesh:
+
+        mesh = WingedEdgeMesh(*read_mesh('model.ply'))
+    """
+    return _join(iter_mesh(path))
+
+
+def mesh_writer(path, **options):
+    """get a writer for an OBJ, PLY or STL file"""
+    try:
+        writer = WRITERS[_extension(path)]
+    except KeyError:
+        raise MeshFormatError("Unknown mesh format: %s" % path)
+    return writer(path, **options)
+
+
+def write_mesh(path, vertices, faces, **options):
+    """write vertices and triangles to an OBJ, PLY or STL file"""
+    with mesh_writer(path, **options) as writer:
+        writer.write(vertices, faces)
+
+
+def transform_file(source, destination, transform, chunk_size=CHUNK_SIZE,
+        **options):
+    """Apply a Transform3d to every vertex of a mesh file, writing the result
+    to another file, without loading the whole mesh into memory."""
+    with mesh_writer(destination, **options) as writer:
+        for vertices, faces in iter_mesh(source, chunk_size):
+            writer.write(transform.apply(vertices), faces)
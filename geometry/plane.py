@@ -1,9 +1,23 @@
 """This module implements a plane object and related functions
+
+Point queries (`signed_distance`, `project` and `side`) accept either a single
+point or many points at once, as a PointSet, a vector array, a numpy array or
+a list of coordinates. Many points are handled in one vectorized pass. A
+PlaneSet does the same for a group of planes.
+
+Deciding whether a point is on a plane uses the current tolerance (see
+`core.Tolerance`), read once for each call. For relative tolerances, the scale
+of a distance is the size of the point's largest coordinate plus the distance
+of the plane from the origin.
 """
-from .line import Line3d
+import math
+from array import array
+
+from .line import Line3d, NAN
 from .vector3d import Vector3d
 from .point3d import Point3d
-from .core import isRoughlyZero
+from .vectors import Vector3dArray, pack
+from .core import current_tolerance, numpy
 
 class Plane3d(object):
     """A 3d plane object
@@ -44,16 +58,86 @@ class Plane3d(object):
         return self.normal.angleTo(otherVect)
 
 
+    def _unit(self):
+        """the unit normal as a tuple, and the offset scaled to match it"""
+        n = self.normal
+        length = n.length
+        return (n.x / length, n.y / length, n.z / length), self.d / length
+
+    def signed_distance(self, points):
+        """Get the distance from the plane to a point, which is positive on
+        the side the normal points to and negative on the other side.
+
+        Given many points, this returns an array of distances: a numpy array
+        if numpy is available, and an `array('d')` otherwise.
+        """
+        (a, b, c), d = self._unit()
+        if isinstance(points, Vector3d):
+            return a * points.x + b * points.y + c * points.z + d
+        data = pack(points, 3)
+        if numpy is not None:
+            return data.reshape(-1, 3).dot((a, b, c)) + d
+        return array('d', [a * x + b * y + c * z + d
+            for x, y, z in zip(*[iter(data)] * 3)])
+
+    def project(self, points):
+        """Get the closest point on the plane to a point.
+
+        Given many points, this returns their projections as a Vector3dArray,
+        or as a numpy array with the same shape for numpy input. PointSets are
+        not returned as PointSets, because projected points often coincide.
+        """
+        (a, b, c), d = self._unit()
+        if isinstance(points, Vector3d):
+            distance = a * points.x + b * points.y + c * points.z + d
+            return Point3d(points.x - distance * a, points.y - distance * b,
+                    points.z - distance * c)
+        data = pack(points, 3)
+        if numpy is not None:
+            rows = data.reshape(-1, 3)
+            distances = rows.dot((a, b, c)) + d
+            result = rows - numpy.outer(distances, (a, b, c))
+            if isinstance(points, numpy.ndarray):
+                return result.reshape(points.shape)
+            return Vector3dArray.fromBuffer(result.ravel())
+        result = array('d')
+        for x, y, z in zip(*[iter(data)] * 3):
+            distance = a * x + b * y + c * z + d
+            result.extend((x - distance * a, y - distance * b,
+                z - distance * c))
+        return Vector3dArray.fromBuffer(result)
+
+    def side(self, points):
+        """Get which side of the plane a point is on: 1 for the side the
+        normal points to, -1 for the other side, and 0 for points that are
+        roughly on the plane.
+
+        Given many points, this returns an array of sides: a numpy array of
+        int8 if numpy is available, and an `array('b')` otherwise.
+        """
+        tolerance = current_tolerance()
+        distances = self.signed_distance(points)
+        d = self._unit()[1]
+        if isinstance(points, Vector3d):
+            scale = max(abs(c) for c in points) + abs(d)
+            if tolerance.is_zero(distances, scale):
+                return 0
+            return 1 if distances > 0 else -1
+        return _signs(distances, _scales(pack(points, 3), abs(d), tolerance),
+                tolerance)
+
     def intersect(self, other):
         """Finds the intersection of this plane with another object.
         """
         if isinstance(other, Plane3d):
             # return the line intersection of two planes
             # first, get the cross product of the two plane normals
-            # which is a vector parallel to L
-            vector = self.normal.cross(other.normal)
+            # which is a vector parallel to L. A plane built from three
+            # points has a Point3d normal, so make sure Line3d gets a vector
+            vector = Vector3d(*self.normal.cross(other.normal).coords)
             absCoords = [abs(c) for c in vector]
-            if isRoughlyZero(sum(absCoords)):
+            scale = self.normal.length * other.normal.length
+            if current_tolerance().is_zero(sum(absCoords), scale):
                 # the planes are parallel and do not intersect
                 return None
             else:
@@ -83,9 +167,183 @@ class Plane3d(object):
 
         elif isinstance(other, Line3d):
             # return the point intersection of a line and a plane
-            pass
-        pass
+            (a, b, c), d = self._unit()
+            p, v = other.point, other.vector
+            denominator = a * v[0] + b * v[1] + c * v[2]
+            if current_tolerance().is_zero(denominator / v.length, 1.0):
+                # the line is parallel to the plane
+                return None
+            t = -(a * p[0] + b * p[1] + c * p[2] + d) / denominator
+            return other.pointAt(t)
+
+    def intersect_lines(self, origins, directions):
+        """Intersect many lines with this plane in one pass. The lines are
+        given by packed start points and directions.
+
+        Returns the parameter t of each intersection, so that the points are
+        at `origins + t * directions`, and the points themselves as a
+        Vector3dArray. Lines parallel to the plane get `nan`.
+        """
+        tolerance = current_tolerance()
+        (a, b, c), d = self._unit()
+        p, v = pack(origins, 3), pack(directions, 3)
+        if numpy is not None:
+            p, v = p.reshape(-1, 3), v.reshape(-1, 3)
+            t = _line_parameters(numpy.array([(a, b, c)]), numpy.array([d]),
+                    p, v, tolerance)[0]
+            points = p + t[:, None] * v
+            return t, Vector3dArray.fromBuffer(points.ravel())
+        t, points = array('d'), array('d')
+        for (x, y, z), (i, j, k) in zip(zip(*[iter(p)] * 3),
+                zip(*[iter(v)] * 3)):
+            denominator = a * i + b * j + c * k
+            length = math.sqrt(i * i + j * j + k * k)
+            if tolerance.is_zero(denominator / length, 1.0):
+                t.append(NAN)
+                points.extend((NAN, NAN, NAN))
+                continue
+            s = -(a * x + b * y + c * z + d) / denominator
+            t.append(s)
+            points.extend((x + s * i, y + s * j, z + s * k))
+        return t, Vector3dArray.fromBuffer(points)
 
     def __repr__(self):
         return 'Plane3d( %s, %s )' % (self.point, self.normal)
 
+
+def _scales(data, offset, tolerance):
+    """the scales of the distances from a plane at `offset` from the origin
+    to packed points, or 0 if the tolerance doesn't need them"""
+    if not tolerance.uses_scale:
+        return 0.0
+    if numpy is not None:
+        return numpy.abs(data.reshape(-1, 3)).max(axis=1) + offset
+    return [max(abs(x), abs(y), abs(z)) + offset
+            for x, y, z in zip(*[iter(data)] * 3)]
+
+
+def _signs(distances, scales, tolerance):
+    """the signs of signed distances, with 0 for the distances that are
+    roughly zero: an int8 numpy array, or an `array('b')` without numpy"""
+    if numpy is not None:
+        signs = numpy.sign(distances).astype(numpy.int8)
+        signs[numpy.abs(distances) <= tolerance.bounds(scales)] = 0
+        return signs
+    if not tolerance.uses_scale:
+        bound = tolerance.bound()
+        return array('b', [0 if abs(v) <= bound else (1 if v > 0 else -1)
+            for v in distances])
+    return array('b', [0 if tolerance.is_zero(v, s) else (1 if v > 0 else -1)
+        for v, s in zip(distances, scales)])
+
+
+def _line_parameters(normals, offsets, origins, directions, tolerance):
+    """the line parameters where N planes with unit normals cross M lines,
+    as an N x M numpy array with nan for parallel pairs"""
+    denominators = normals.dot(directions.T)
+    lengths = numpy.sqrt((directions * directions).sum(axis=1))
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        parallel = numpy.abs(denominators / lengths) <= tolerance.bounds(1.0)
+        denominators = numpy.where(parallel, NAN, denominators)
+        return -(normals.dot(origins.T) + offsets[:, None]) / denominators
+
+
+class PlaneSet(object):
+    """A group of planes that are evaluated against many points at once.
+
+    The unit normals and offsets of all the planes are stored together, so
+    that N planes can be checked against M points in one pass. This is meant
+    for things like culling points against a convex region, whose boundary
+    planes all have normals pointing outward.
+    """
+    def __init__(self, planes=()):
+        self.planes = list(planes)
+        units = [plane._unit() for plane in self.planes]
+        if numpy is not None:
+            self.normals = numpy.array([n for n, d in units],
+                    dtype=float).reshape(-1, 3)
+            self.offsets = numpy.array([d for n, d in units], dtype=float)
+        else:
+            self.normals = [n for n, d in units]
+            self.offsets = [d for n, d in units]
+
+    def __len__(self):
+        return len(self.planes)
+
+    def __getitem__(self, key):
+        return self.planes[key]
+
+    def __iter__(self):
+        return iter(self.planes)
+
+    def signed_distances(self, points):
+        """Get the signed distance from every plane to every point, as a
+        table with one row for each plane and one column for each point. With
+        numpy this is a 2d array, and otherwise a list of `array('d')` rows.
+        """
+        data = pack(points, 3)
+        if numpy is not None:
+            rows = data.reshape(-1, 3)
+            return self.normals.dot(rows.T) + self.offsets[:, None]
+        coords = list(zip(*[iter(data)] * 3))
+        return [array('d', [a * x + b * y + c * z + d for x, y, z in coords])
+            for (a, b, c), d in zip(self.normals, self.offsets)]
+
+    def sides(self, points):
+        """Get the side of every plane that every point is on, as a table
+        like `signed_distances`. See `Plane3d.side`."""
+        tolerance = current_tolerance()
+        data = pack(points, 3)
+        distances = self.signed_distances(data)
+        if numpy is not None:
+            scales = _scales(data, numpy.abs(self.offsets)[:, None], tolerance)
+            return _signs(distances, scales, tolerance)
+        return [_signs(row, _scales(data, abs(d), tolerance), tolerance)
+                for row, d in zip(distances, self.offsets)]
+
+    def contains(self, points):
+        """Find which points are behind or roughly on every plane, which for
+        a convex region with outward normals are the points inside it.
+
+        Returns a mask with one boolean for each point: a numpy array of bool
+        if numpy is available, and a list otherwise. Points are dropped as
+        soon as one plane rejects them, so the later planes only check the
+        points that are left.
+        """
+        tolerance = current_tolerance()
+        data = pack(points, 3)
+        if numpy is not None:
+            rows = data.reshape(-1, 3)
+            sizes = numpy.abs(rows).max(axis=1) if tolerance.uses_scale else 0
+            candidates = numpy.arange(len(rows))
+            for normal, offset in zip(self.normals, self.offsets):
+                distances = rows[candidates].dot(normal) + offset
+                if tolerance.uses_scale:
+                    bounds = tolerance.bounds(sizes[candidates] + abs(offset))
+                else:
+                    bounds = tolerance.absolute
+                candidates = candidates[distances <= bounds]
+            mask = numpy.zeros(len(rows), dtype=bool)
+            mask[candidates] = True
+            return mask
+        planes = list(zip(self.normals, self.offsets))
+        return [all(a * x + b * y + c * z + d <= tolerance.bound(
+            max(abs(x), abs(y), abs(z)) + abs(d))
+            for (a, b, c), d in planes) for x, y, z in zip(*[iter(data)] * 3)]
+
+    def intersect_lines(self, origins, directions):
+        """Intersect many lines with every plane, for example to cast rays
+        through a stack of planes. Returns the line parameters of the
+        intersections as a table with one row for each plane and one column
+        for each line, like `Plane3d.intersect_lines`. With numpy this is a 2d
+        array, and otherwise a list of `array('d')` rows."""
+        if numpy is not None:
+            p = pack(origins, 3).reshape(-1, 3)
+            v = pack(directions, 3).reshape(-1, 3)
+            return _line_parameters(self.normals, self.offsets, p, v,
+                    current_tolerance())
+        return [plane.intersect_lines(origins, directions)[0]
+                for plane in self.planes]
+
+    def __repr__(self):
+        return 'PlaneSet(%s planes)' % len(self.planes)
@@ -2,8 +2,9 @@
 class PointBase(object):
     """Should not be instantiated directly.
     """
+    __slots__ = ()
+
     def vectorTo(self, other):
         """Find the vector to another point.
         """
         return other - self
-
@@ -5,9 +5,7 @@ class Point3d(Vector3d, PointBase):
     """Functionally similar to a Vector3d, but concpetually distinct, and
     includes several additional methods.
     """
-    def __init__(self, *args, **kwargs):
-        Vector3d.__init__()
-        PointBase.__init__()
+    __slots__ = ()
 
     def __repr__(self):
         return 'Point3d(%s, %s, %s)' % self.coords
@@ -17,11 +15,15 @@ class Point3d(Vector3d, PointBase):
         """
         if isinstance(other, Plane3d):
             # get distance between point and plane
-            pass
+            return abs(other.signed_distance(self))
         elif isinstance(other, Line3d):
             # get distance between point and line
-            pass
+            return (self - other.point).cross(other.vector).length / (
+                    other.vector.length)
         else:
             return (other - self).length
 
 
+# these modules import Point3d, so they are imported after it is defined
+from .plane import Plane3d
+from .line import Line3d
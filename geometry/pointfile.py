@@ -0,0 +1,306 @@
+"""This module stores point sets in a compact binary file that can be opened
+through `mmap`, so that large point sets don't have to be parsed or rebuilt
+when a program starts.
+
+A point file has three parts:
+
+    header      - the magic bytes, a version number and the sizes and offsets
+                  of the other parts, see `HEADER`
+    coordinates - the packed x, y, z coordinates of every point, as
+                  little-endian float64 or float32
+    index       - optionally, the KDTree of the points: the permutation of
+                  point indices followed by the node table
+
+Use `save` to write a file and `load` to open one as a PointFile, which reads
+points lazily from the mapped file.
+"""
+import io
+import os
+import sys
+import mmap
+import struct
+from array import array
+
+from .core import numpy
+from .point3d import Point3d
+from .points import PointSet
+from .spatial import KDTree
+from .vectors import Vector3dArray, pack
+
+MAGIC = b'GEOPTS\x00\x00'
+
+VERSION = 1
+
+# magic, version, dimensions, precision, point count, tree leafsize, node
+# count, coordinate offset, index offset (or 0 if there is no index)
+HEADER = struct.Struct('<8sHHIQQQQQ')
+
+PRECISIONS = {'float64': ('d', 8), 'float32': ('f', 4)}
+
+LITTLE_ENDIAN = sys.byteorder == 'little'
+
+
+class PointFileError(Exception):
+    def __init__(self, msg):
+        self.msg = msg
+    def __str__(self):
+        return self.msg
+
+
+def _align(offset):
+    """round an offset up to a multiple of 8 bytes"""
+    return (offset + 7) // 8 * 8
+
+
+def _to_bytes(values, code):
+    """little-endian bytes of a sequence of numbers"""
+    if numpy is not None:
+        return numpy.asarray(values, dtype='<' + code).tobytes()
+    values = array(code, values)
+    if not LITTLE_ENDIAN:
+        values.byteswap()
+    return values.tobytes()
+
+
+def save(points, path, precision='float64', index=True):
+    """Write points to a point file.
+
+    `points` can be a PointSet or any packed coordinates. `precision` is
+    'float64' or 'float32'; float32 files are half the size but round the
+    coordinates. If `index` is True, a KDTree of the points is stored as
+    well, reusing the tree of a PointSet when it is up to date.
+    """
+    try:
+        code, size = PRECISIONS[precision]
+    except KeyError:
+        raise PointFileError("Unknown precision: %s" % precision)
+    data = pack(points, 3)
+    coords = _to_bytes(data, code)
+    count = len(data) // 3
+    tree = None
+    if index:
+        tree = getattr(points, '_index', None)
+        if tree is None or len(tree) != count or code != 'd':
+            # build the tree from the coordinates as they will be stored, so
+            # that its bounding boxes match them exactly
+            if code != 'd':
+                data = array('d', array(code, data)) if numpy is None else (
+                        data.astype(numpy.float32).astype(float))
+            tree = KDTree(data)
+    offset = _align(HEADER.size)
+    index_offset = _align(offset + len(coords)) if tree is not None else 0
+    with io.open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 3, size, count,
+            tree.leafsize if tree else 0, len(tree.starts) if tree else 0,
+            offset, index_offset))
+        f.write(b'\x00' * (offset - HEADER.size))
+        f.write(coords)
+        if tree is None:
+            return
+        f.write(b'\x00' * (index_offset - offset - len(coords)))
+        f.write(_to_bytes(tree.order, 'q'))
+        for column in (tree.starts, tree.stops, tree.lefts, tree.rights):
+            f.write(_to_bytes(column, 'q'))
+        for column in (tree.lower, tree.upper):
+            f.write(_to_bytes([c for row in column for c in row], 'd'))
+
+
+def load(path):
+    """open a point file"""
+    return PointFile(path)
+
+
+class PointFile(object):
+    """A read-only set of points backed by a memory-mapped point file.
+
+    Nothing is read from the file until it is asked for: `len` only looks at
+    the header, indexing a point or slicing only reads those coordinates,
+    iterating reads a chunk at a time, and Point3d objects are only made for
+    the points that are indexed or iterated over. With numpy, `asArray` wraps the mapped coordinates without copying
+    them if they are stored as float64.
+
+    Spatial queries use the stored KDTree, or build one if the file has none.
+    """
+    def __init__(self, path):
+        self.path = path
+        with io.open(path, 'rb') as f:
+            # mmap can't map empty files
+            if not os.fstat(f.fileno()).st_size:
+                raise PointFileError("This file is empty")
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._buffer) < HEADER.size:
+            self._buffer.close()
+            raise PointFileError("This file is too short to be a point file")
+        (magic, version, dim, size, self._count, self._leafsize,
+                self._node_count, self._offset,
+                self._index_offset) = HEADER.unpack_from(self._buffer)
+        if magic != MAGIC or dim != 3:
+            self._buffer.close()
+            raise PointFileError("This is not a point file")
+        if version > VERSION:
+            self._buffer.close()
+            raise PointFileError("Unsupported point file version: %s" %
+                    version)
+        if size not in (4, 8):
+            self._buffer.close()
+            raise PointFileError("Unsupported point file precision: %s "
+                    "bytes" % size)
+        end = self._offset + 3 * size * self._count
+        if self._index_offset:
+            # the order, then four integer and six float columns per node
+            end = max(end, self._index_offset + 8 * self._count +
+                    80 * self._node_count)
+        length = len(self._buffer)
+        if self._offset < HEADER.size or end > length:
+            self._buffer.close()
+            raise PointFileError("This point file is truncated: it has %s "
+                    "bytes but its header needs %s" % (length, end))
+        self._code = 'd' if size == 8 else 'f'
+        self._coords = self._read(self._code, self._offset, 3 * self._count)
+        self._array = None
+        self._index = None
+
+    def _read(self, code, offset, length):
+        """a view of `length` numbers stored at `offset`"""
+        if numpy is not None:
+            return numpy.frombuffer(self._buffer, dtype='<' + code,
+                    count=length, offset=offset)
+        size = struct.calcsize(code)
+        view = memoryview(self._buffer)[offset:offset + length * size]
+        if LITTLE_ENDIAN:
+            return view.cast(code)
+        values = array(code, view.tobytes())
+        values.byteswap()
+        return values
+
+    @property
+    def precision(self):
+        return 'float64' if self._code == 'd' else 'float32'
+
+    def has_index(self):
+        """True if the file holds a KDTree"""
+        return self._index_offset != 0
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, key):
+        """Get a single point as a Point3d, or a slice of points as a
+        Vector3dArray."""
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self._count)
+            if step == 1:
+                return self._slice(start, stop)
+            return Vector3dArray(self[i] for i in range(start, stop, step))
+        if key < 0:
+            key += self._count
+        if not 0 <= key < self._count:
+            raise IndexError("point file index out of range")
+        return Point3d(*[float(c) for c in self._coords[3 * key:3 * key + 3]])
+
+    def iter_chunks(self, chunk_size=1 << 16):
+        """iterate through the points as Vector3dArrays of up to
+        `chunk_size` points"""
+        for start in range(0, self._count, chunk_size):
+            yield self._slice(start, min(start + chunk_size, self._count))
+
+    def __iter__(self):
+        """iterate through the points as Point3d objects, reading them from
+        the file a chunk at a time"""
+        for chunk in self.iter_chunks():
+            data = chunk.data
+            if numpy is not None:
+                data = data.tolist()
+            for i in range(0, len(data), 3):
+                yield Point3d(data[i], data[i + 1], data[i + 2])
+
+    def _slice(self, start, stop):
+        """the points from `start` up to `stop` as a Vector3dArray, only
+        converting those coordinates"""
+        if self._array is not None:
+            return self._array[start:stop]
+        coords = self._coords[3 * start:3 * max(start, stop)]
+        if numpy is not None:
+            if coords.dtype != numpy.float64:
+                coords = coords.astype(numpy.float64)
+        else:
+            coords = array('d', coords)
+        return Vector3dArray.fromBuffer(coords)
+
+    def asArray(self):
+        """Get the coordinates of all the points as a Vector3dArray. This
+        is a view of the file for float64 files with numpy, and a copy
+        otherwise."""
+        if self._array is None:
+            coords = self._coords
+            if numpy is not None:
+                if coords.dtype != numpy.float64:
+                    coords = coords.astype(numpy.float64)
+            else:
+                coords = array('d', coords)
+            self._array = Vector3dArray.fromBuffer(coords)
+        return self._array
+
+    @property
+    def index(self):
+        """the KDTree of the points, read from the file if it has one"""
+        if self._index is None:
+            if not self.has_index():
+                self._index = KDTree(self.asArray())
+                return self._index
+            count, nodes = self._count, self._node_count
+            offset = self._index_offset
+            order = self._read('q', offset, count)
+            offset += 8 * count
+            columns = []
+            for i in range(4):
+                columns.append(self._read('q', offset, nodes).tolist())
+                offset += 8 * nodes
+            for i in range(2):
+                values = self._read('d', offset, 3 * nodes).tolist()
+                columns.append(zip(*[iter(values)] * 3))
+                offset += 24 * nodes
+            if numpy is None:
+                order = array('l', order)
+            self._index = KDTree.fromNodes(self.asArray(), order,
+                    zip(*columns), leafsize=self._leafsize)
+        return self._index
+
+    def nearest(self, point, k=1):
+        """Get the indices of the `k` points nearest to `point`, closest
+        first."""
+        return [i for d, i in self.index.nearest(point, k)]
+
+    def within(self, point, radius):
+        """Get the sorted indices of all the points within `radius` of
+        `point`."""
+        return self.index.within(point, radius)
+
+    def in_box(self, box):
+        """Get the sorted indices of all the points inside a Box3d."""
+        return self.index.in_box([(i.start, i.end)
+            for i in (box.x, box.y, box.z)])
+
+    def toPointSet(self, tolerance=None):
+        """read every point into a new PointSet"""
+        return PointSet(self.asArray(), tolerance=tolerance)
+
+    def close(self):
+        """Close the file. Arrays taken from `asArray` that still view the
+        file keep it open until they are gone."""
+        self._coords = self._array = self._index = None
+        try:
+            self._buffer.close()
+        except BufferError:
+            # something still holds a view of the mapped file, which will
+            # be unmapped once that view is released
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __repr__(self):
+        return '<PointFile %r with %s points>' % (self.path, self._count)
@@ -1,12 +1,43 @@
+import math
+from array import array
+
+from .core import numpy
+from .vector3d import Vector3d
 from .point3d import Point3d
+from .vectors import Vector3dArray, pack, index_buffer
+from .spatial import KDTree
+from .hull import convex_hull_2d, convex_hull_3d
+
+# offsets to the 27 grid cells around and including a cell
+NEIGHBOR_CELLS = [(i, j, k) for i in (-1, 0, 1) for j in (-1, 0, 1)
+        for k in (-1, 0, 1)]
+
+
+def toPoint(value):
+    """Get a new Point3d from a Vector3d or from any iterable of three
+    coordinates."""
+    if isinstance(value, Vector3d):
+        return Point3d(value.x, value.y, value.z)
+    # just assume it is some sort of iterable
+    return Point3d(*(value[v] for v in range(3)))
 
 class PointSet(object):
     """This class is meant to hold a set of *unique* points.
 
     Basically this provides hooks to using a python 'set' containing tuples of
     the point coordinates.
+
+    Spatial queries (`nearest`, `within` and `in_box`) use a KDTree that is
+    built the first time it is needed. Points added afterwards are checked
+    directly until there are enough of them to be worth rebuilding the tree.
+
+    By default, points are only considered duplicates if their coordinates
+    are exactly equal. If a `tolerance` is given, any point closer than the
+    tolerance to a point already in the set is merged into that point. Close
+    points are found by hashing each point into a grid of cells as wide as
+    the tolerance, and checking the neighboring cells.
     """
-    def __init__(self, points=None):
+    def __init__(self, points=None, tolerance=None):
         # can be initialized with an empty set.
         # this set needs to contain tuples of point coords
         # and then extend and manage the use of that set
@@ -14,13 +45,37 @@ class PointSet(object):
         # becasue any input points will be placed there to start
         self.pointList = []
         self.pointDict = {}
-        if points:
+        self._array = None
+        self._index = None
+        # grid cell -> indices of the points in that cell
+        self._cells = {}
+        self.tolerance = tolerance
+        if points is not None:
             # parse the points to create the pointList and pointDict
             # we want to be able to accept points as tuples, as lists, as
             # Point3d objects, and as Vector3d objects. I guess if I add them
             # as iterables, that would be the simplest.
             self.points = points
 
+    @property
+    def tolerance(self):
+        """Get or set the distance within which points are merged. Setting
+        it rebuilds the grid of cells for the existing points, without
+        merging any of them."""
+        return self._tolerance
+
+    @tolerance.setter
+    def tolerance(self, value):
+        self._tolerance = value
+        self._grid()
+
+    def _grid(self):
+        """hash every point into the grid of cells for the tolerance"""
+        self._cells = {}
+        if self._tolerance is not None:
+            for i, p in enumerate(self.pointList):
+                self._cells.setdefault(self._cell(p.coords), []).append(i)
+
     @property
     def points(self):
         # go through the list and get each tuple as Point3d object
@@ -35,18 +90,92 @@ class PointSet(object):
         the OrderedDict in Python 3.0. I'm combining these two pieces for backwards
         compatibility.
         """
-        for i, val in enumerate(values):
-            # Vector3ds will need to be unwrapped
-            if isinstance(val, Vector3d):
-                point = Point3d(*val)
-            else:
-                # just assume it is some sort of iterable
-                point = Point3d(*(val[v] for v in range(3)))
-            # here will build the dictionary, using indices as the only
-            # value any given tuple refers to
-            self.pointDict[point] = i
-            # and here we also build up a list, for lookups by index
-            self.pointList.append(point)
+        self.extend(values)
+
+    def _changed(self):
+        """forget cached data that depends on the list of points"""
+        self._array = None
+
+    def asArray(self):
+        """Get the coordinates of all the points as a Vector3dArray, which
+        is cached until the PointSet changes."""
+        if self._array is None:
+            self._array = Vector3dArray(self.pointList)
+        return self._array
+
+    @property
+    def index(self):
+        """Get the KDTree for this PointSet, building it if the points have
+        changed a lot since it was last built."""
+        index = self._index
+        if index is None or len(self) - len(index) > max(256, len(index) // 16):
+            index = self._index = KDTree(self.asArray())
+        return index
+
+    def _unindexed(self):
+        """the points added since the index was built, with their indices"""
+        start = len(self.index)
+        return enumerate(self.pointList[start:], start)
+
+    def nearest(self, point, k=1):
+        """Get the indices of the `k` points nearest to `point`, closest
+        first."""
+        found = self.index.nearest(point, k)
+        point = tuple(point)
+        for i, p in self._unindexed():
+            found.append((sum((a - b) ** 2 for a, b in zip(p, point)), i))
+        found.sort()
+        return [i for d, i in found[:k]]
+
+    def within(self, point, radius):
+        """Get the sorted indices of all the points within `radius` of
+        `point`."""
+        found = self.index.within(point, radius)
+        point = tuple(point)
+        limit = radius * radius
+        for i, p in self._unindexed():
+            if sum((a - b) ** 2 for a, b in zip(p, point)) <= limit:
+                found.append(i)
+        return found
+
+    def in_box(self, box):
+        """Get the sorted indices of all the points inside a Box3d. Box
+        bounds follow `Interval.contains`: the start of each interval is
+        included and the end is not."""
+        bounds = [(i.start, i.end) for i in (box.x, box.y, box.z)]
+        found = self.index.in_box(bounds)
+        for i, p in self._unindexed():
+            if all(s <= c < e for c, (s, e) in zip(p, bounds)):
+                found.append(i)
+        return found
+
+    def convex_hull(self, dim=3):
+        """Find the convex hull of the points.
+
+        With `dim=2`, this is the hull of the points seen from above (their x
+        and y coordinates), as an array of the indices of its corners in
+        counterclockwise order. With `dim=3`, this is a closed
+        WingedEdgeMesh of the triangles of the hull, whose vertices are the
+        corners of the hull in the order they have in this set. See the
+        `hull` module.
+        """
+        data = self.asArray().data
+        if dim == 2:
+            if numpy is not None:
+                return convex_hull_2d(data.reshape(-1, 3)[:, :2])
+            return convex_hull_2d(array('d', [c for i, c in enumerate(data)
+                if i % 3 != 2]))
+        from .mesh import WingedEdgeMesh
+        faces = convex_hull_3d(data)
+        if numpy is not None:
+            corners, faces = numpy.unique(faces, return_inverse=True)
+            vertices = data.reshape(-1, 3)[corners]
+        else:
+            corners = sorted(set(faces))
+            position = dict(zip(corners, range(len(corners))))
+            faces = array('l', [position[i] for i in faces])
+            vertices = [self.pointList[i] for i in corners]
+        return WingedEdgeMesh(vertices, faces)
 
     def __getitem__(self, key):
         """This builds a dictionary / list-like api on the PointSet.
@@ -60,7 +189,10 @@ class PointSet(object):
         """
         # if it's a tuple or point3d and return the index
         if isinstance(key, tuple) or isinstance(key, Vector3d):
-            return self.pointDict[key]
+            index = self.find(key)
+            if index is None:
+                raise KeyError(key)
+            return index
         else:
             # assume it is an index or slice
             return self.pointList[key]
@@ -77,7 +209,14 @@ class PointSet(object):
         """checks to see if this set has an item that matches other
             other in self
         """
-        return self.pointDict.__contains__(other)
+        if not isinstance(other, Vector3d):
+            try:
+                other = tuple(other)
+            except TypeError:
+                return False
+            if len(other) != 3:
+                return False
+        return self.find(other) is not None
 
     def issubset(self, other):
         """Used to see if all the items of an iterable are contained in this
@@ -104,57 +243,159 @@ class PointSet(object):
     def __ge__(self, other):
         return self.issuperset(other)
 
-    def union(self, other):
+    def _match(self, other):
+        """Match up the points of self and other.
+
+        Returns three arrays: for each point of self, the index of the first
+        equal point in other (or -1); for each point of other, the index of
+        the equal point in self (or -1); and the indices of the points of
+        other that are not repeats of an earlier point in other.
+
+        With numpy, and if neither set has a tolerance, the packed coordinates
+        are compared as raw bytes with a single sort, instead of looking up
+        points one at a time.
+        """
+        tolerant = self.tolerance is not None or getattr(
+                other, 'tolerance', None) is not None
+        if numpy is not None and not tolerant:
+            mine = self.asArray().data.reshape(-1, 3)
+            theirs = pack(other, 3).reshape(-1, 3)
+            # adding 0.0 turns -0.0 into 0.0, so that equal floats have equal
+            # bytes
+            rows = numpy.ascontiguousarray(
+                    numpy.concatenate((mine, theirs)) + 0.0)
+            keys = rows.view(numpy.dtype((numpy.void, 24))).ravel()
+            unique, first, inverse = numpy.unique(
+                    keys, return_index=True, return_inverse=True)
+            inverse = inverse.ravel()
+            size = len(mine)
+            mine_keys, their_keys = inverse[:size], inverse[size:]
+            # the first position of each key in self and in other
+            in_mine = numpy.full(len(unique), -1, dtype=numpy.intp)
+            in_mine[mine_keys] = numpy.arange(size)
+            in_theirs = numpy.full(len(unique), -1, dtype=numpy.intp)
+            positions = numpy.arange(len(theirs))
+            in_theirs[their_keys[::-1]] = positions[::-1]
+            firsts = positions[in_theirs[their_keys] == positions]
+            return in_theirs[mine_keys], in_mine[their_keys], firsts
+        if isinstance(other, PointSet):
+            points = other.pointList
+            find = other.find
+            firsts = index_buffer(range(len(other)))
+        else:
+            points = [toPoint(v) for v in Vector3dArray(pack(other, 3))]
+            seen = {}
+            for j, p in enumerate(points):
+                seen.setdefault(p, j)
+            find = seen.get
+            firsts = index_buffer(
+                    j for j, p in enumerate(points) if seen[p] == j)
+        mine = index_buffer(-1 if i is None else i for i in map(find, self))
+        theirs = index_buffer(
+                -1 if i is None else i for i in map(self.find, points))
+        return mine, theirs, firsts
+
+    def _select(self, indices, other=None, other_indices=()):
+        """a new PointSet from some of the points of self and of other,
+        reusing the existing Point3d objects"""
+        points = [self.pointList[i] for i in indices]
+        if len(other_indices):
+            if isinstance(other, PointSet):
+                points.extend(other.pointList[i] for i in other_indices)
+            else:
+                rows = Vector3dArray(pack(other, 3))
+                points.extend(toPoint(rows[i]) for i in other_indices)
+        new = PointSet(tolerance=self.tolerance)
+        new.pointList = points
+        new.pointDict = dict(zip(points, range(len(points))))
+        new._grid()
+        return new
+
+    def _where(self, mask):
+        if numpy is not None:
+            return numpy.flatnonzero(mask)
+        return index_buffer(i for i, m in enumerate(mask) if m)
+
+    def union(self, other, return_indices=False):
         """returns a new PointSet with the points from self and the points from
         other.
         self | other
+
+        If `return_indices` is True, this returns the new PointSet along with
+        the indices of the points taken from self and from other.
         """
-        newList = []
-        for p in self:
-            newList.append(p)
-        for p in other:
-            newList.append(p)
-        return PointSet(newList)
+        mine, theirs, firsts = self._match(other)
+        if numpy is not None:
+            taken = firsts[theirs[firsts] < 0]
+        else:
+            taken = index_buffer(j for j in firsts if theirs[j] < 0)
+        own = index_buffer(range(len(self)))
+        result = self._select(own, other, taken)
+        if return_indices:
+            return result, own, taken
+        return result
     def __or__(self, other):
         return self.union(other)
 
-    def intersection(self, other):
-        """returns the set intersection between self and other
+    def intersection(self, other, return_indices=False):
+        """returns the set intersection between self and other, in the order
+        of other.
             self & other
+
+        If `return_indices` is True, this returns the new PointSet along with
+        the indices of the shared points in self and in other.
         """
-        newList = []
-        for p in other:
-            if p in self:
-                newList.append(p)
-        return PointSet(newList)
+        mine, theirs, firsts = self._match(other)
+        if numpy is not None:
+            taken = firsts[theirs[firsts] >= 0]
+            own = theirs[taken]
+        else:
+            taken = index_buffer(j for j in firsts if theirs[j] >= 0)
+            own = index_buffer(theirs[j] for j in taken)
+        result = self._select(own)
+        if return_indices:
+            return result, own, taken
+        return result
     def __and__(self, other):
         return self.intersection(other)
 
-    def difference(self, other):
+    def difference(self, other, return_indices=False):
         """
             self - other
+
+        If `return_indices` is True, this returns the new PointSet along with
+        the indices of the remaining points in self and an empty array of
+        indices in other.
         """
-        newList = []
-        for p in self:
-            if p not in other:
-                newList.append(p)
-        return PointSet(newList)
+        mine, theirs, firsts = self._match(other)
+        own = self._where([i < 0 for i in mine] if numpy is None
+                else mine < 0)
+        result = self._select(own)
+        if return_indices:
+            return result, own, index_buffer()
+        return result
     def __sub__(self, other):
         return self.difference(other)
 
-    def symmetric_difference(self, other):
+    def symmetric_difference(self, other, return_indices=False):
         """ Returns all the points in self and other that are not in the
             intersection of self and other.
             self ^ other
+
+        If `return_indices` is True, this returns the new PointSet along with
+        the indices of the points taken from self and from other.
         """
-        newList = []
-        for p in self:
-            if p not in other:
-                newList.append(p)
-        for p in other:
-            if p not in self:
-                newList.append(p)
-        return PointSet(newList)
+        mine, theirs, firsts = self._match(other)
+        if numpy is not None:
+            own = numpy.flatnonzero(mine < 0)
+            taken = firsts[theirs[firsts] < 0]
+        else:
+            own = self._where([i < 0 for i in mine])
+            taken = index_buffer(j for j in firsts if theirs[j] < 0)
+        result = self._select(own, other, taken)
+        if return_indices:
+            return result, own, taken
+        return result
     def __xor__(self, other):
         return self.symmetric_difference(other)
 
@@ -164,22 +405,103 @@ class PointSet(object):
         newList = []
         for p in self:
             newList.append(p)
-        return PointSet(newList)
+        return PointSet(newList, tolerance=self.tolerance)
+
+    def _cell(self, coords):
+        """the grid cell containing some coordinates"""
+        size = self.tolerance
+        return tuple(int(math.floor(c / size)) for c in coords)
+
+    def find(self, point):
+        """Get the index of the point in this set that matches `point`, or
+        None if there isn't one. If the set has a tolerance, this is the first
+        point within the tolerance of `point`.
+        """
+        if self.tolerance is None:
+            if not isinstance(point, Point3d):
+                point = toPoint(point)
+            return self.pointDict.get(point)
+        coords = tuple(point)
+        return self._find_near(coords, self._cell(coords))
+
+    def _find_near(self, coords, cell):
+        limit = self.tolerance * self.tolerance
+        x, y, z = coords
+        cx, cy, cz = cell
+        cells = self._cells
+        points = self.pointList
+        found = None
+        for i, j, k in NEIGHBOR_CELLS:
+            for index in cells.get((cx + i, cy + j, cz + k), ()):
+                p = points[index]
+                dx, dy, dz = p.x - x, p.y - y, p.z - z
+                if dx * dx + dy * dy + dz * dz <= limit and (
+                        found is None or index < found):
+                    found = index
+        return found
+
+    def _add(self, point, cell=None):
+        """add a point unless the set already has a matching point, and
+        return its index"""
+        index = self.pointDict.get(point)
+        if index is not None:
+            return index
+        if self.tolerance is not None:
+            if cell is None:
+                cell = self._cell(point.coords)
+            index = self._find_near(point.coords, cell)
+            if index is not None:
+                return index
+            self._cells.setdefault(cell, []).append(len(self.pointList))
+        index = len(self.pointList)
+        self.pointList.append(point)
+        self.pointDict[point] = index
+        return index
 
     def extend(self, other):
         """Adds an iterable of new points to the set.
+
+        Returns an array with the index in this set of each of the incoming
+        points, so that anything referring to the incoming points by index
+        (such as mesh faces) can be remapped in bulk, even if some of the
+        points were merged into existing ones.
         """
-        length = len(self)
-        for i, p in enumerate(other):
-            self.pointList.append(p)
-            self.pointDict[p] = i + length
+        self._changed()
+        add = self._add
+        if self.tolerance is None:
+            return index_buffer(add(toPoint(p)) for p in other)
+        # find all the grid cells at once
+        data = pack(other, 3)
+        if numpy is not None:
+            rows = data.reshape(-1, 3)
+            cells = numpy.floor(rows / self.tolerance).astype(numpy.int64)
+            rows = rows.tolist()
+            cells = cells.tolist()
+        else:
+            rows = list(zip(*[iter(data)] * 3))
+            cells = [self._cell(r) for r in rows]
+        return index_buffer(add(Point3d(*r), tuple(c))
+                for r, c in zip(rows, cells))
     def __ior__(self, other):
-        return self.extend(other)
+        self.extend(other)
+        return self
 
     def append(self, other):
-        """Adds a new point to the set.
+        """Adds a new point to the set, and returns its index.
         """
-        length = len(self)
-        self.pointList.append(other)
-        self.pointDict[other] = length
+        self._changed()
+        return self._add(toPoint(other))
+
+
+def weld(coords, tolerance):
+    """Merge points that are within `tolerance` of each other.
+
+    Returns a new PointSet of the merged points and an array with the index
+    of the merged point for each of the given coordinates. Faces of a mesh
+    built on `coords` can be rewritten to use the merged points by looking up
+    each vertex index in this array.
+    """
+    points = PointSet(tolerance=tolerance)
+    remap = points.extend(coords)
+    return points, remap
 
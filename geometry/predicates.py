@@ -0,0 +1,266 @@
+"""This module contains robust geometric predicates.
+
+Each predicate first computes its determinant in ordinary floating point, and
+checks it against an error bound (following Shewchuk's "Adaptive Precision
+Floating-Point Arithmetic and Fast Robust Geometric Predicates"). Only when
+the sign can't be trusted is the determinant recomputed exactly with
+`fractions.Fraction`, which rarely happens outside of degenerate input.
+
+The result is a number whose sign is always correct: positive, negative or
+exactly zero. The floating point filters assume float (or int) coordinates;
+for coordinates that are already exact fractions, use the `_exact` versions.
+
+Each predicate also has a `_batch` version that evaluates many sets of points
+at once. The points are given as packed coordinates (see `vectors.pack`),
+and with numpy the filter runs over all of them in one pass, so that only the
+uncertain ones are recomputed exactly, one at a time.
+"""
+import math
+from array import array
+from fractions import Fraction
+
+from .core import numpy
+from .vectors import pack
+
+EPSILON = 2.0 ** -53
+
+CCW_BOUND = (3.0 + 16.0 * EPSILON) * EPSILON
+
+O3D_BOUND = (7.0 + 56.0 * EPSILON) * EPSILON
+
+ICC_BOUND = (10.0 + 96.0 * EPSILON) * EPSILON
+
+ISP_BOUND = (16.0 + 224.0 * EPSILON) * EPSILON
+
+SMALLEST = 5e-324
+
+
+def _signed(exact):
+    """turn an exact determinant into a float with the same sign"""
+    value = float(exact)
+    if value == 0 and exact != 0:
+        # the determinant is too small to be a float
+        return math.copysign(SMALLEST, exact)
+    return value
+
+
+def orient2d_exact(a, b, c):
+    """orient2d, computed with exact arithmetic"""
+    ax, ay = Fraction(a[0]), Fraction(a[1])
+    bx, by = Fraction(b[0]), Fraction(b[1])
+    cx, cy = Fraction(c[0]), Fraction(c[1])
+    return _signed((ax - cx) * (by - cy) - (ay - cy) * (bx - cx))
+
+
+def orient2d(a, b, c):
+    """Get a positive number if the points a, b and c go counterclockwise,
+    a negative number if they go clockwise, and zero if they are on a line.
+    Equivalently, this is positive if c is to the left of the line from a to
+    b.
+    """
+    left = (a[0] - c[0]) * (b[1] - c[1])
+    right = (a[1] - c[1]) * (b[0] - c[0])
+    det = left - right
+    if left > 0:
+        if right <= 0:
+            return det
+        total = left + right
+    elif left < 0:
+        if right >= 0:
+            return det
+        total = -left - right
+    else:
+        return det
+    bound = CCW_BOUND * total
+    if det >= bound or -det >= bound:
+        return det
+    return orient2d_exact(a, b, c)
+
+
+def orient3d_exact(a, b, c, d):
+    """orient3d, computed with exact arithmetic"""
+    return _signed(_orient3d(*[[Fraction(v) for v in p[:3]]
+        for p in (a, b, c, d)])[0])
+
+
+def _orient3d(a, b, c, d):
+    """the orient3d determinant and its permanent, for the error bound"""
+    adx, ady, adz = a[0] - d[0], a[1] - d[1], a[2] - d[2]
+    bdx, bdy, bdz = b[0] - d[0], b[1] - d[1], b[2] - d[2]
+    cdx, cdy, cdz = c[0] - d[0], c[1] - d[1], c[2] - d[2]
+    bdxcdy, cdxbdy = bdx * cdy, cdx * bdy
+    cdxady, adxcdy = cdx * ady, adx * cdy
+    adxbdy, bdxady = adx * bdy, bdx * ady
+    det = (adz * (bdxcdy - cdxbdy) + bdz * (cdxady - adxcdy) +
+            cdz * (adxbdy - bdxady))
+    permanent = ((abs(bdxcdy) + abs(cdxbdy)) * abs(adz) +
+            (abs(cdxady) + abs(adxcdy)) * abs(bdz) +
+            (abs(adxbdy) + abs(bdxady)) * abs(cdz))
+    return det, permanent
+
+
+def orient3d(a, b, c, d):
+    """Get a positive number if d is below the plane through a, b and c,
+    where "below" means that a, b and c appear counterclockwise when seen
+    from above. The result is negative if d is above the plane, and zero if
+    the four points are on a plane.
+    """
+    det, permanent = _orient3d(a, b, c, d)
+    bound = O3D_BOUND * permanent
+    if det > bound or -det > bound:
+        return det
+    return orient3d_exact(a, b, c, d)
+
+
+def incircle_exact(a, b, c, d):
+    """incircle, computed with exact arithmetic"""
+    return _signed(_incircle(*[[Fraction(v) for v in p[:2]]
+        for p in (a, b, c, d)])[0])
+
+
+def _incircle(a, b, c, d):
+    """the incircle determinant and its permanent, for the error bound"""
+    adx, ady = a[0] - d[0], a[1] - d[1]
+    bdx, bdy = b[0] - d[0], b[1] - d[1]
+    cdx, cdy = c[0] - d[0], c[1] - d[1]
+    bdxcdy, cdxbdy = bdx * cdy, cdx * bdy
+    cdxady, adxcdy = cdx * ady, adx * cdy
+    adxbdy, bdxady = adx * bdy, bdx * ady
+    alift = adx * adx + ady * ady
+    blift = bdx * bdx + bdy * bdy
+    clift = cdx * cdx + cdy * cdy
+    det = (alift * (bdxcdy - cdxbdy) + blift * (cdxady - adxcdy) +
+            clift * (adxbdy - bdxady))
+    permanent = ((abs(bdxcdy) + abs(cdxbdy)) * alift +
+            (abs(cdxady) + abs(adxcdy)) * blift +
+            (abs(adxbdy) + abs(bdxady)) * clift)
+    return det, permanent
+
+
+def incircle(a, b, c, d):
+    """Get a positive number if d is inside the circle through a, b and c,
+    a negative number if it is outside, and zero if the four points are on a
+    circle. The points a, b and c must go counterclockwise, or the sign is
+    reversed.
+    """
+    det, permanent = _incircle(a, b, c, d)
+    bound = ICC_BOUND * permanent
+    if det > bound or -det > bound:
+        return det
+    return incircle_exact(a, b, c, d)
+
+
+def insphere_exact(a, b, c, d, e):
+    """insphere, computed with exact arithmetic"""
+    return _signed(_insphere(*[[Fraction(v) for v in p[:3]]
+        for p in (a, b, c, d, e)])[0])
+
+
+def _insphere(a, b, c, d, e):
+    """the insphere determinant and its permanent, for the error bound"""
+    aex, aey, aez = a[0] - e[0], a[1] - e[1], a[2] - e[2]
+    bex, bey, bez = b[0] - e[0], b[1] - e[1], b[2] - e[2]
+    cex, cey, cez = c[0] - e[0], c[1] - e[1], c[2] - e[2]
+    dex, dey, dez = d[0] - e[0], d[1] - e[1], d[2] - e[2]
+    # 2x2 minors, and the same minors with every product made positive
+    ab, abp = aex * bey - bex * aey, abs(aex * bey) + abs(bex * aey)
+    bc, bcp = bex * cey - cex * bey, abs(bex * cey) + abs(cex * bey)
+    cd, cdp = cex * dey - dex * cey, abs(cex * dey) + abs(dex * cey)
+    da, dap = dex * aey - aex * dey, abs(dex * aey) + abs(aex * dey)
+    ac, acp = aex * cey - cex * aey, abs(aex * cey) + abs(cex * aey)
+    bd, bdp = bex * dey - dex * bey, abs(bex * dey) + abs(dex * bey)
+    abc = aez * bc - bez * ac + cez * ab
+    bcd = bez * cd - cez * bd + dez * bc
+    cda = cez * da + dez * ac + aez * cd
+    dab = dez * ab + aez * bd + bez * da
+    alift = aex * aex + aey * aey + aez * aez
+    blift = bex * bex + bey * bey + bez * bez
+    clift = cex * cex + cey * cey + cez * cez
+    dlift = dex * dex + dey * dey + dez * dez
+    det = (dlift * abc - clift * dab) + (blift * cda - alift * bcd)
+    abs_a, abs_b, abs_c, abs_d = abs(aez), abs(bez), abs(cez), abs(dez)
+    permanent = (
+            dlift * (abs_a * bcp + abs_b * acp + abs_c * abp) +
+            clift * (abs_d * abp + abs_a * bdp + abs_b * dap) +
+            blift * (abs_c * dap + abs_d * acp + abs_a * cdp) +
+            alift * (abs_b * cdp + abs_c * bdp + abs_d * bcp))
+    return det, permanent
+
+
+def insphere(a, b, c, d, e):
+    """Get a positive number if e is inside the sphere through a, b, c and
+    d, a negative number if it is outside, and zero if the five points are
+    on a sphere. The points a, b, c and d must have a positive `orient3d`,
+    or the sign is reversed.
+    """
+    det, permanent = _insphere(a, b, c, d, e)
+    bound = ISP_BOUND * permanent
+    if det > bound or -det > bound:
+        return det
+    return insphere_exact(a, b, c, d, e)
+
+
+def _rows(points, dim):
+    """packed points as numpy columns, or as a list of tuples"""
+    data = pack(points, dim)
+    if numpy is not None:
+        rows = numpy.asarray(data, dtype=float).reshape(-1, dim)
+        return [rows[:, k] for k in range(dim)]
+    return list(zip(*[iter(data)] * dim))
+
+
+def _batch(kernel, exact, scalar, dim, groups):
+    """Evaluate a predicate for many sets of points. `kernel` computes the
+    determinants and permanents of numpy columns."""
+    columns = [_rows(points, dim) for points in groups]
+    if numpy is None:
+        return array('d', [scalar(*row) for row in zip(*columns)])
+    det, bound = kernel(*[[c[k] for k in range(dim)] for c in columns])
+    uncertain = numpy.flatnonzero(numpy.abs(det) <= bound)
+    for i in uncertain.tolist():
+        det[i] = exact(*[tuple(c[k][i] for k in range(dim))
+            for c in columns])
+    return det
+
+
+def _orient2d_columns(a, b, c):
+    left = (a[0] - c[0]) * (b[1] - c[1])
+    right = (a[1] - c[1]) * (b[0] - c[0])
+    det = left - right
+    return det, CCW_BOUND * (numpy.abs(left) + numpy.abs(right))
+
+
+def orient2d_batch(a, b, c):
+    """`orient2d` for many triangles, given as packed 2d points a, b and c.
+    Returns an array of results, one for each triangle."""
+    return _batch(_orient2d_columns, orient2d_exact, orient2d, 2, (a, b, c))
+
+
+def _columns(function, bound):
+    """a numpy kernel from the scalar determinant and permanent functions,
+    which only use arithmetic and `abs`"""
+    def kernel(*points):
+        det, permanent = function(*points)
+        return det, bound * permanent
+    return kernel
+
+
+def orient3d_batch(a, b, c, d):
+    """`orient3d` for many tetrahedra, given as packed 3d points a, b, c and
+    d. Returns an array of results, one for each tetrahedron."""
+    return _batch(_columns(_orient3d, O3D_BOUND), orient3d_exact, orient3d,
+            3, (a, b, c, d))
+
+
+def incircle_batch(a, b, c, d):
+    """`incircle` for many sets of packed 2d points a, b, c and d. Returns
+    an array of results, one for each set."""
+    return _batch(_columns(_incircle, ICC_BOUND), incircle_exact, incircle,
+            2, (a, b, c, d))
+
+
+def insphere_batch(a, b, c, d, e):
+    """`insphere` for many sets of packed 3d points a, b, c, d and e.
+    Returns an array of results, one for each set."""
+    return _batch(_columns(_insphere, ISP_BOUND), insphere_exact, insphere,
+            3, (a, b, c, d, e))
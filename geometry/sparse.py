@@ -0,0 +1,355 @@
+"""This module contains a sparse matrix class for large, mostly empty
+operators, such as the Laplacian or smoothing matrix of a mesh.
+
+Sparse matrices are stored in compressed sparse row (CSR) form, which takes
+memory in proportion to the number of stored values:
+
+    indptr  - for each row, where its values start in `indices` and `values`
+              (with one extra entry at the end)
+    indices - the column of each stored value
+    values  - the stored values
+
+The arrays are numpy arrays when numpy is available, and `array` module
+arrays otherwise.
+"""
+import math
+import numbers
+from array import array
+
+from .core import numpy
+from .matrix import Matrix, MatrixError
+from .vectors import VectorArrayBase, Vector3dArray, pack
+
+
+class SparseMatrix(object):
+    """An immutable sparse matrix in compressed sparse row form.
+
+    Use `SparseMatrix.from_triplets` to build one from (row, column, value)
+    entries.
+    """
+    def __init__(self, indptr, indices, values, shape):
+        """Wrap existing CSR arrays. Within each row, the column indices are
+        expected to be sorted and unique."""
+        self.indptr = indptr
+        self.indices = indices
+        self.values = values
+        self.shape = tuple(shape)
+        self._row_ids = None
+        if len(indptr) != self.shape[0] + 1:
+            raise MatrixError("indptr must have one entry per row, plus one")
+
+    @classmethod
+    def from_triplets(cls, rows, cols, values, shape=None):
+        """Build a sparse matrix from three sequences of the same length: the
+        row, column and value of each entry. Values given more than once for
+        the same row and column are added together, as is usual when
+        assembling mesh operators. If `shape` is not given it is the smallest
+        shape that fits all the entries.
+        """
+        if numpy is not None:
+            rows = numpy.asarray(rows, dtype=numpy.intp).ravel()
+            cols = numpy.asarray(cols, dtype=numpy.intp).ravel()
+            values = numpy.asarray(values, dtype=float).ravel()
+            if shape is None:
+                shape = (int(rows.max()) + 1 if len(rows) else 0,
+                         int(cols.max()) + 1 if len(cols) else 0)
+            cls._check_entries(rows, cols, shape)
+            order = numpy.lexsort((cols, rows))
+            rows, cols, values = rows[order], cols[order], values[order]
+            if len(rows):
+                # sum the values of repeated entries
+                starts = numpy.concatenate(([True],
+                    (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])))
+                positions = numpy.flatnonzero(starts)
+                values = numpy.add.reduceat(values, positions)
+                rows, cols = rows[positions], cols[positions]
+            indptr = numpy.zeros(shape[0] + 1, dtype=numpy.intp)
+            numpy.cumsum(numpy.bincount(rows, minlength=shape[0]),
+                    out=indptr[1:])
+            return cls(indptr, cols, values, shape)
+        entries = {}
+        for r, c, v in zip(rows, cols, values):
+            key = (int(r), int(c))
+            entries[key] = entries.get(key, 0.0) + v
+        if shape is None:
+            shape = (max([r for r, c in entries] or [-1]) + 1,
+                     max([c for r, c in entries] or [-1]) + 1)
+        keys = sorted(entries)
+        cls._check_entries([r for r, c in keys], [c for r, c in keys], shape)
+        indptr = array('l', bytes(array('l').itemsize * (shape[0] + 1)))
+        for r, c in keys:
+            indptr[r + 1] += 1
+        for r in range(shape[0]):
+            indptr[r + 1] += indptr[r]
+        return cls(indptr, array('l', [c for r, c in keys]),
+                array('d', [entries[k] for k in keys]), shape)
+
+    @staticmethod
+    def _check_entries(rows, cols, shape):
+        if not len(rows):
+            return
+        if numpy is not None and isinstance(rows, numpy.ndarray):
+            bounds = rows.min(), rows.max(), cols.min(), cols.max()
+        else:
+            bounds = min(rows), max(rows), min(cols), max(cols)
+        if (bounds[0] < 0 or bounds[1] >= shape[0] or
+                bounds[2] < 0 or bounds[3] >= shape[1]):
+            msg = "Entries fall outside of a %sx%s matrix" % tuple(shape)
+            raise MatrixError( msg )
+
+    @classmethod
+    def from_dense(cls, matrix):
+        """Build a sparse matrix from the nonzero values of a Matrix or any
+        table of numbers."""
+        rows, cols, values = [], [], []
+        table = list(matrix)
+        for i, row in enumerate(table):
+            for j, value in enumerate(row):
+                if value:
+                    rows.append(i)
+                    cols.append(j)
+                    values.append(value)
+        return cls.from_triplets(rows, cols, values,
+                shape=(len(table), len(table[0])))
+
+    def rows(self):
+        """return the number of rows in this matrix"""
+        return self.shape[0]
+
+    def cols(self):
+        """return the number of columns in this matrix"""
+        return self.shape[1]
+
+    @property
+    def nnz(self):
+        """the number of stored values"""
+        return len(self.values)
+
+    def row_ids(self):
+        """the row of each stored value"""
+        if self._row_ids is None:
+            indptr = self.indptr
+            if numpy is not None:
+                self._row_ids = numpy.repeat(
+                        numpy.arange(self.shape[0]), numpy.diff(indptr))
+            else:
+                self._row_ids = array('l', [r for r in range(self.shape[0])
+                    for k in range(indptr[r], indptr[r + 1])])
+        return self._row_ids
+
+    def triplets(self):
+        """iterate through (row, column, value) for each stored value"""
+        return zip(self.row_ids(), self.indices, self.values)
+
+    def transpose(self):
+        """Return a new SparseMatrix with columns and rows transposed"""
+        return self.from_triplets(self.indices, self.row_ids(), self.values,
+                shape=(self.shape[1], self.shape[0]))
+
+    def diagonal(self):
+        """the values on the diagonal, as a flat buffer"""
+        size = min(self.shape)
+        if numpy is not None:
+            diagonal = numpy.zeros(size)
+            rows = self.row_ids()
+            mask = rows == self.indices
+            diagonal[rows[mask]] = self.values[mask]
+            return diagonal
+        diagonal = array('d', bytes(8 * size))
+        for r, c, v in self.triplets():
+            if r == c:
+                diagonal[r] = v
+        return diagonal
+
+    def to_dense(self):
+        """get this matrix as a dense Matrix"""
+        table = [[0.0] * self.shape[1] for i in range(self.shape[0])]
+        for r, c, v in self.triplets():
+            table[r][c] = v
+        return Matrix(table)
+
+    def _columns(self, other):
+        """get a dense right hand side as a flat buffer and its number of
+        columns"""
+        if isinstance(other, VectorArrayBase):
+            return other.data, other.dim
+        if hasattr(other, 'asArray'):
+            return other.asArray().data, 3
+        if isinstance(other, Matrix):
+            return pack(other, other.cols()), other.cols()
+        if numpy is not None and isinstance(other, numpy.ndarray):
+            columns = 1 if other.ndim == 1 else other.shape[1]
+            return pack(other, columns), columns
+        values = list(other)
+        if values and not isinstance(values[0], numbers.Number):
+            columns = len(values[0])
+            return pack(values, columns), columns
+        if numpy is not None:
+            return numpy.array(values, dtype=float), 1
+        return array('d', values), 1
+
+    def _wrap(self, other, data, columns):
+        """return a product in the same form as the right hand side, or as a
+        Vector3dArray for a PointSet"""
+        if isinstance(other, Matrix):
+            if numpy is not None:
+                return Matrix._from_array(data.reshape(-1, columns))
+            return Matrix(zip(*[iter(data)] * columns))
+        if isinstance(other, VectorArrayBase) or hasattr(other, 'asArray'):
+            cls = Vector3dArray if columns == 3 else other.__class__
+            return cls.fromBuffer(data)
+        if numpy is not None and isinstance(other, numpy.ndarray):
+            return data.reshape((-1,) + other.shape[1:])
+        if columns == 1:
+            return data
+        return [tuple(data[i:i + columns])
+                for i in range(0, len(data), columns)]
+
+    def _dot(self, data, columns):
+        """multiply by a flat, row-major buffer with `columns` columns"""
+        rows, size = self.shape
+        if len(data) != size * columns:
+            msg = """To find the product, the other matrix must have %s rows,
+            but it has %s.""" % (size, len(data) // columns)
+            raise MatrixError( msg )
+        if numpy is not None:
+            dense = data.reshape(-1, columns)
+            products = self.values[:, None] * dense[self.indices]
+            row_ids = self.row_ids()
+            result = numpy.empty((rows, columns))
+            for c in range(columns):
+                result[:, c] = numpy.bincount(row_ids, weights=products[:, c],
+                        minlength=rows)
+            return result.reshape(-1)
+        result = array('d', bytes(8 * rows * columns))
+        indptr, indices, values = self.indptr, self.indices, self.values
+        for r in range(rows):
+            start, stop = indptr[r], indptr[r + 1]
+            for c in range(columns):
+                total = 0.0
+                for k in range(start, stop):
+                    total += values[k] * data[indices[k] * columns + c]
+                result[r * columns + c] = total
+        return result
+
+    def dot(self, other):
+        """Multiply this matrix by a dense right hand side.
+
+        `other` can be a flat sequence of numbers (one per column of this
+        matrix), a vector array or PointSet (one point per column), a numpy
+        array, a list of coordinate tuples or a Matrix. The result has the
+        same form, so multiplying the coordinates of a mesh's vertices by a
+        smoothing operator gives new coordinates. The exception is a
+        PointSet, which gives a Vector3dArray: a PointSet would merge points
+        that end up close together, and lose their order.
+        """
+        data, columns = self._columns(other)
+        return self._wrap(other, self._dot(data, columns), columns)
+
+    def __mul__(self, other):
+        """multiply by a number, or by a dense right hand side"""
+        if isinstance(other, numbers.Number):
+            if numpy is not None:
+                values = self.values * other
+            else:
+                values = array('d', [v * other for v in self.values])
+            return SparseMatrix(self.indptr, self.indices, values, self.shape)
+        return self.dot(other)
+
+    def __rmul__(self, other):
+        if isinstance(other, numbers.Number):
+            return self * other
+        return NotImplemented
+
+    def cg(self, b, x0=None, tolerance=1e-10, max_iterations=None):
+        """Solve self * x = b with the conjugate gradient method.
+
+        This matrix must be symmetric and positive definite. `b` can be in
+        any form accepted by `dot`. If it has several columns (for example,
+        the coordinates of many points), each column is solved at the same
+        time. Iteration stops when the residual of every column is smaller
+        than `tolerance` times the size of that column of `b`, and raises a
+        MatrixError if that doesn't happen within `max_iterations`.
+        """
+        if self.shape[0] != self.shape[1]:
+            raise MatrixError("Only square matrices can be solved")
+        data, columns = self._columns(b)
+        if max_iterations is None:
+            max_iterations = 10 * self.shape[0]
+        if x0 is None:
+            x = data * 0.0 if numpy is not None else array(
+                    'd', bytes(8 * len(data)))
+        else:
+            x = self._columns(x0)[0]
+            x = x.copy() if numpy is not None else array('d', x)
+        if numpy is not None:
+            x = self._cg_numpy(data, x, columns, tolerance, max_iterations)
+        else:
+            x = self._cg_python(data, x, columns, tolerance, max_iterations)
+        return self._wrap(b, x, columns)
+
+    def _cg_numpy(self, b, x, columns, tolerance, max_iterations):
+        b = b.reshape(-1, columns)
+        x = x.reshape(-1, columns)
+        r = b - self._dot(x.reshape(-1), columns).reshape(-1, columns)
+        p = r.copy()
+        rr = (r * r).sum(axis=0)
+        limits = (tolerance * numpy.sqrt((b * b).sum(axis=0))) ** 2
+        for i in range(max_iterations):
+            if (rr <= limits).all():
+                break
+            ap = self._dot(p.reshape(-1), columns).reshape(-1, columns)
+            pap = (p * ap).sum(axis=0)
+            # columns that have already converged stop changing
+            alpha = numpy.where(pap != 0, rr / numpy.where(pap != 0, pap, 1),
+                    0.0)
+            x += alpha * p
+            r -= alpha * ap
+            new_rr = (r * r).sum(axis=0)
+            beta = numpy.where(rr != 0, new_rr / numpy.where(rr != 0, rr, 1),
+                    0.0)
+            p = r + beta * p
+            rr = new_rr
+        if not (rr <= limits).all():
+            self._diverged(max_iterations, numpy.sqrt(rr.max()))
+        return x.reshape(-1)
+
+    @staticmethod
+    def _diverged(iterations, residual):
+        msg = """The conjugate gradient method did not converge in %s
+        iterations, the residual is still %s""" % (iterations, residual)
+        raise MatrixError( msg )
+
+    def _cg_python(self, b, x, columns, tolerance, max_iterations):
+        size = len(b)
+        def column_dots(u, v):
+            return [sum(u[i] * v[i] for i in range(c, size, columns))
+                    for c in range(columns)]
+        ax = self._dot(x, columns)
+        r = array('d', [bi - ai for bi, ai in zip(b, ax)])
+        p = array('d', r)
+        rr = column_dots(r, r)
+        limits = [(tolerance * math.sqrt(v)) ** 2
+                for v in column_dots(b, b)]
+        for i in range(max_iterations):
+            if all(v <= l for v, l in zip(rr, limits)):
+                break
+            ap = self._dot(p, columns)
+            pap = column_dots(p, ap)
+            alpha = [v / w if w else 0.0 for v, w in zip(rr, pap)]
+            for k in range(size):
+                a = alpha[k % columns]
+                x[k] += a * p[k]
+                r[k] -= a * ap[k]
+            new_rr = column_dots(r, r)
+            beta = [v / w if w else 0.0 for v, w in zip(new_rr, rr)]
+            for k in range(size):
+                p[k] = r[k] + beta[k % columns] * p[k]
+            rr = new_rr
+        if not all(v <= l for v, l in zip(rr, limits)):
+            self._diverged(max_iterations, math.sqrt(max(rr)))
+        return x
+
+    def __repr__(self):
+        return '<SparseMatrix %sx%s with %s values>' % (
+                self.shape[0], self.shape[1], self.nnz)
@@ -0,0 +1,792 @@
+"""This module contains spatial indices for fast queries over many points
+and boxes.
+
+The KDTree here is built over packed coordinates (see `vectors.pack`). It
+does not hold any Point objects, just a permutation of point indices and a
+small table of nodes, so it costs a few bytes per point on top of the
+coordinates themselves. The BVH is built the same way over the packed corners
+of boxes.
+"""
+import heapq
+from array import array
+
+from .core import numpy
+from .vectors import pack
+
+
+class KDTree(object):
+    """A static, balanced kd-tree over packed coordinates.
+
+    Each node covers a contiguous range of `order`, a permutation of the
+    point indices, and stores the bounding box of its points. Nodes are split
+    at the median of their widest axis until they hold at most `leafsize`
+    points.
+
+    All queries return indices into the coordinates the tree was built from.
+    """
+    def __init__(self, coords, dim=3, leafsize=32):
+        self.dim = dim
+        self.leafsize = leafsize
+        self.data = pack(coords, dim)
+        self.size = len(self.data) // dim
+        # node tables
+        self.starts = []
+        self.stops = []
+        self.lefts = []
+        self.rights = []
+        self.lower = []
+        self.upper = []
+        self._build()
+
+    @classmethod
+    def fromNodes(cls, coords, order, nodes, dim=3, leafsize=32):
+        """Rebuild a tree that was saved earlier, without sorting anything.
+
+        `nodes` is a sequence of (start, stop, left, right, lower, upper)
+        rows, one for each node, as returned by `nodes`.
+        """
+        new = cls.__new__(cls)
+        new.dim = dim
+        new.leafsize = leafsize
+        new.data = pack(coords, dim)
+        new.size = len(new.data) // dim
+        new.order = order
+        new.starts, new.stops, new.lefts, new.rights = [], [], [], []
+        new.lower, new.upper = [], []
+        for start, stop, left, right, lower, upper in nodes:
+            new.starts.append(start)
+            new.stops.append(stop)
+            new.lefts.append(left)
+            new.rights.append(right)
+            new.lower.append(tuple(lower))
+            new.upper.append(tuple(upper))
+        return new
+
+    def nodes(self):
+        """iterate through the nodes as (start, stop, left, right, lower,
+        upper) rows"""
+        return zip(self.starts, self.stops, self.lefts, self.rights,
+                self.lower, self.upper)
+
+    def __len__(self):
+        return self.size
+
+    def _point(self, i):
+        """get the coordinates of point i as a tuple"""
+        dim = self.dim
+        if numpy is not None:
+            return tuple(self.data[i * dim:(i + 1) * dim].tolist())
+        return tuple(self.data[i * dim:(i + 1) * dim])
+
+    def _add_node(self, start, stop, lower, upper):
+        self.starts.append(start)
+        self.stops.append(stop)
+        self.lefts.append(-1)
+        self.rights.append(-1)
+        self.lower.append(lower)
+        self.upper.append(upper)
+        return len(self.starts) - 1
+
+    def _build(self):
+        size = self.size
+        dim = self.dim
+        if numpy is not None:
+            rows = self.data.reshape(-1, dim)
+            self.order = numpy.arange(size, dtype=numpy.intp)
+        else:
+            data = self.data
+            self.order = array('l', range(size))
+        if not size:
+            return
+        order = self.order
+        stack = [(0, size, -1, None)]
+        while stack:
+            start, stop, parent, children = stack.pop()
+            if numpy is not None:
+                segment = order[start:stop]
+                points = rows[segment]
+                lower = tuple(points.min(axis=0).tolist())
+                upper = tuple(points.max(axis=0).tolist())
+            else:
+                segment = order[start:stop]
+                lower = tuple(min(data[i * dim + a] for i in segment)
+                        for a in range(dim))
+                upper = tuple(max(data[i * dim + a] for i in segment)
+                        for a in range(dim))
+            node = self._add_node(start, stop, lower, upper)
+            if parent >= 0:
+                children[parent] = node
+            if stop - start <= self.leafsize:
+                continue
+            spans = [h - l for l, h in zip(lower, upper)]
+            axis = spans.index(max(spans))
+            mid = (start + stop) // 2
+            if numpy is not None:
+                keys = points[:, axis]
+                order[start:stop] = segment[
+                        numpy.argpartition(keys, mid - start)]
+            else:
+                order[start:stop] = array('l', sorted(segment,
+                    key=lambda i: data[i * dim + axis]))
+            stack.append((mid, stop, node, self.rights))
+            stack.append((start, mid, node, self.lefts))
+
+    def _min_distance(self, node, point):
+        """squared distance from a point to the bounding box of a node"""
+        total = 0.0
+        for c, l, h in zip(point, self.lower[node], self.upper[node]):
+            if c < l:
+                total += (l - c) * (l - c)
+            elif c > h:
+                total += (c - h) * (c - h)
+        return total
+
+    def _max_distance(self, node, point):
+        """squared distance from a point to the farthest corner of a node"""
+        total = 0.0
+        for c, l, h in zip(point, self.lower[node], self.upper[node]):
+            d = max(c - l, h - c)
+            total += d * d
+        return total
+
+    def _leaf_distances(self, node, point):
+        """get the indices and squared distances of the points in a leaf"""
+        indices = self.order[self.starts[node]:self.stops[node]]
+        dim = self.dim
+        if numpy is not None:
+            rows = self.data.reshape(-1, dim)[indices]
+            rows = rows - numpy.array(point)
+            return indices.tolist(), (rows * rows).sum(axis=1).tolist()
+        data = self.data
+        distances = []
+        for i in indices:
+            total = 0.0
+            for a in range(dim):
+                d = data[i * dim + a] - point[a]
+                total += d * d
+            distances.append(total)
+        return indices, distances
+
+    def _range(self, node):
+        """all the indices covered by a node"""
+        return self.order[self.starts[node]:self.stops[node]].tolist()
+
+    def nearest(self, point, k=1):
+        """Get the indices of the `k` points nearest to `point`, closest
+        first, along with their squared distances, as a list of
+        (squared distance, index) tuples.
+        """
+        point = tuple(point)[:self.dim]
+        if not self.size or k < 1:
+            return []
+        best = []  # a max-heap of (-distance, -index)
+        queue = [(self._min_distance(0, point), 0)]
+        while queue:
+            distance, node = heapq.heappop(queue)
+            if len(best) == k and distance > -best[0][0]:
+                break
+            left = self.lefts[node]
+            if left < 0:
+                indices, distances = self._leaf_distances(node, point)
+                for i, d in zip(indices, distances):
+                    if len(best) < k:
+                        heapq.heappush(best, (-d, -i))
+                    elif (-d, -i) > best[0]:
+                        heapq.heapreplace(best, (-d, -i))
+            else:
+                for child in (left, self.rights[node]):
+                    heapq.heappush(queue,
+                            (self._min_distance(child, point), child))
+        return sorted((-d, -i) for d, i in best)
+
+    def within(self, point, radius):
+        """Get the sorted indices of all the points within `radius` of
+        `point`.
+        """
+        point = tuple(point)[:self.dim]
+        if not self.size:
+            return []
+        limit = radius * radius
+        found = []
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if self._min_distance(node, point) > limit:
+                continue
+            if self._max_distance(node, point) <= limit:
+                found.extend(self._range(node))
+            elif self.lefts[node] < 0:
+                indices, distances = self._leaf_distances(node, point)
+                found.extend(i for i, d in zip(indices, distances)
+                        if d <= limit)
+            else:
+                stack.append(self.lefts[node])
+                stack.append(self.rights[node])
+        found.sort()
+        return found
+
+    def in_box(self, bounds):
+        """Get the sorted indices of all the points within some bounds.
+
+        `bounds` is a sequence of (start, end) pairs, one for each axis. As
+        with `Interval.contains`, the start is included and the end is not.
+        """
+        bounds = list(bounds)[:self.dim]
+        if not self.size:
+            return []
+        found = []
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            lower = self.lower[node]
+            upper = self.upper[node]
+            if any(h < s or l >= e for l, h, (s, e)
+                    in zip(lower, upper, bounds)):
+                continue
+            if all(l >= s and h < e for l, h, (s, e)
+                    in zip(lower, upper, bounds)):
+                found.extend(self._range(node))
+            elif self.lefts[node] < 0:
+                for i in self._range(node):
+                    point = self._point(i)
+                    if all(s <= c < e for c, (s, e) in zip(point, bounds)):
+                        found.append(i)
+            else:
+                stack.append(self.lefts[node])
+                stack.append(self.rights[node])
+        found.sort()
+        return found
+
+
+def _corners(boxes):
+    """the lower and upper corners of many 3d boxes as two packed buffers.
+    `boxes` is a list of boxes, or a pair of packed corner coordinates."""
+    if len(boxes) and hasattr(boxes[0], 'lower'):
+        return (pack([box.lower for box in boxes], 3),
+                pack([box.upper for box in boxes], 3))
+    lowers, uppers = boxes
+    return pack(lowers, 3), pack(uppers, 3)
+
+
+def _area(lower, upper):
+    """half the surface area of a box, from its corners"""
+    dx, dy, dz = [h - l for l, h in zip(lower, upper)]
+    return dx * dy + dy * dz + dz * dx
+
+
+def _pairs(sizes):
+    """for groups of the given sizes laid out one after another, the group
+    of each item and its position within the group"""
+    total = int(sizes.sum())
+    groups = numpy.repeat(numpy.arange(len(sizes)), sizes)
+    offsets = numpy.cumsum(sizes) - sizes
+    return groups, numpy.arange(total) - offsets[groups]
+
+
+class BVH(object):
+    """A bounding volume hierarchy over 3d boxes.
+
+    The boxes are the leaves of a binary tree whose nodes store the bounds of
+    all the boxes below them. Like the KDTree, each node covers a contiguous
+    range of `order`, a permutation of the box indices, and the tree is kept
+    as flat tables of nodes: `starts`, `stops`, `lefts`, `rights` (-1 for
+    leaves), `lower` and `upper`.
+
+    Nodes are split with the binned surface area heuristic: the box centers
+    are sorted into `bins` slices along the widest axis, and the split
+    between slices that gives the smallest total surface area, weighted by
+    the number of boxes on each side, is chosen. With numpy, every node of a
+    level of the tree is split at once, and queries walk the tree one level
+    at a time for all queries together.
+
+    Boxes follow `Box3d.overlaps`: boxes that only touch don't overlap.
+
+    Boxes can be given as a list of Box3d objects, or as a pair of packed
+    coordinates (see `vectors.pack`) for their lower and upper corners, which
+    is much faster for millions of boxes. All queries return indices into the
+    boxes the tree was built from.
+    """
+    def __init__(self, boxes, leafsize=4, bins=16):
+        self.leafsize = max(1, leafsize)
+        self.bins = bins
+        lowers, uppers = _corners(boxes)
+        self.size = len(lowers) // 3
+        if numpy is not None:
+            self.box_lower = lowers.reshape(-1, 3)
+            self.box_upper = uppers.reshape(-1, 3)
+            self._build_levels()
+        else:
+            self.box_lower = list(zip(*[iter(lowers)] * 3))
+            self.box_upper = list(zip(*[iter(uppers)] * 3))
+            self._build_nodes()
+        self._fit()
+
+    def __len__(self):
+        return self.size
+
+    def _build_nodes(self):
+        """split the nodes one at a time"""
+        lower, upper = self.box_lower, self.box_upper
+        centers = [tuple((l + h) * 0.5 for l, h in zip(a, b))
+                for a, b in zip(lower, upper)]
+        self.order = order = array('l', range(self.size))
+        self.starts, self.stops = [0], [self.size]
+        self.lefts, self.rights = [-1], [-1]
+        bins = self.bins
+        stack = [0] if self.size else []
+        while stack:
+            node = stack.pop()
+            start, stop = self.starts[node], self.stops[node]
+            if stop - start <= self.leafsize:
+                continue
+            segment = order[start:stop]
+            low = [min(centers[i][a] for i in segment) for a in range(3)]
+            high = [max(centers[i][a] for i in segment) for a in range(3)]
+            spans = [h - l for l, h in zip(low, high)]
+            axis = spans.index(max(spans))
+            scale = bins / spans[axis] if spans[axis] else 0.0
+
+            def slot(i):
+                return min(bins - 1, int((centers[i][axis] - low[axis]) *
+                    scale))
+            segment = sorted(segment, key=slot)
+            slots = [slot(i) for i in segment]
+            # the bounds of the boxes left of each position where the slice
+            # changes, and right of it
+            changes = [k for k in range(1, len(segment))
+                    if slots[k] != slots[k - 1]]
+            left_areas = self._sweep(segment, changes)
+            right_areas = self._sweep(segment[::-1],
+                    [len(segment) - k for k in reversed(changes)])
+            middle = (stop - start) // 2
+            best = None
+            for k, left, right in zip(changes, left_areas,
+                    reversed(right_areas)):
+                cost = left * k + right * (len(segment) - k)
+                if best is None or cost < best:
+                    best, middle = cost, k
+            order[start:stop] = array('l', segment)
+            middle += start
+            for first, last in ((start, middle), (middle, stop)):
+                self.starts.append(first)
+                self.stops.append(last)
+                self.lefts.append(-1)
+                self.rights.append(-1)
+            self.lefts[node] = len(self.starts) - 2
+            self.rights[node] = len(self.starts) - 1
+            stack.extend((self.rights[node], self.lefts[node]))
+
+    def _sweep(self, segment, cuts):
+        """the areas of the bounds of the first k boxes of a segment, for
+        each k in the increasing list `cuts`"""
+        lower, upper = self.box_lower, self.box_upper
+        low = [float('inf')] * 3
+        high = [float('-inf')] * 3
+        areas = []
+        k = 0
+        for cut in cuts:
+            for i in segment[k:cut]:
+                low = [min(a, b) for a, b in zip(low, lower[i])]
+                high = [max(a, b) for a, b in zip(high, upper[i])]
+            k = cut
+            areas.append(_area(low, high))
+        return areas
+
+    def _bounds(self, indices):
+        """the bounds of some of the boxes, without numpy"""
+        lower, upper = self.box_lower, self.box_upper
+        return ([min(lower[i][a] for i in indices) for a in range(3)],
+                [max(upper[i][a] for i in indices) for a in range(3)])
+
+    def _build_levels(self):
+        """split all the nodes of each level of the tree at once"""
+        size = self.size
+        capacity = max(1, 2 * size - 1)
+        starts = numpy.zeros(capacity, dtype=numpy.intp)
+        stops = numpy.zeros(capacity, dtype=numpy.intp)
+        lefts = numpy.full(capacity, -1, dtype=numpy.intp)
+        rights = numpy.full(capacity, -1, dtype=numpy.intp)
+        stops[0] = size
+        count = 1
+        centers = (self.box_lower + self.box_upper) * 0.5
+        order = numpy.arange(size, dtype=numpy.intp)
+        current = numpy.zeros(1 if size else 0, dtype=numpy.intp)
+        while len(current):
+            sizes = stops[current] - starts[current]
+            current, sizes = (current[sizes > self.leafsize],
+                    sizes[sizes > self.leafsize])
+            if not len(current):
+                break
+            nodes = len(current)
+            # small nodes near the leaves don't need every slice
+            bins = int(min(self.bins, sizes.max()))
+            groups, offsets = _pairs(sizes)
+            positions = starts[current][groups] + offsets
+            members = order[positions]
+            firsts = numpy.cumsum(sizes) - sizes
+            points = centers[members]
+            low = numpy.minimum.reduceat(points, firsts)
+            spans = numpy.maximum.reduceat(points, firsts) - low
+            axis = spans.argmax(axis=1)
+            span = spans[numpy.arange(nodes), axis]
+            scale = numpy.where(span > 0, bins / numpy.where(span > 0, span,
+                1.0), 0.0)
+            values = points[numpy.arange(len(members)), axis[groups]]
+            slots = ((values - low[groups, axis[groups]]) *
+                    scale[groups]).astype(numpy.intp)
+            keys = groups * bins + numpy.clip(slots, 0, bins - 1)
+            # sorting by slice keeps each node's boxes in its own range
+            ranked = numpy.argsort(keys, kind='stable')
+            keys, members = keys[ranked], members[ranked]
+            order[positions] = members
+            # the bounds and counts of the boxes in each slice
+            used, firsts = numpy.unique(keys, return_index=True)
+            slice_lower = numpy.full((nodes * bins, 3), numpy.inf)
+            slice_upper = numpy.full((nodes * bins, 3), -numpy.inf)
+            slice_lower[used] = numpy.minimum.reduceat(
+                    self.box_lower[members], firsts)
+            slice_upper[used] = numpy.maximum.reduceat(
+                    self.box_upper[members], firsts)
+            tally = numpy.bincount(keys, minlength=nodes * bins).reshape(
+                    nodes, bins)
+            slice_lower = slice_lower.reshape(nodes, bins, 3)
+            slice_upper = slice_upper.reshape(nodes, bins, 3)
+            # the boxes left of each split, and right of it
+            left_count = numpy.cumsum(tally, axis=1)[:, :-1]
+            right_count = sizes[:, None] - left_count
+            left_area = self._areas(
+                    numpy.minimum.accumulate(slice_lower, axis=1)[:, :-1],
+                    numpy.maximum.accumulate(slice_upper, axis=1)[:, :-1])
+            right_area = self._areas(
+                    numpy.minimum.accumulate(slice_lower[:, ::-1],
+                        axis=1)[:, ::-1][:, 1:],
+                    numpy.maximum.accumulate(slice_upper[:, ::-1],
+                        axis=1)[:, ::-1][:, 1:])
+            with numpy.errstate(invalid='ignore'):
+                cost = numpy.where((left_count > 0) & (right_count > 0),
+                        left_area * left_count + right_area * right_count,
+                        numpy.inf)
+            best = cost.argmin(axis=1)
+            split = left_count[numpy.arange(nodes), best]
+            # boxes whose centers can't be told apart are split in half
+            stuck = ~numpy.isfinite(cost[numpy.arange(nodes), best])
+            split[stuck] = sizes[stuck] // 2
+            middle = starts[current] + split
+            left = numpy.arange(count, count + 2 * nodes, 2)
+            right = left + 1
+            starts[left], stops[left] = starts[current], middle
+            starts[right], stops[right] = middle, stops[current]
+            lefts[current], rights[current] = left, right
+            count += 2 * nodes
+            current = numpy.concatenate((left, right))
+        self.order = order
+        self.starts, self.stops = starts[:count], stops[:count]
+        self.lefts, self.rights = lefts[:count], rights[:count]
+
+    @staticmethod
+    def _areas(lower, upper):
+        """half the surface area of boxes given as numpy corner arrays"""
+        with numpy.errstate(invalid='ignore'):
+            d = upper - lower
+            return (d[..., 0] * d[..., 1] + d[..., 1] * d[..., 2] +
+                    d[..., 2] * d[..., 0])
+
+    def _fit(self):
+        """compute the bounds of every node from the boxes"""
+        count = len(self.starts)
+        if numpy is None:
+            self.lower = [None] * count
+            self.upper = [None] * count
+            # children always come after their parents
+            for node in range(count - 1 if self.size else -1, -1, -1):
+                left, right = self.lefts[node], self.rights[node]
+                if left < 0:
+                    bounds = self._bounds(
+                            self.order[self.starts[node]:self.stops[node]])
+                else:
+                    bounds = ([min(a, b) for a, b in zip(self.lower[left],
+                        self.lower[right])], [max(a, b) for a, b in zip(
+                            self.upper[left], self.upper[right])])
+                self.lower[node] = tuple(bounds[0])
+                self.upper[node] = tuple(bounds[1])
+            return
+        self.lower = numpy.zeros((count, 3))
+        self.upper = numpy.zeros((count, 3))
+        if not self.size:
+            return
+        leaves = numpy.flatnonzero(self.lefts < 0)
+        leaves = leaves[numpy.argsort(self.starts[leaves])]
+        firsts = self.starts[leaves]
+        self.lower[leaves] = numpy.minimum.reduceat(
+                self.box_lower[self.order], firsts)
+        self.upper[leaves] = numpy.maximum.reduceat(
+                self.box_upper[self.order], firsts)
+        # fit the inner nodes a level at a time, from the leaves up, as
+        # soon as both of their children are done
+        inner = numpy.flatnonzero(self.lefts >= 0)
+        done = numpy.zeros(count, dtype=bool)
+        done[leaves] = True
+        while len(inner):
+            ready = done[self.lefts[inner]] & done[self.rights[inner]]
+            nodes = inner[ready]
+            left, right = self.lefts[nodes], self.rights[nodes]
+            self.lower[nodes] = numpy.minimum(self.lower[left],
+                    self.lower[right])
+            self.upper[nodes] = numpy.maximum(self.upper[left],
+                    self.upper[right])
+            done[nodes] = True
+            inner = inner[~ready]
+
+    def refit(self, boxes):
+        """Update the tree for boxes that have moved or changed size, in
+        O(n) time. The boxes must be given in the same order as when the
+        tree was built. The tree keeps its shape, so queries stay correct,
+        but may get slower if the boxes move far."""
+        lowers, uppers = _corners(boxes)
+        if len(lowers) != 3 * self.size:
+            raise ValueError("refit needs the same number of boxes")
+        if numpy is not None:
+            self.box_lower = lowers.reshape(-1, 3)
+            self.box_upper = uppers.reshape(-1, 3)
+        else:
+            self.box_lower = list(zip(*[iter(lowers)] * 3))
+            self.box_upper = list(zip(*[iter(uppers)] * 3))
+        self._fit()
+
+    def _walk(self, count, test):
+        """Walk the tree for `count` queries at once, with numpy.
+
+        `test(queries, lower, upper)` gets a query index and the corners of a
+        node or box for each pair to check, and returns a mask of the pairs
+        to keep, along with a value for each pair. Returns the query indices,
+        box indices and values of the boxes that pass.
+        """
+        queries = numpy.arange(count)
+        nodes = numpy.zeros(count, dtype=numpy.intp)
+        found = ([], [], [])
+        if not self.size:
+            nodes = nodes[:0]
+            queries = queries[:0]
+        while len(queries):
+            keep, values = test(queries, self.lower[nodes],
+                    self.upper[nodes])
+            queries, nodes = queries[keep], nodes[keep]
+            leaf = self.lefts[nodes] < 0
+            sizes = self.stops[nodes[leaf]] - self.starts[nodes[leaf]]
+            groups, offsets = _pairs(sizes)
+            asked = queries[leaf][groups]
+            boxes = self.order[self.starts[nodes[leaf]][groups] + offsets]
+            keep, values = test(asked, self.box_lower[boxes],
+                    self.box_upper[boxes])
+            for results, part in zip(found, (asked, boxes, values)):
+                results.append(part[keep])
+            inner = nodes[~leaf]
+            queries = numpy.concatenate((queries[~leaf],) * 2)
+            nodes = numpy.concatenate((self.lefts[inner],
+                self.rights[inner]))
+        if not found[0]:
+            return (numpy.zeros(0, dtype=numpy.intp),) * 2 + (
+                    numpy.zeros(0),)
+        queries, boxes, values = [numpy.concatenate(f) for f in found]
+        order = numpy.lexsort((boxes, queries))
+        return queries[order], boxes[order], values[order]
+
+    def _search(self, test):
+        """walk the tree for one query without numpy. `test(lower, upper)`
+        returns None for boxes to skip, and a value otherwise."""
+        found = []
+        stack = [0] if self.size else []
+        while stack:
+            node = stack.pop()
+            if test(self.lower[node], self.upper[node]) is None:
+                continue
+            if self.lefts[node] < 0:
+                for i in self.order[self.starts[node]:self.stops[node]]:
+                    value = test(self.box_lower[i], self.box_upper[i])
+                    if value is not None:
+                        found.append((i, value))
+            else:
+                stack.append(self.rights[node])
+                stack.append(self.lefts[node])
+        found.sort()
+        return found
+
+    def overlapping_many(self, boxes):
+        """Find the boxes of the tree that overlap each of many boxes.
+
+        Returns two arrays: the index of a query box and the index of a box
+        of the tree that it overlaps, for every overlapping pair, sorted by
+        query and then by tree box.
+        """
+        lowers, uppers = _corners(boxes)
+        if numpy is not None:
+            lowers, uppers = lowers.reshape(-1, 3), uppers.reshape(-1, 3)
+
+            def test(queries, lower, upper):
+                keep = ((lower < uppers[queries]).all(axis=1) &
+                        (lowers[queries] < upper).all(axis=1))
+                return keep, keep
+            queries, found = self._walk(len(lowers), test)[:2]
+            return queries, found
+        queries, found = array('l'), array('l')
+        corners = zip(zip(*[iter(lowers)] * 3), zip(*[iter(uppers)] * 3))
+        for q, (low, high) in enumerate(corners):
+            def test(lower, upper):
+                if all(l < h for l, h in zip(lower, high)) and all(
+                        l < h for l, h in zip(low, upper)):
+                    return True
+            for i, value in self._search(test):
+                queries.append(q)
+                found.append(i)
+        return queries, found
+
+    def overlapping(self, box):
+        """Get the sorted indices of the boxes that overlap a box"""
+        return [int(i) for i in self.overlapping_many([box])[1]]
+
+    def rays(self, origins, directions, limit=float('inf')):
+        """Find the boxes that each of many rays passes through.
+
+        Rays start at packed `origins` and go along packed `directions`, as
+        far as `limit` times the length of their direction. Returns three
+        arrays: the index of a ray, the index of a box it hits and the ray
+        parameter t where it enters the box (0 if it starts inside it), for
+        every hit, sorted by ray and then by box.
+        """
+        origins = pack(origins, 3)
+        directions = pack(directions, 3)
+        if numpy is not None:
+            origins = origins.reshape(-1, 3)
+            directions = directions.reshape(-1, 3)
+            with numpy.errstate(divide='ignore'):
+                inverse = 1.0 / directions
+
+            def test(queries, lower, upper):
+                start, step = origins[queries], inverse[queries]
+                with numpy.errstate(invalid='ignore'):
+                    # 0 * inf is nan for rays along a side of a box, which
+                    # fmin and fmax skip
+                    near = (lower - start) * step
+                    far = (upper - start) * step
+                    enter = numpy.fmax.reduce(numpy.fmin(near, far), axis=1)
+                    leave = numpy.fmin.reduce(numpy.fmax(near, far), axis=1)
+                enter = numpy.maximum(enter, 0.0)
+                return (enter <= leave) & (enter <= limit), enter
+            return self._walk(len(origins), test)
+        rays, found, entries = array('l'), array('l'), array('d')
+        for r, (start, direction) in enumerate(zip(
+                zip(*[iter(origins)] * 3), zip(*[iter(directions)] * 3))):
+            def test(lower, upper):
+                enter, leave = 0.0, limit
+                for s, d, l, h in zip(start, direction, lower, upper):
+                    if d == 0:
+                        if s < l or s > h:
+                            return None
+                        continue
+                    near, far = (l - s) / d, (h - s) / d
+                    if near > far:
+                        near, far = far, near
+                    enter, leave = max(enter, near), min(leave, far)
+                    if enter > leave:
+                        return None
+                return enter
+            for i, enter in self._search(test):
+                rays.append(r)
+                found.append(i)
+                entries.append(enter)
+        return rays, found, entries
+
+    def ray(self, origin, direction, limit=float('inf')):
+        """Get the boxes that a ray passes through, as a list of (t, index)
+        pairs, nearest first. See `rays`."""
+        rays, found, entries = self.rays([origin], [direction], limit)
+        return sorted(zip([float(t) for t in entries],
+            [int(i) for i in found]))
+
+    def pairs(self):
+        """Find every pair of boxes in the tree that overlap each other, by
+        walking the tree against itself. Returns two arrays, i and j, with
+        i < j for each pair, sorted by i and then j."""
+        if numpy is None:
+            return self._pairs_each()
+        empty = numpy.zeros(0, dtype=numpy.intp)
+        firsts, seconds = [empty], [empty]
+        a = b = numpy.zeros(1 if self.size else 0, dtype=numpy.intp)
+        lefts, rights = self.lefts, self.rights
+        while len(a):
+            same = a == b
+            overlap = same | ((self.lower[a] < self.upper[b]).all(axis=1) &
+                    (self.lower[b] < self.upper[a]).all(axis=1))
+            a, b, same = a[overlap], b[overlap], same[overlap]
+            leaf_a, leaf_b = lefts[a] < 0, lefts[b] < 0
+            both = leaf_a & leaf_b
+            # pairs of leaves: check every pair of their boxes
+            la, lb = a[both], b[both]
+            count_a = self.stops[la] - self.starts[la]
+            count_b = self.stops[lb] - self.starts[lb]
+            groups, offsets = _pairs(count_a * count_b)
+            i = self.starts[la][groups] + offsets // count_b[groups]
+            j = self.starts[lb][groups] + offsets % count_b[groups]
+            # a leaf against itself only needs each pair once
+            keep = ~same[both][groups] | (i < j)
+            i, j = self.order[i[keep]], self.order[j[keep]]
+            hit = ((self.box_lower[i] < self.box_upper[j]).all(axis=1) &
+                    (self.box_lower[j] < self.box_upper[i]).all(axis=1))
+            i, j = i[hit], j[hit]
+            firsts.append(numpy.minimum(i, j))
+            seconds.append(numpy.maximum(i, j))
+            # an inner node against itself: both children against
+            # themselves and each other
+            inner = a[same & ~both]
+            # other pairs: open up the node that is an inner node, or the
+            # bigger one if both are
+            rest = ~same & ~both
+            ra, rb = a[rest], b[rest]
+            size_a = self.stops[ra] - self.starts[ra]
+            size_b = self.stops[rb] - self.starts[rb]
+            open_a = ~(lefts[ra] < 0) & ((lefts[rb] < 0) | (size_a >= size_b))
+            a = numpy.concatenate((lefts[inner], rights[inner], lefts[inner],
+                lefts[ra[open_a]], rights[ra[open_a]], ra[~open_a],
+                ra[~open_a]))
+            b = numpy.concatenate((lefts[inner], rights[inner], rights[inner],
+                rb[open_a], rb[open_a], lefts[rb[~open_a]],
+                rights[rb[~open_a]]))
+        i, j = numpy.concatenate(firsts), numpy.concatenate(seconds)
+        order = numpy.lexsort((j, i))
+        return i[order], j[order]
+
+    def _pairs_each(self):
+        found = []
+        lefts, rights = self.lefts, self.rights
+        lower, upper = self.lower, self.upper
+
+        def overlap(lower_a, upper_a, lower_b, upper_b):
+            return all(l < h for l, h in zip(lower_a, upper_b)) and all(
+                    l < h for l, h in zip(lower_b, upper_a))
+        stack = [(0, 0)] if self.size else []
+        while stack:
+            a, b = stack.pop()
+            if a != b and not overlap(lower[a], upper[a], lower[b],
+                    upper[b]):
+                continue
+            if lefts[a] < 0 and lefts[b] < 0:
+                mine = self.order[self.starts[a]:self.stops[a]]
+                theirs = self.order[self.starts[b]:self.stops[b]]
+                for x, i in enumerate(mine):
+                    for y, j in enumerate(theirs):
+                        if a == b and y <= x:
+                            continue
+                        if overlap(self.box_lower[i], self.box_upper[i],
+                                self.box_lower[j], self.box_upper[j]):
+                            found.append((min(i, j), max(i, j)))
+            elif a == b:
+                stack.extend(((lefts[a], lefts[a]), (rights[a], rights[a]),
+                    (lefts[a], rights[a])))
+            elif lefts[a] >= 0 and (lefts[b] < 0 or self.stops[a] -
+                    self.starts[a] >= self.stops[b] - self.starts[b]):
+                stack.extend(((lefts[a], b), (rights[a], b)))
+            else:
+                stack.extend(((a, lefts[b]), (a, rights[b])))
+        found.sort()
+        return (array('l', [i for i, j in found]),
+                array('l', [j for i, j in found]))
@@ -0,0 +1,345 @@
+"""This module finds all the crossings in a set of 2d line segments with a
+Bentley-Ottmann sweep line, in O((n + k) log n) time for n segments with k
+crossings.
+
+A vertical line sweeps from left to right, stopping at segment endpoints and
+at crossings (the event points). The segments that the sweep line currently
+passes through are kept in order from bottom to top (the status), and only
+segments that are next to each other in the status are tested for crossings.
+
+All the decisions of the sweep are made with the robust `orient2d` predicate,
+and crossing points are computed exactly as fractions, so that the status
+stays correctly ordered even with many segments through the same point,
+shared endpoints, vertical segments and collinear overlaps. Crossings are
+reported with float coordinates.
+"""
+import heapq
+import functools
+from fractions import Fraction
+
+from .point2d import Point2d
+from .predicates import orient2d, orient2d_exact, CCW_BOUND, EPSILON
+
+
+class _SweepStatus(object):
+    """The segments crossing the sweep line, in order from bottom to top.
+
+    The order is kept as a list of short blocks, so that inserting or
+    removing segments only moves the items of one block. A Fenwick tree over
+    the lengths of the blocks finds the block of a position, and the number
+    of segments before a block, in O(log n). It is only rebuilt when blocks
+    are split or removed, which happens at most once every few hundred
+    changes.
+    """
+    LOAD = 256
+
+    def __init__(self):
+        self.blocks = []
+        self.size = 0
+        self._rebuild()
+
+    def __len__(self):
+        return self.size
+
+    def _rebuild(self):
+        """build the Fenwick tree of the lengths of the blocks"""
+        tree = [0] + [len(block) for block in self.blocks]
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self.tree = tree
+        self.top = 1 << (len(self.blocks).bit_length() - 1) if (
+                self.blocks) else 0
+
+    def _grow(self, b, count):
+        """change the length of block b by count in the Fenwick tree"""
+        i = b + 1
+        while i < len(self.tree):
+            self.tree[i] += count
+            i += i & -i
+
+    def _before(self, b):
+        """the number of segments in the blocks before block b"""
+        total = 0
+        while b:
+            total += self.tree[b]
+            b -= b & -b
+        return total
+
+    def _locate(self, index):
+        """the block and the offset in it of a position"""
+        b, step = 0, self.top
+        while step:
+            if b + step < len(self.tree) and self.tree[b + step] <= index:
+                b += step
+                index -= self.tree[b]
+            step >>= 1
+        return b, index
+
+    def get(self, index):
+        if index < 0 or index >= self.size:
+            return None
+        b, i = self._locate(index)
+        return self.blocks[b][i]
+
+    def bisect(self, below):
+        """the position of the first segment for which `below` is false,
+        assuming it is true for all the segments before it"""
+        blocks = self.blocks
+        lo, hi = 0, len(blocks)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if below(blocks[mid][-1]):
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == len(blocks):
+            return self.size
+        block = blocks[lo]
+        start, stop = 0, len(block)
+        while start < stop:
+            mid = (start + stop) // 2
+            if below(block[mid]):
+                start = mid + 1
+            else:
+                stop = mid
+        return self._before(lo) + start
+
+    def remove(self, index, count):
+        """remove `count` segments starting at a position"""
+        self.size -= count
+        while count:
+            b, i = self._locate(index)
+            block = self.blocks[b]
+            taken = min(count, len(block) - i)
+            del block[i:i + taken]
+            if block:
+                self._grow(b, -taken)
+            else:
+                del self.blocks[b]
+                self._rebuild()
+            count -= taken
+
+    def insert(self, index, segments):
+        """insert segments at a position, in order"""
+        if not segments:
+            return
+        self.size += len(segments)
+        if not self.blocks:
+            self.blocks.append(list(segments))
+            self._rebuild()
+            return
+        b, i = self._locate(index)
+        if b == len(self.blocks):
+            b -= 1
+            i = len(self.blocks[b])
+        block = self.blocks[b]
+        block[i:i] = segments
+        if len(block) > 2 * self.LOAD:
+            self.blocks[b:b + 1] = [block[j:j + self.LOAD]
+                    for j in range(0, len(block), self.LOAD)]
+            self._rebuild()
+        else:
+            self._grow(b, len(segments))
+
+
+def _exact(value):
+    """keep exact fractions as floats when no precision is lost"""
+    as_float = float(value)
+    if as_float == value:
+        return as_float
+    return value
+
+
+def _crossing(s, t):
+    """the single point where two segments cross, or None if they don't
+    cross or overlap along a line"""
+    a, b = s
+    c, d = t
+    o1 = orient2d(a, b, c)
+    o2 = orient2d(a, b, d)
+    if (o1 > 0 and o2 > 0) or (o1 < 0 and o2 < 0):
+        return None
+    o3 = orient2d(c, d, a)
+    o4 = orient2d(c, d, b)
+    if (o3 > 0 and o4 > 0) or (o3 < 0 and o4 < 0):
+        return None
+    if o1 == 0 and o2 == 0:
+        # collinear, so any overlap is found at the endpoints
+        return None
+    # shared endpoints need no arithmetic
+    for p in (c, d):
+        if p == a or p == b:
+            return p
+    if o1 == 0:
+        return c
+    if o2 == 0:
+        return d
+    if o3 == 0:
+        return a
+    if o4 == 0:
+        return b
+    # solve exactly with integers: every float is an integer over a power
+    # of two, so scale all the coordinates to the same power of two
+    ratios = [v.as_integer_ratio() for v in a + b + c + d]
+    scale = max(r[1] for r in ratios)
+    ax, ay, bx, by, cx, cy, dx, dy = [n * (scale // m) for n, m in ratios]
+    rx, ry = bx - ax, by - ay
+    sx, sy = dx - cx, dy - cy
+    qx, qy = cx - ax, cy - ay
+    numerator = qx * sy - qy * sx
+    denominator = rx * sy - ry * sx
+    return (_exact(Fraction(ax * denominator + numerator * rx,
+                denominator * scale)),
+            _exact(Fraction(ay * denominator + numerator * ry,
+                denominator * scale)))
+
+
+def _side_of(p):
+    """Get a function that gives orient2d(a, b, p) for any segment ab.
+
+    Crossing points are kept as fractions, so the float filter of orient2d
+    can't be used on them directly. Instead the filter is run on the nearest
+    float point, with the error bound widened by how far that point can be
+    from p, and only uncertain signs are computed with fractions.
+    """
+    if not (isinstance(p[0], Fraction) or isinstance(p[1], Fraction)):
+        return lambda a, b: orient2d(a, b, p)
+    x, y = float(p[0]), float(p[1])
+    # how far the float point can be from p, with some room to spare
+    error = 2 * EPSILON * max(abs(x), abs(y)) + 1e-300
+
+    def side(a, b):
+        left = (a[0] - x) * (b[1] - y)
+        right = (a[1] - y) * (b[0] - x)
+        det = left - right
+        bound = CCW_BOUND * (abs(left) + abs(right)) + 2 * error * (
+                abs(b[0] - a[0]) + abs(b[1] - a[1]))
+        if det > bound or -det > bound:
+            return det
+        return orient2d_exact(a, b, p)
+    return side
+
+
+def _key(p):
+    """a cheap dictionary key for a point. Hashing fractions is slow, so
+    they are replaced by their numerator and denominator."""
+    x, y = p
+    if isinstance(x, Fraction):
+        x = (x.numerator, x.denominator)
+    if isinstance(y, Fraction):
+        y = (y.numerator, y.denominator)
+    return x, y
+
+
+def _endpoints(segment):
+    """the endpoints of a segment as coordinate tuples, left one first"""
+    start, end = segment.coords if hasattr(segment, 'coords') else segment
+    start = (start[0], start[1])
+    end = (end[0], end[1])
+    if end < start:
+        start, end = end, start
+    return start, end
+
+
+def find_intersections(segments):
+    """Find every pair of segments that cross or touch.
+
+    `segments` can be LineSegment2d objects or pairs of points. Returns a
+    list of (i, j, point) triples with i < j, where i and j are the indices
+    of the segments and point is a Point2d where they meet. Segments that
+    overlap along a line are reported once, at one end of the overlap.
+    Triples come in the order the sweep finds them, from left to right.
+    """
+    ends = [_endpoints(s) for s in segments]
+    starts = {}
+    for i, (start, end) in enumerate(ends):
+        starts.setdefault(start, []).append(i)
+    # the queue holds (float x, point) pairs, so that most comparisons are
+    # between floats even when the points are fractions
+    points = set(starts) | set(end for start, end in ends)
+    queue = [(p[0], p) for p in points]
+    heapq.heapify(queue)
+    scheduled = points
+    # crossing point -> the segments known to pass through it
+    crossed = {}
+    status = _SweepStatus()
+    found = []
+    reported = set()
+    tested = set()
+
+    def schedule(i, j, p):
+        if i is None or j is None:
+            return
+        # segments can be next to each other many times before they cross,
+        # but only need to be tested once
+        pair = (i, j) if i < j else (j, i)
+        if pair in tested:
+            return
+        tested.add(pair)
+        q = _crossing(ends[i], ends[j])
+        if q is None:
+            return
+        # only crossings to the right of p are new, which floats can usually
+        # tell
+        x, px = float(q[0]), float(p[0])
+        if x < px or (x == px and not q > p):
+            return
+        key = _key(q)
+        crossed.setdefault(key, set()).update(pair)
+        if key not in scheduled:
+            scheduled.add(key)
+            heapq.heappush(queue, (x, q))
+
+    while queue:
+        p = heapq.heappop(queue)[1]
+        key = _key(p)
+        side = _side_of(p)
+        known = crossed.pop(key, ())
+
+        def below(i):
+            return i not in known and side(ends[i][0], ends[i][1]) > 0
+        # the segments through p are together in the status
+        first = status.bisect(below)
+        last = first
+        while True:
+            i = status.get(last)
+            if i is None or (i not in known and
+                    side(ends[i][0], ends[i][1]) != 0):
+                break
+            last += 1
+        through = [status.get(k) for k in range(first, last)]
+        upper = starts.get(key, ())
+        meeting = through + list(upper)
+        if len(meeting) > 1:
+            point = None
+            meeting.sort()
+            for a in range(len(meeting)):
+                for b in range(a + 1, len(meeting)):
+                    pair = (meeting[a], meeting[b])
+                    if pair in reported:
+                        continue
+                    reported.add(pair)
+                    if point is None:
+                        point = Point2d(float(p[0]), float(p[1]))
+                    found.append((pair[0], pair[1], point))
+        # segments that continue past p are put back in their order to the
+        # right of p
+        continuing = [i for i in meeting if ends[i][1] != key]
+
+        def compare(i, j):
+            # the same as orient2d(p, ends[i][1], ends[j][1])
+            turn = side(ends[i][1], ends[j][1])
+            if turn:
+                return -1 if turn > 0 else 1
+            return -1 if i < j else (1 if i > j else 0)
+        continuing.sort(key=functools.cmp_to_key(compare))
+        status.remove(first, last - first)
+        status.insert(first, continuing)
+        if continuing:
+            schedule(status.get(first - 1), continuing[0], p)
+            schedule(continuing[-1], status.get(first + len(continuing)), p)
+        else:
+            schedule(status.get(first - 1), status.get(first), p)
+    return found
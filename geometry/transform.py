@@ -0,0 +1,386 @@
+"""This module contains affine transformations with a fixed size.
+
+A Transform3d is a 4x4 matrix whose last row is always (0, 0, 0, 1), so only
+the first three rows are stored, as a flat tuple of 12 numbers:
+
+    (a, b, c, d,
+     e, f, g, h,
+     i, j, k, l)
+
+Composition and inversion are written out by hand for this layout, which is
+much faster than going through the general `Matrix` class. Chains of
+transforms collapse into one Transform, so that each point is only touched
+once when the chain is applied.
+
+Points are treated as having w=1 (they are translated) and vectors as having
+w=0 (they are not).
+"""
+import math
+from array import array
+
+from .core import numpy
+from .matrix import Matrix, MatrixError
+from .vector2d import Vector2d
+from .vector3d import Vector3d
+from .point import PointBase
+from .points import PointSet
+from .vectors import Vector2dArray, Vector3dArray, pack
+
+
+class Transform3d(object):
+    """An affine transformation in 3d space. Transforms are immutable.
+
+    `t * u` is the transform that applies `u` and then `t`. `t.then(u)` is
+    the same as `u * t`, and reads in the order the transforms happen.
+    """
+    __slots__ = ('values',)
+
+    def __init__(self, values=None):
+        """Can be initialized with nothing (the identity), 12 numbers for the
+        first three rows, or a 4x4 table or Matrix."""
+        if values is None:
+            values = (1.0, 0.0, 0.0, 0.0,
+                      0.0, 1.0, 0.0, 0.0,
+                      0.0, 0.0, 1.0, 0.0)
+        elif isinstance(values, Matrix) or isinstance(values[0], (
+                tuple, list)) or (numpy is not None and isinstance(values,
+                    numpy.ndarray) and values.ndim == 2):
+            rows = [tuple(r) for r in values]
+            if len(rows) != 4 or any(len(r) != 4 for r in rows) or tuple(
+                    rows[3]) != (0, 0, 0, 1):
+                raise MatrixError(
+                    "A Transform3d needs a 4x4 affine matrix, with a last "
+                    "row of (0, 0, 0, 1)")
+            values = rows[0] + rows[1] + rows[2]
+        values = tuple(float(v) for v in values)
+        if len(values) != 12:
+            raise MatrixError("A Transform3d needs 12 values")
+        self.values = values
+
+    @classmethod
+    def translation(cls, vector):
+        """a transform that moves everything by a vector"""
+        x, y, z = tuple(vector)[:3]
+        return cls((1.0, 0.0, 0.0, x,
+                    0.0, 1.0, 0.0, y,
+                    0.0, 0.0, 1.0, z))
+
+    @classmethod
+    def scaling(cls, x, y=None, z=None, center=None):
+        """a transform that scales by x, y and z. If only x is given, it
+        scales uniformly. The center of scaling defaults to the origin."""
+        if y is None:
+            y = x
+        if z is None:
+            z = x
+        scale = cls((x, 0.0, 0.0, 0.0,
+                     0.0, y, 0.0, 0.0,
+                     0.0, 0.0, z, 0.0))
+        return scale._around(center)
+
+    @classmethod
+    def rotation(cls, axis, angle, center=None):
+        """a transform that rotates by `angle` radians, counterclockwise
+        around `axis` when looking down the axis towards the origin. The
+        axis passes through `center`, which defaults to the origin."""
+        x, y, z = tuple(axis)[:3]
+        length = math.sqrt(x * x + y * y + z * z)
+        x, y, z = x / length, y / length, z / length
+        c = math.cos(angle)
+        s = math.sin(angle)
+        t = 1.0 - c
+        rotate = cls((t * x * x + c, t * x * y - s * z, t * x * z + s * y, 0.0,
+                      t * x * y + s * z, t * y * y + c, t * y * z - s * x, 0.0,
+                      t * x * z - s * y, t * y * z + s * x, t * z * z + c, 0.0))
+        return rotate._around(center)
+
+    def _around(self, center):
+        """this transform, but about a center point instead of the origin"""
+        if center is None:
+            return self
+        x, y, z = tuple(center)[:3]
+        return (self.translation((x, y, z)) * self *
+                self.translation((-x, -y, -z)))
+
+    def then(self, other):
+        """the transform that applies this one and then other"""
+        return other * self
+
+    def compose(self, other):
+        """the transform that applies other and then this one"""
+        a, b, c, d, e, f, g, h, i, j, k, l = self.values
+        A, B, C, D, E, F, G, H, I, J, K, L = other.values
+        return self.__class__((
+            a * A + b * E + c * I, a * B + b * F + c * J,
+            a * C + b * G + c * K, a * D + b * H + c * L + d,
+            e * A + f * E + g * I, e * B + f * F + g * J,
+            e * C + f * G + g * K, e * D + f * H + g * L + h,
+            i * A + j * E + k * I, i * B + j * F + k * J,
+            i * C + j * G + k * K, i * D + j * H + k * L + l))
+
+    def determinant(self):
+        """the determinant of the linear part of this transform"""
+        a, b, c, d, e, f, g, h, i, j, k, l = self.values
+        return a * (f * k - g * j) - b * (e * k - g * i) + c * (e * j - f * i)
+
+    def inverse(self):
+        """the transform that undoes this one"""
+        a, b, c, d, e, f, g, h, i, j, k, l = self.values
+        # cofactors of the linear part
+        A = f * k - g * j
+        B = g * i - e * k
+        C = e * j - f * i
+        det = a * A + b * B + c * C
+        if det == 0:
+            raise MatrixError("This transform is singular and has no inverse")
+        inv = 1.0 / det
+        ra, rb, rc = A * inv, (c * j - b * k) * inv, (b * g - c * f) * inv
+        re, rf, rg = B * inv, (a * k - c * i) * inv, (c * e - a * g) * inv
+        ri, rj, rk = C * inv, (b * i - a * j) * inv, (a * f - b * e) * inv
+        return self.__class__((
+            ra, rb, rc, -(ra * d + rb * h + rc * l),
+            re, rf, rg, -(re * d + rf * h + rg * l),
+            ri, rj, rk, -(ri * d + rj * h + rk * l)))
+
+    def __mul__(self, other):
+        """compose with another transform, or transform a point or vector"""
+        if isinstance(other, Transform3d):
+            return self.compose(other)
+        if isinstance(other, Vector3d):
+            return self._transform(other)
+        return NotImplemented
+
+    def _transform(self, vector):
+        a, b, c, d, e, f, g, h, i, j, k, l = self.values
+        x, y, z = vector.x, vector.y, vector.z
+        if isinstance(vector, PointBase):
+            return vector.__class__(a * x + b * y + c * z + d,
+                                    e * x + f * y + g * z + h,
+                                    i * x + j * y + k * z + l)
+        return vector.__class__(a * x + b * y + c * z,
+                                e * x + f * y + g * z,
+                                i * x + j * y + k * z)
+
+    def _apply(self, data, w):
+        """transform a flat buffer of coordinates"""
+        a, b, c, d, e, f, g, h, i, j, k, l = self.values
+        if not w:
+            d = h = l = 0.0
+        if numpy is not None:
+            rows = data.reshape(-1, 3)
+            linear = numpy.array(self.values).reshape(3, 4)[:, :3]
+            result = rows.dot(linear.T)
+            if w:
+                result += (d, h, l)
+            return result.reshape(-1)
+        xs, ys, zs = data[0::3], data[1::3], data[2::3]
+        result = array('d', bytes(8 * len(data)))
+        result[0::3] = array('d', [a * x + b * y + c * z + d
+            for x, y, z in zip(xs, ys, zs)])
+        result[1::3] = array('d', [e * x + f * y + g * z + h
+            for x, y, z in zip(xs, ys, zs)])
+        result[2::3] = array('d', [i * x + j * y + k * z + l
+            for x, y, z in zip(xs, ys, zs)])
+        return result
+
+    def apply(self, points):
+        """Transform many points (w=1) in one pass.
+
+        A PointSet gives a new PointSet, a numpy array gives a numpy array
+        with the same shape, and anything else (vector arrays, lists of
+        points or coordinate tuples) gives a Vector3dArray.
+        """
+        if isinstance(points, Vector3d):
+            return self._transform(points)
+        result = self._apply(pack(points, 3), 1)
+        return self._wrap(points, result)
+
+    def apply_vectors(self, vectors):
+        """Transform many vectors (w=0) in one pass, like `apply`."""
+        if isinstance(vectors, Vector3d):
+            return self._transform(vectors)
+        result = self._apply(pack(vectors, 3), 0)
+        return self._wrap(vectors, result)
+
+    def _wrap(self, values, result):
+        if isinstance(values, PointSet):
+            return PointSet(Vector3dArray.fromBuffer(result),
+                    tolerance=values.tolerance)
+        if numpy is not None and isinstance(values, numpy.ndarray):
+            return result.reshape(values.shape)
+        return Vector3dArray.fromBuffer(result)
+
+    def asMatrix(self):
+        """get this transform as a 4x4 Matrix"""
+        v = self.values
+        return Matrix([v[0:4], v[4:8], v[8:12], (0.0, 0.0, 0.0, 1.0)])
+
+    def __eq__(self, other):
+        return isinstance(other, Transform3d) and self.values == other.values
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.values)
+
+    def __repr__(self):
+        return 'Transform3d(%s)' % (self.values,)
+
+
+class Transform2d(object):
+    """An affine transformation in 2d space, stored as the first two rows of
+    a 3x3 matrix: (a, b, c, d, e, f). Transforms are immutable.
+    """
+    __slots__ = ('values',)
+
+    def __init__(self, values=None):
+        """Can be initialized with nothing (the identity), 6 numbers for the
+        first two rows, or a 3x3 table or Matrix."""
+        if values is None:
+            values = (1.0, 0.0, 0.0,
+                      0.0, 1.0, 0.0)
+        elif isinstance(values, Matrix) or isinstance(values[0], (
+                tuple, list)) or (numpy is not None and isinstance(values,
+                    numpy.ndarray) and values.ndim == 2):
+            rows = [tuple(r) for r in values]
+            if len(rows) != 3 or any(len(r) != 3 for r in rows) or tuple(
+                    rows[2]) != (0, 0, 1):
+                raise MatrixError(
+                    "A Transform2d needs a 3x3 affine matrix, with a last "
+                    "row of (0, 0, 1)")
+            values = rows[0] + rows[1]
+        values = tuple(float(v) for v in values)
+        if len(values) != 6:
+            raise MatrixError("A Transform2d needs 6 values")
+        self.values = values
+
+    @classmethod
+    def translation(cls, vector):
+        """a transform that moves everything by a vector"""
+        x, y = tuple(vector)[:2]
+        return cls((1.0, 0.0, x,
+                    0.0, 1.0, y))
+
+    @classmethod
+    def scaling(cls, x, y=None, center=None):
+        """a transform that scales by x and y. If only x is given, it scales
+        uniformly. The center of scaling defaults to the origin."""
+        if y is None:
+            y = x
+        return cls((x, 0.0, 0.0,
+                    0.0, y, 0.0))._around(center)
+
+    @classmethod
+    def rotation(cls, angle, center=None):
+        """a transform that rotates counterclockwise by `angle` radians
+        around `center`, which defaults to the origin."""
+        c = math.cos(angle)
+        s = math.sin(angle)
+        return cls((c, -s, 0.0,
+                    s, c, 0.0))._around(center)
+
+    def _around(self, center):
+        if center is None:
+            return self
+        x, y = tuple(center)[:2]
+        return self.translation((x, y)) * self * self.translation((-x, -y))
+
+    def then(self, other):
+        """the transform that applies this one and then other"""
+        return other * self
+
+    def compose(self, other):
+        """the transform that applies other and then this one"""
+        a, b, c, d, e, f = self.values
+        A, B, C, D, E, F = other.values
+        return self.__class__((
+            a * A + b * D, a * B + b * E, a * C + b * F + c,
+            d * A + e * D, d * B + e * E, d * C + e * F + f))
+
+    def determinant(self):
+        """the determinant of the linear part of this transform"""
+        a, b, c, d, e, f = self.values
+        return a * e - b * d
+
+    def inverse(self):
+        """the transform that undoes this one"""
+        a, b, c, d, e, f = self.values
+        det = a * e - b * d
+        if det == 0:
+            raise MatrixError("This transform is singular and has no inverse")
+        inv = 1.0 / det
+        ra, rb, rd, re = e * inv, -b * inv, -d * inv, a * inv
+        return self.__class__((
+            ra, rb, -(ra * c + rb * f),
+            rd, re, -(rd * c + re * f)))
+
+    def __mul__(self, other):
+        """compose with another transform, or transform a point or vector"""
+        if isinstance(other, Transform2d):
+            return self.compose(other)
+        if isinstance(other, Vector2d) and not isinstance(other, Vector3d):
+            return self._transform(other)
+        return NotImplemented
+
+    def _transform(self, vector):
+        if isinstance(vector, Vector3d):
+            raise ValueError("Transform2d can't transform 3d vectors, use "
+                    "Transform3d")
+        a, b, c, d, e, f = self.values
+        x, y = vector.x, vector.y
+        if isinstance(vector, PointBase):
+            return vector.__class__(a * x + b * y + c, d * x + e * y + f)
+        return vector.__class__(a * x + b * y, d * x + e * y)
+
+    def _apply(self, data, w):
+        a, b, c, d, e, f = self.values
+        if not w:
+            c = f = 0.0
+        if numpy is not None:
+            rows = data.reshape(-1, 2)
+            result = rows.dot(numpy.array(((a, d), (b, e))))
+            if w:
+                result += (c, f)
+            return result.reshape(-1)
+        xs, ys = data[0::2], data[1::2]
+        result = array('d', bytes(8 * len(data)))
+        result[0::2] = array('d', [a * x + b * y + c for x, y in zip(xs, ys)])
+        result[1::2] = array('d', [d * x + e * y + f for x, y in zip(xs, ys)])
+        return result
+
+    def apply(self, points):
+        """Transform many points (w=1) in one pass. A numpy array gives a
+        numpy array with the same shape, and anything else gives a
+        Vector2dArray. 3d points, like a PointSet, raise a ValueError."""
+        if isinstance(points, Vector2d):
+            return self._transform(points)
+        return self._wrap(points, self._apply(pack(points, 2), 1))
+
+    def apply_vectors(self, vectors):
+        """Transform many vectors (w=0) in one pass, like `apply`."""
+        if isinstance(vectors, Vector2d):
+            return self._transform(vectors)
+        return self._wrap(vectors, self._apply(pack(vectors, 2), 0))
+
+    def _wrap(self, values, result):
+        if numpy is not None and isinstance(values, numpy.ndarray):
+            return result.reshape(values.shape)
+        return Vector2dArray.fromBuffer(result)
+
+    def asMatrix(self):
+        """get this transform as a 3x3 Matrix"""
+        v = self.values
+        return Matrix([v[0:3], v[3:6], (0.0, 0.0, 1.0)])
+
+    def __eq__(self, other):
+        return isinstance(other, Transform2d) and self.values == other.values
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.values)
+
+    def __repr__(self):
+        return 'Transform2d(%s)' % (self.values,)
@@ -1,11 +1,15 @@
 import math
 import numbers
 
-from .core import isRoughlyZero
 
 class VectorBase(object):
     """Should not be instantiated directly
+
+    Subclasses store their coordinates in `__slots__` and provide a `coords`
+    property that returns them as a tuple.
     """
+    __slots__ = ()
+
     @property
     def length(self):
         """get the vector length / amplitude
@@ -39,15 +43,14 @@ class VectorBase(object):
         vector, while it would be nice to be able to do vector addition with
         other vectors.
         """
-        if isinstance(other, numbers.Number):
+        if isinstance(other, self.__class__):
+            # add all the coordinates together
+            return self.__class__(*(sum(p) for p in zip(self, other)))
+        elif isinstance(other, numbers.Number):
             # then add to the length of the vector
             # multiply the number by the normalized self, and then
             # add the multiplied vector to self
             return self.normalized() * other + self
-        elif isinstance(other, self.__class__):
-            # add all the coordinates together
-            # there are probably more efficient ways to do this
-            return self.__class__(*(sum(p) for p in zip(self, other)))
         else:
             raise TypeError(
                     "unsupported operand (+/-) for types %s and %s" % (
@@ -69,13 +72,12 @@ class VectorBase(object):
             >>> v2 * v1 #dot product
             -6.6799999999999997
         """
-        if isinstance(other, numbers.Number):
-            # scalar multiplication for numbers
-            return self.__class__( *((n * other) for n in self))
-
-        elif isinstance(other, self.__class__):
+        if isinstance(other, self.__class__):
             # dot product for other vectors
             return self.dot(other)
+        elif isinstance(other, numbers.Number):
+            # scalar multiplication for numbers
+            return self.__class__( *((n * other) for n in self))
         else:
             raise TypeError(
                     "unsupported operand (multiply/divide) for types %s and %s" % (
@@ -91,6 +93,12 @@ class VectorBase(object):
         """
         return self.coords == other.coords
 
+    def __getstate__(self):
+        return self.coords
+
+    def __setstate__(self, state):
+        self.coords = state
+
     def angleTo(self, other):
         """computes the angle between two vectors
             cos theta = (n * m) / (n.length * m.length)
@@ -98,4 +106,3 @@ class VectorBase(object):
         cosTheta = (self * other) / (self.length * other.length)
         return math.acos(cosTheta)
 
-
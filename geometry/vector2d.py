@@ -1,23 +1,53 @@
+import math
+
 from .vector import VectorBase
 
 class Vector2d(VectorBase):
+    """A 2d vector object
+
+    The coordinates are stored directly in slots, so there is no per-instance
+    `__dict__`, and `.x` and `.y` are plain attribute lookups.
+    """
+    __slots__ = ('x', 'y')
+
     def __init__(self, x=0.0, y=0.0):
-        VectorBase.__init__(self)
-        self.coords = (x, y)
+        self.x = x
+        self.y = y
 
     @property
-    def x(self):
-        return self[0]
-    @x.setter
-    def x(self, value):
-        self.coords = (value,) + self.coords[1:]
+    def coords(self):
+        return (self.x, self.y)
+    @coords.setter
+    def coords(self, values):
+        self.x, self.y = values
 
     @property
-    def y(self):
-        return self[1]
-    @y.setter
-    def y(self, value):
-        self.coords = self.coords[:1] + (value,) + self.coords[2:]
+    def length(self):
+        """get the vector length / amplitude
+        """
+        return math.sqrt(self.x * self.x + self.y * self.y)
+
+    def dot(self, other):
+        """Gets the dot product of this vector and another.
+        """
+        return self.x * other[0] + self.y * other[1]
+
+    def __add__(self, other):
+        if isinstance(other, self.__class__):
+            return self.__class__(self.x + other.x, self.y + other.y)
+        return VectorBase.__add__(self, other)
+
+    def __sub__(self, other):
+        if isinstance(other, self.__class__):
+            return self.__class__(self.x - other.x, self.y - other.y)
+        return VectorBase.__sub__(self, other)
+
+    def __mul__(self, other):
+        if isinstance(other, self.__class__):
+            return self.x * other.x + self.y * other.y
+        elif other.__class__ is float or other.__class__ is int:
+            return self.__class__(self.x * other, self.y * other)
+        return VectorBase.__mul__(self, other)
 
     def asDict(self):
         """return dictionary representation of the vector"""
@@ -26,20 +56,22 @@ class Vector2d(VectorBase):
     def __getitem__(self, key):
         """Treats the vector as a tuple or dict for indexes and slicing.
         """
-        # dictionary
-        if key in ('x','y'):
-            return self.asDict()[key]
-        # slicing and index calls
-        else:
-            return self.coords.__getitem__(key)
+        try:
+            # slicing and index calls
+            return self.coords[key]
+        except TypeError:
+            # dictionary
+            if key in ('x', 'y'):
+                return getattr(self, key)
+            raise
 
     def toX(self, number):
         """For getting a copy of the same vector but with a new x value"""
-        return self.__class__(number, self[1])
+        return self.__class__(number, self.y)
 
     def toY(self, number):
         """For getting a copy of the same vector but with a new y value"""
-        return self.__class__(self[0], number)
+        return self.__class__(self.x, number)
 
     def __repr__(self):
         return 'Vector2d(%s, %s)' % self.coords
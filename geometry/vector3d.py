@@ -1,31 +1,67 @@
 """This module is for the Vector class"""
+import math
+
+from .vector import VectorBase
 from .vector2d import Vector2d
 
 class Vector3d(Vector2d):
     """A 3d vector object
     """
+    __slots__ = ('z',)
+
     def __init__(self, x=0.0, y=0.0, z=0.0):
-        Vector2d.__init__(self)
-        self.coords = (x, y, z)
+        self.x = x
+        self.y = y
+        self.z = z
+
+    @property
+    def coords(self):
+        return (self.x, self.y, self.z)
+    @coords.setter
+    def coords(self, values):
+        self.x, self.y, self.z = values
 
     @property
-    def z(self):
-        return self[2]
-    @z.setter
-    def z(self, value):
-        self.coords = (self.x, self.y, value)
+    def length(self):
+        """get the vector length / amplitude
+        """
+        return math.sqrt(self.x * self.x + self.y * self.y + self.z * self.z)
+
+    def dot(self, other):
+        """Gets the dot product of this vector and another.
+        """
+        return self.x * other[0] + self.y * other[1] + self.z * other[2]
+
+    def __add__(self, other):
+        if isinstance(other, self.__class__):
+            return self.__class__(
+                    self.x + other.x, self.y + other.y, self.z + other.z)
+        return VectorBase.__add__(self, other)
+
+    def __sub__(self, other):
+        if isinstance(other, self.__class__):
+            return self.__class__(
+                    self.x - other.x, self.y - other.y, self.z - other.z)
+        return VectorBase.__sub__(self, other)
+
+    def __mul__(self, other):
+        if isinstance(other, self.__class__):
+            return self.x * other.x + self.y * other.y + self.z * other.z
+        elif other.__class__ is float or other.__class__ is int:
+            return self.__class__(self.x * other, self.y * other, self.z * other)
+        return VectorBase.__mul__(self, other)
 
     def toX(self, number):
         """For getting a copy of the same vector but with a new x value"""
-        return self.__class__(number, self[1], self[2])
+        return self.__class__(number, self.y, self.z)
 
     def toY(self, number):
         """For getting a copy of the same vector but with a new y value"""
-        return self.__class__(self[0], number, self[2])
+        return self.__class__(self.x, number, self.z)
 
     def toZ(self, number):
         """For getting a copy of the same vector but with a new z value"""
-        return self.__class__(self[0], self[1], number)
+        return self.__class__(self.x, self.y, number)
 
     def asDict(self):
         """return dictionary representation of the vector"""
@@ -34,17 +70,19 @@ class Vector3d(Vector2d):
     def __getitem__(self, key):
         """Treats the vector as a tuple or dict for indexes and slicing.
         """
-        if key in ('x','y','z'):
-            return self.asDict()[key]
-        else:
-            return self.coords.__getitem__(key)
+        try:
+            return self.coords[key]
+        except TypeError:
+            if key in ('x', 'y', 'z'):
+                return getattr(self, key)
+            raise
 
     def cross(self, other):
         """Gets the cross product between two vectors
         """
-        x = (self[1] * other[2]) - (self[2] * other[1])
-        y = (self[2] * other[0]) - (self[0] * other[2])
-        z = (self[0] * other[1]) - (self[1] * other[0])
+        x = (self.y * other[2]) - (self.z * other[1])
+        y = (self.z * other[0]) - (self.x * other[2])
+        z = (self.x * other[1]) - (self.y * other[0])
         return self.__class__(x, y, z)
 
     def __repr__(self):
@@ -56,4 +94,3 @@ WorldY = Vector3d(0.0, 1.0, 0.0)
 WorldZ = Vector3d(0.0, 0.0, 1.0)
 
 
-
@@ -0,0 +1,310 @@
+"""This module contains array-backed containers for batches of vectors.
+
+The coordinates of every vector in a batch live in one flat, contiguous
+buffer of floats: (x0, y0, z0, x1, y1, z1, ...). The buffer is a numpy array
+when numpy is available and an `array('d')` otherwise, so that whole batches
+can be added, scaled and multiplied without building a Vector object for each
+element.
+"""
+import math
+import numbers
+import operator
+import itertools
+from array import array
+
+from .core import numpy
+from .vector import VectorBase
+from .vector2d import Vector2d
+from .vector3d import Vector3d
+
+
+def _rows(values, dim):
+    """the coordinates of each vector, checking that there are `dim`"""
+    for row in values:
+        row = tuple(row)
+        if len(row) != dim:
+            raise ValueError("rows of %s coordinates cannot be used as "
+                    "%sd vectors" % (len(row), dim))
+        yield row
+
+
+def pack(values, dim=3):
+    """Get a flat buffer of floats from some coordinates.
+
+    `values` can be a vector array, a numpy array (flat or with one row per
+    vector), an `array('d')` that is already flat, or any iterable of vectors
+    or coordinate tuples. Buffers are passed through without copying when
+    possible.
+    """
+    if hasattr(values, 'asArray'):
+        # PointSets and other containers that know their packed coordinates
+        values = values.asArray()
+    if isinstance(values, VectorArrayBase):
+        if values.dim != dim:
+            raise ValueError("%sd vectors cannot be used as %sd vectors" % (
+                values.dim, dim))
+        return values.data
+    if numpy is not None:
+        if isinstance(values, numpy.ndarray):
+            if values.ndim == 2 and values.shape[1] != dim:
+                raise ValueError("rows of %s coordinates cannot be used as "
+                        "%sd vectors" % (values.shape[1], dim))
+            data = numpy.ascontiguousarray(values, dtype=float).reshape(-1)
+        elif isinstance(values, array):
+            data = numpy.frombuffer(values, dtype=float) if (
+                values.typecode == 'd') else numpy.array(values, dtype=float)
+        else:
+            data = numpy.fromiter(itertools.chain.from_iterable(
+                _rows(values, dim)), dtype=float)
+    elif isinstance(values, array) and values.typecode == 'd':
+        data = values
+    elif isinstance(values, array):
+        data = array('d', values)
+    else:
+        data = array('d', itertools.chain.from_iterable(_rows(values, dim)))
+    if len(data) % dim:
+        raise ValueError(
+                "%s coordinates cannot be split into vectors of size %s" % (
+                    len(data), dim))
+    return data
+
+
+def index_buffer(values=()):
+    """Get a buffer of integer indices, for remapping or selecting points"""
+    if numpy is not None:
+        return numpy.fromiter(values, dtype=numpy.intp)
+    return array('l', values)
+
+
+class VectorArrayBase(object):
+    """Should not be instantiated directly
+
+    Vector arrays are treated as immutable: every operation returns a new
+    array, so buffers can be shared between arrays without copying.
+    """
+    dim = None
+    vector_class = None
+
+    def __init__(self, values=()):
+        self.data = pack(values, self.dim)
+
+    @classmethod
+    def fromBuffer(cls, data):
+        """Wrap an existing flat buffer of floats without copying it."""
+        new = cls.__new__(cls)
+        new.data = data
+        return new
+
+    def _rows(self, data=None):
+        """a numpy view of the buffer with one row per vector"""
+        if data is None:
+            data = self.data
+        return data.reshape(-1, self.dim)
+
+    def _other(self, other):
+        """get the buffer for another array, or a single vector"""
+        if isinstance(other, VectorBase):
+            coords = tuple(other)[:self.dim]
+            if numpy is not None:
+                return numpy.array(coords, dtype=float)
+            return coords
+        data = pack(other, self.dim)
+        if len(data) != len(self.data):
+            raise ValueError(
+                    "Cannot combine vector arrays of length %s and %s" % (
+                        len(self), len(data) // self.dim))
+        return data
+
+    def _pairs(self, other):
+        """iterate through pairs of coordinates from self and other"""
+        if isinstance(other, tuple):
+            return self.data, itertools.cycle(other)
+        return self.data, other
+
+    def _sums(self, data):
+        """sum each group of `dim` numbers in a flat sequence"""
+        return array('d', map(sum, zip(*[iter(data)] * self.dim)))
+
+    def _spread(self, values):
+        """repeat each value `dim` times"""
+        return itertools.chain.from_iterable(
+                itertools.repeat(v, self.dim) for v in values)
+
+    def __len__(self):
+        """gets the number of vectors in the array"""
+        return len(self.data) // self.dim
+
+    def __getitem__(self, key):
+        """get a single vector by index, or a new array from a slice"""
+        dim = self.dim
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1:
+                return self.fromBuffer(self.data[start * dim:stop * dim])
+            return self.__class__(self[i] for i in range(start, stop, step))
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("vector array index out of range")
+        coords = self.data[key * dim:(key + 1) * dim]
+        if numpy is not None:
+            coords = coords.tolist()
+        return self.vector_class(*coords)
+
+    def __iter__(self):
+        return iter(self.asList())
+
+    def asList(self):
+        """Get a list of Vector objects for the vectors in this array."""
+        cls = self.vector_class
+        data = self.data
+        if numpy is not None:
+            return [cls(*row) for row in self._rows().tolist()]
+        return [cls(*row) for row in zip(*[iter(data)] * self.dim)]
+
+    def __add__(self, other):
+        """add another array of the same length elementwise, or add one
+        vector to every vector in this array."""
+        other = self._other(other)
+        if numpy is not None:
+            return self.fromBuffer(
+                    self._flat(self._rows() + self._rows_of(other)))
+        return self.fromBuffer(array('d', map(operator.add,
+            *self._pairs(other))))
+
+    def __sub__(self, other):
+        """subtract another array elementwise, or subtract one vector from
+        every vector in this array."""
+        other = self._other(other)
+        if numpy is not None:
+            return self.fromBuffer(
+                    self._flat(self._rows() - self._rows_of(other)))
+        return self.fromBuffer(array('d', map(operator.sub,
+            *self._pairs(other))))
+
+    def __neg__(self):
+        return self * -1
+
+    def _rows_of(self, other):
+        """reshape another buffer for broadcasting against self"""
+        if len(other) == self.dim:
+            return other
+        return self._rows(other)
+
+    def _flat(self, result):
+        return result.reshape(-1)
+
+    def __mul__(self, other):
+        """with a number, scale every vector. With another array or vector,
+        get the row-wise dot product, as with `VectorBase.__mul__`."""
+        if isinstance(other, numbers.Number):
+            return self.scale(other)
+        return self.dot(other)
+
+    def __rmul__(self, other):
+        if isinstance(other, numbers.Number):
+            return self.scale(other)
+        return NotImplemented
+
+    def scale(self, factor):
+        """multiply every vector by a number, or by one number per vector."""
+        if isinstance(factor, numbers.Number):
+            if numpy is not None:
+                return self.fromBuffer(self.data * factor)
+            return self.fromBuffer(array('d', [c * factor for c in self.data]))
+        if numpy is not None:
+            factor = numpy.asarray(factor, dtype=float)
+            return self.fromBuffer(
+                    self._flat(self._rows() * factor[:, None]))
+        return self.fromBuffer(array('d', map(operator.mul, self.data,
+            self._spread(factor))))
+
+    def dot(self, other):
+        """get the dot product of each pair of vectors, as a flat buffer with
+        one number per vector."""
+        other = self._other(other)
+        if numpy is not None:
+            return (self._rows() * self._rows_of(other)).sum(axis=1)
+        return self._sums(map(operator.mul, *self._pairs(other)))
+
+    @property
+    def length(self):
+        """get the length of every vector, as a flat buffer"""
+        if numpy is not None:
+            return numpy.sqrt((self._rows() ** 2).sum(axis=1))
+        return array('d', map(math.sqrt,
+            self._sums([c * c for c in self.data])))
+
+    def normalized(self):
+        """get a new array where every vector has a length of 1.0"""
+        lengths = self.length
+        if not all(lengths):
+            raise ZeroDivisionError("cannot normalize a vector of length 0")
+        if numpy is not None:
+            return self.scale(1.0 / lengths)
+        return self.scale([1.0 / l for l in lengths])
+
+    def angleTo(self, other):
+        """computes the angle between each pair of vectors, in radians
+            cos theta = (n * m) / (n.length * m.length)
+        """
+        dots = self.dot(other)
+        if isinstance(other, VectorBase):
+            other_lengths = itertools.repeat(other.length, len(self))
+        else:
+            other_lengths = self.fromBuffer(self._other(other)).length
+        if numpy is not None:
+            if isinstance(other, VectorBase):
+                other_lengths = other.length
+            cos = dots / (self.length * other_lengths)
+            return numpy.arccos(numpy.clip(cos, -1.0, 1.0))
+        return array('d', [math.acos(max(-1.0, min(1.0, d / (a * b))))
+            for d, a, b in zip(dots, self.length, other_lengths)])
+
+    def __eq__(self, other):
+        if not isinstance(other, VectorArrayBase) or other.dim != self.dim:
+            return False
+        return len(self.data) == len(other.data) and all(
+                a == b for a, b in zip(self.data, other.data))
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '%s(%s vectors)' % (self.__class__.__name__, len(self))
+
+
+class Vector2dArray(VectorArrayBase):
+    """A batch of 2d vectors stored in one flat buffer of floats."""
+    dim = 2
+    vector_class = Vector2d
+
+
+class Vector3dArray(VectorArrayBase):
+    """A batch of 3d vectors stored in one flat buffer of floats."""
+    dim = 3
+    vector_class = Vector3d
+
+    def cross(self, other):
+        """Gets the cross product of each pair of vectors
+        """
+        other = self._other(other)
+        if numpy is not None:
+            return self.fromBuffer(self._flat(
+                numpy.cross(self._rows(), self._rows_of(other))))
+        a = self.data
+        ax, ay, az = a[0::3], a[1::3], a[2::3]
+        if isinstance(other, tuple):
+            bx, by, bz = (itertools.repeat(c) for c in other)
+        else:
+            bx, by, bz = other[0::3], other[1::3], other[2::3]
+        x = [(q * w) - (r * v) for q, r, v, w in zip(ay, az, by, bz)]
+        y = [(r * u) - (p * w) for p, r, u, w in zip(ax, az, bx, bz)]
+        z = [(p * v) - (q * u) for p, q, u, v in zip(ax, ay, bx, by)]
+        data = array('d', bytes(8 * len(a)))
+        data[0::3] = array('d', x)
+        data[1::3] = array('d', y)
+        data[2::3] = array('d', z)
+        return self.fromBuffer(data)
@@ -5,6 +5,11 @@ setup(
     version = "0.0.1",
     packages = ['geometry'],
 
+    # numpy is optional, but makes the batched array types much faster
+    extras_require = {
+        'numpy': ['numpy'],
+    },
+
     # metadata for upload to PyPI
     author = "Ben Golder, Stefano Borini",
     author_email = "benjamin.j.golder@gmail.com, stefano.borini@ferrara.linux.it",
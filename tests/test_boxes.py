@@ -0,0 +1,105 @@
+import unittest
+
+from geometry import boxes, vectors, points, intervals
+from geometry import (Box2d, Box3d, Interval, PointSet, Point3d, Point2d,
+        Vector3dArray, WingedEdgeMesh)
+
+
+class TestBoxes(unittest.TestCase):
+
+    def setUp(self):
+        self.points = PointSet([(1, 2, 3), (-1, 5, 0), (4, -2, 1)])
+
+    def test_defaults(self):
+        box = Box3d(2, 3, 4)
+        self.assertEqual(box.lower, (0, 0, 0))
+        self.assertEqual(box.upper, (2, 3, 4))
+        self.assertEqual(box.center(), Point3d(1, 1.5, 2))
+        self.assertEqual(Box2d().upper, (200, 100))
+
+    def test_from_points(self):
+        box = Box3d.fromPoints(self.points)
+        self.assertEqual(box.lower, (-1, -2, 0))
+        self.assertEqual(box.upper[0], 4.000000000000001)
+        # half-open, but every point is inside its bounding box
+        self.assertTrue(all(box.contains(self.points)))
+        self.assertTrue(box.contains(Point3d(4, 5, 3)))
+        self.assertFalse(box.contains((4.1, 0, 0)))
+        same = Box3d.fromPoints(Vector3dArray(self.points))
+        self.assertEqual((same.lower, same.upper), (box.lower, box.upper))
+        flat = Box2d.fromPoints(self.points)
+        self.assertEqual(flat.lower, (-1, -2))
+        self.assertEqual(Box2d.fromPoints([Point2d(3, 1), Point2d(0, 2)]
+            ).lower, (0, 1))
+        surface = WingedEdgeMesh(self.points, [0, 1, 2])
+        self.assertEqual(Box3d.fromPoints(surface).lower, box.lower)
+        self.assertRaises(ValueError, Box3d.fromPoints, [])
+        # the end is the next float, for negative numbers and zero too
+        self.assertEqual([boxes._above(c) for c in (-1.0, 0.0, -5e-324)],
+                [-0.9999999999999999, 5e-324, 0.0])
+
+    def test_operations(self):
+        a = Box2d.fromCorners((0, 0), (4, 4))
+        b = Box2d.fromIntervals(Interval(2, 6), (-1, 3))
+        self.assertEqual((a | b).lower, (0, -1))
+        self.assertEqual((a | b).upper, (6, 4))
+        both = a & b
+        self.assertEqual((both.lower, both.upper), ((2, 0), (4, 3)))
+        self.assertEqual(a & Box2d.fromCorners((4, 0), (5, 1)), None)
+        grown = a.expand(1)
+        self.assertEqual((grown.lower, grown.upper), ((-1, -1), (5, 5)))
+        self.assertTrue(grown.contains(a))
+        self.assertFalse(a.contains(grown))
+        self.assertTrue(a.expand(-2).is_empty())
+        wider = a.include((7, 2))
+        self.assertTrue(wider.contains((7, 2)))
+        self.assertEqual(wider.lower, (0, 0))
+        self.assertTrue(a.overlaps(b))
+        # touching boxes share no points
+        self.assertFalse(a.overlaps(Box2d.fromCorners((4, 0), (5, 1))))
+
+    def test_masks(self):
+        box = Box3d(2, 2, 2)
+        coords = [(1, 1, 1), (2, 1, 1), (0, 0, 0), (-1, 1, 1)]
+        self.assertEqual(list(box.contains(coords)),
+                [True, False, True, False])
+        others = [Box3d.fromCorners((1, 1, 1), (3, 3, 3)),
+                Box3d.fromCorners((2, 0, 0), (3, 1, 1)),
+                Box3d.fromCorners((-1, -1, -1), (0.5, 0.5, 0.5))]
+        self.assertEqual(list(box.overlaps(others)), [True, False, True])
+        lowers = [o.lower for o in others]
+        uppers = [o.upper for o in others]
+        self.assertEqual(list(box.overlaps((lowers, uppers))),
+                [True, False, True])
+
+    def test_divide(self):
+        box = Box3d.fromCorners((10, 0, -3), (14, 3, 3))
+        grid = box.divide(4, 3, 2.5)
+        self.assertEqual(grid.shape, (4, 3, 3))
+        self.assertEqual(len(grid), 36)
+        self.assertEqual(grid[0].lower, (10, 0, -3))
+        self.assertEqual(grid[-1].upper, (14, 3, 3))
+        self.assertEqual(grid[(1, 2, 1)].lower, (11, 2, -0.5))
+        self.assertEqual(grid.index(grid.shape[2] + 1), (0, 1, 1))
+        cells = list(grid)
+        self.assertEqual((grid[5].lower, grid[5].upper),
+                (cells[5].lower, cells[5].upper))
+        # the cells cover the box without overlapping
+        self.assertEqual(sum(cell.contains((12.5, 1.5, 2.0))
+            for cell in cells), 1)
+        self.assertEqual([list(b) for b in grid.breakpoints()],
+                [[10, 11, 12, 13, 14], [0, 1, 2, 3], [-3, -0.5, 2, 3]])
+        self.assertEqual(Box2d(2, 2).divide(2)[3].lower, (1, 1))
+        self.assertEqual(len(Box3d().divide(1000)), 10 ** 9)
+
+
+class TestBoxesWithoutNumpy(TestBoxes):
+
+    def setUp(self):
+        self.numpy = boxes.numpy
+        boxes.numpy = vectors.numpy = points.numpy = intervals.numpy = None
+        TestBoxes.setUp(self)
+
+    def tearDown(self):
+        boxes.numpy = vectors.numpy = points.numpy = self.numpy
+        intervals.numpy = self.numpy
@@ -0,0 +1,115 @@
+import unittest
+import random
+
+from geometry import delaunay, vectors, mesh
+from geometry import Delaunay2d, Point2d
+from geometry.predicates import orient2d, incircle
+
+
+class TestDelaunay2d(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(11)
+        self.scatter = [(rng.uniform(0, 10), rng.uniform(0, 10))
+                for i in range(400)]
+
+    def check_delaunay(self, triangulation):
+        points = triangulation.points
+        triangles = list(zip(*[iter(triangulation.triangles())] * 3))
+        used = set()
+        for a, b, c in triangles:
+            self.assertTrue(orient2d(points[a], points[b], points[c]) > 0)
+            used.update((a, b, c))
+        # every point is a vertex, and no point is inside a circumcircle
+        self.assertEqual(used, set(range(len(points))))
+        for a, b, c in triangles:
+            for p in points:
+                self.assertFalse(incircle(points[a], points[b], points[c], p)
+                        > 0)
+        return triangles
+
+    def test_bulk(self):
+        triangulation = Delaunay2d(self.scatter)
+        triangles = self.check_delaunay(triangulation)
+        hull = list(triangulation.hull())
+        # Euler's formula for a triangulated polygon with points inside it
+        self.assertEqual(len(triangles), 2 * len(self.scatter) - len(hull)
+                - 2)
+
+    def test_incremental(self):
+        triangulation = Delaunay2d()
+        line = [(0, 0), (1, 0), (3, 0), (2, 0), (1, 0)]
+        self.assertEqual([triangulation.insert(p) for p in line],
+                [0, 1, 2, 3, 1])
+        self.assertEqual(triangulation.triangle_count(), 0)
+        self.assertEqual(triangulation.locate((1, 0)), None)
+        triangulation.insert(Point2d(1.5, 2))
+        self.assertEqual(triangulation.triangle_count(), 3)
+        # on an edge of the hull, and outside of it in line with an edge
+        triangulation.insert((1.5, 0))
+        triangulation.insert((-2, 0))
+        for p in self.scatter[:50]:
+            triangulation.insert((p[0] - 5, p[1] - 5))
+        self.check_delaunay(triangulation)
+        indices = triangulation.extend([(0, 0), (20, 20)])
+        self.assertEqual(list(indices), [0, len(triangulation) - 1])
+        self.check_delaunay(triangulation)
+
+    def test_grid(self):
+        grid = [(x, y) for x in range(6) for y in range(6)]
+        triangulation = Delaunay2d(grid)
+        self.check_delaunay(triangulation)
+        self.assertEqual(triangulation.triangle_count(), 50)
+        self.assertEqual(list(triangulation.hull()),
+                [0, 6, 12, 18, 24, 30, 31, 32, 33, 34, 35, 29, 23, 17, 11, 5,
+                    4, 3, 2, 1])
+        corners = triangulation.locate((2.5, 2.25))
+        self.assertEqual(len(corners), 3)
+        self.assertTrue(set(corners) <= set([14, 15, 20, 21]))
+        self.assertEqual(triangulation.locate((7, 1)), None)
+        # the diagonal of a square of the grid can go either way
+        neighbors = set(triangulation.neighbors(0))
+        self.assertTrue(set([1, 6]) <= neighbors <= set([1, 6, 7]))
+
+    def test_voronoi(self):
+        ring = [(0, 0), (1, 0), (0, 1), (-1, 0), (0, -1), (2, 2), (-2, 2),
+                (-2, -2), (2, -2)]
+        triangulation = Delaunay2d(ring)
+        cell = triangulation.voronoi_cell(0)
+        self.assertEqual(len(cell), 4)
+        self.assertEqual(sorted((p.x, p.y) for p in cell),
+                [(-0.5, -0.5), (-0.5, 0.5), (0.5, -0.5), (0.5, 0.5)])
+        # counterclockwise
+        for a, b, c in zip(cell, cell[1:] + cell[:1], cell[2:] + cell[:2]):
+            self.assertTrue(orient2d(a, b, c) > 0)
+        self.assertEqual(triangulation.voronoi_cell(5), None)
+        cells = triangulation.voronoi_cells()
+        self.assertEqual([c is None for c in cells], [False] * 5 + [True] * 4)
+        centers = triangulation.circumcenters()
+        self.assertEqual(len(centers), triangulation.triangle_count())
+        points = triangulation.points
+        triangles = list(zip(*[iter(triangulation.triangles())] * 3))
+        for center, corners in zip(centers, triangles):
+            distances = [(center.x - points[v][0]) ** 2 +
+                    (center.y - points[v][1]) ** 2 for v in corners]
+            self.assertAlmostEqual(distances[0], distances[1])
+            self.assertAlmostEqual(distances[0], distances[2])
+
+    def test_mesh(self):
+        triangulation = Delaunay2d(self.scatter[:100])
+        surface = triangulation.toMesh()
+        self.assertEqual(surface.face_count(),
+                triangulation.triangle_count())
+        self.assertEqual(surface.boundary_count(),
+                len(triangulation.hull()))
+
+
+class TestDelaunay2dWithoutNumpy(TestDelaunay2d):
+
+    def setUp(self):
+        self.numpy = delaunay.numpy
+        delaunay.numpy = vectors.numpy = mesh.numpy = None
+        TestDelaunay2d.setUp(self)
+
+    def tearDown(self):
+        delaunay.numpy = vectors.numpy = mesh.numpy = self.numpy
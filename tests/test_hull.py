@@ -0,0 +1,122 @@
+import unittest
+import random
+import itertools
+from functools import reduce
+try:
+    from math import gcd
+except ImportError:
+    from fractions import gcd
+
+from geometry import hull, points, vectors, mesh
+from geometry import PointSet
+from geometry.hull import convex_hull_2d, convex_hull_3d, HullError
+from geometry.predicates import orient2d, orient3d
+
+
+class TestConvexHull(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(5)
+        self.scatter = [(rng.uniform(-1, 1), rng.uniform(-1, 1),
+            rng.uniform(-1, 1)) for i in range(300)]
+        self.grid = [tuple(float(c) for c in p)
+                for p in itertools.product(range(4), repeat=3)]
+
+    def test_hull_2d(self):
+        square = [(1, 1), (0, 0), (2, 0), (1, 0), (2, 2), (0, 2), (2, 0),
+                (0, 1)]
+        self.assertEqual(list(convex_hull_2d(square)), [1, 2, 4, 5])
+        self.assertEqual(list(convex_hull_2d([(0, 0), (1, 1), (2, 2)])),
+                [0, 2])
+        self.assertEqual(list(convex_hull_2d([(3, 3), (3, 3)])), [0])
+        self.assertEqual(list(convex_hull_2d([])), [])
+
+    def test_many_points_2d(self):
+        flat = [p[:2] for p in self.scatter]
+        corners = list(convex_hull_2d(flat))
+        ring = [flat[i] for i in corners]
+        self.assertEqual(ring[0], min(flat))
+        for a, b, c in zip(ring, ring[1:] + ring[:1], ring[2:] + ring[:2]):
+            # corners turn left, and every point is inside
+            self.assertTrue(orient2d(a, b, c) > 0)
+            for p in flat:
+                self.assertTrue(orient2d(a, b, p) >= 0)
+
+    def check_hull(self, coords, faces):
+        triangles = list(zip(*[iter(faces)] * 3))
+        edges = set()
+        for a, b, c in triangles:
+            for p in coords:
+                self.assertTrue(orient3d(coords[a], coords[b], coords[c], p)
+                        >= 0)
+            edges.update(((a, b), (b, c), (c, a)))
+        self.assertEqual(len(edges), 3 * len(triangles))
+        for a, b in edges:
+            self.assertTrue((b, a) in edges)
+        return triangles
+
+    def test_hull_3d(self):
+        triangles = self.check_hull(self.scatter,
+                convex_hull_3d(self.scatter))
+        self.assertTrue(len(triangles) > 4)
+        # points on the faces of a cube are not corners
+        triangles = self.check_hull(self.grid, convex_hull_3d(self.grid))
+        self.assertEqual(len(triangles), 12)
+        corners = set(v for t in triangles for v in t)
+        self.assertEqual(sorted(self.grid[i] for i in corners),
+                sorted(p for p in self.grid if set(p) <= set([0.0, 3.0])))
+
+    def direction(self, a, b, c):
+        """the normal of a triangle with integer corners, in lowest terms"""
+        u = [int(q - p) for p, q in zip(a, b)]
+        w = [int(q - p) for p, q in zip(a, c)]
+        normal = (u[1] * w[2] - u[2] * w[1], u[2] * w[0] - u[0] * w[2],
+                u[0] * w[1] - u[1] * w[0])
+        divisor = reduce(gcd, normal)
+        return tuple(n // divisor for n in normal)
+
+    def test_random_grid(self):
+        # many points on the faces and edges, in a random order
+        rng = random.Random(3)
+        for count, size in ((3000, 5), (40, 5), (200, 2)):
+            cloud = [tuple(float(rng.randint(0, size)) for i in range(3))
+                    for j in range(count)]
+            triangles = self.check_hull(cloud, convex_hull_3d(cloud))
+            corners = set(v for t in triangles for v in t)
+            # a closed surface of triangles with no corners on the flat parts
+            self.assertEqual(len(triangles), 2 * len(corners) - 4)
+            for v in corners:
+                planes = set(self.direction(*[cloud[i] for i in t])
+                        for t in triangles if v in t)
+                self.assertTrue(len(planes) >= 3)
+            if count == 3000:
+                self.assertEqual(len(triangles), 12)
+                self.assertEqual(sorted(set(cloud[i] for i in corners)),
+                        sorted(itertools.product((0.0, 5.0), repeat=3)))
+
+    def test_flat(self):
+        flat = [(x, y, 1.0) for x in range(3) for y in range(3)]
+        self.assertRaises(HullError, convex_hull_3d, flat)
+        self.assertRaises(HullError, convex_hull_3d, flat[:3])
+
+    def test_point_set(self):
+        inside = [(x + 1.5, y + 1.5, z + 1.5) for x, y, z in self.scatter]
+        cloud = PointSet(self.grid + inside)
+        solid = cloud.convex_hull()
+        self.assertTrue(solid.is_closed())
+        self.assertEqual(solid.vertex_count(), 8)
+        self.assertEqual(solid.face_count(), 12)
+        outline = [cloud[i] for i in cloud.convex_hull(dim=2)]
+        self.assertEqual([(p.x, p.y) for p in outline],
+                [(0, 0), (3, 0), (3, 3), (0, 3)])
+
+
+class TestConvexHullWithoutNumpy(TestConvexHull):
+
+    def setUp(self):
+        self.numpy = hull.numpy
+        hull.numpy = points.numpy = vectors.numpy = mesh.numpy = None
+        TestConvexHull.setUp(self)
+
+    def tearDown(self):
+        hull.numpy = points.numpy = vectors.numpy = mesh.numpy = self.numpy
@@ -6,8 +6,10 @@ class TestImport(unittest.TestCase):
 
     def test_imports(self):
         from geometry import (
+                Tolerance,
                 Interval,
                 Scale,
+                IntervalTree,
                 Box2d,
                 Box3d,
                 Vector2d,
@@ -15,15 +17,24 @@ class TestImport(unittest.TestCase):
                 Point2d,
                 Point3d,
                 PointSet,
+                PointFile,
                 PageX,
                 PageY,
                 WorldX,
                 WorldY,
                 WorldZ,
+                Vector2dArray,
+                Vector3dArray,
                 Matrix,
+                SparseMatrix,
+                Transform2d,
+                Transform3d,
                 Line3d,
                 LineSegment2d,
                 Plane3d,
+                PlaneSet,
+                WingedEdgeMesh,
+                Delaunay2d,
         )
 
 
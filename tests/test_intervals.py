@@ -0,0 +1,175 @@
+import unittest
+import random
+from array import array
+
+from geometry import intervals
+from geometry import Interval, Scale, IntervalTree
+
+
+class TestInterval(unittest.TestCase):
+
+    def setUp(self):
+        self.values = [-2.0, 0.0, 1.5, 4.0, 6.0, 9.5]
+
+    def assertValues(self, result, expected):
+        self.assertEqual(len(result), len(expected))
+        for a, b in zip(result, expected):
+            self.assertAlmostEqual(a, b)
+
+    def test_arrays(self):
+        interval = Interval(-2.0, 6.0)
+        fractions = interval.fraction(self.values)
+        self.assertValues(fractions, [interval.fraction(v)
+            for v in self.values])
+        self.assertValues(interval(fractions), self.values)
+        self.assertValues(interval(array('d', [0.0, 0.25, 1.0])),
+                [-2.0, 0.0, 6.0])
+        # several arguments still give a list
+        self.assertEqual(interval(0.0, 1.0), [-2.0, 6.0])
+        self.assertEqual(interval(0.5), 2.0)
+
+    def test_contains(self):
+        interval = Interval(0.0, 6.0)
+        self.assertEqual(list(interval.contains(self.values)),
+                [False, True, True, True, False, False])
+        self.assertTrue(interval.contains(0.0))
+        self.assertFalse(interval.contains(6.0))
+
+    def test_scale(self):
+        scale = Scale(domain=(-2.0, 6.0), range=(100.0, 0.0))
+        self.assertEqual(scale(-2.0), 100.0)
+        self.assertEqual(scale(2.0), 50.0)
+        mapped = scale(self.values)
+        self.assertValues(mapped, [scale(v) for v in self.values])
+        self.assertValues(scale.reverse(mapped), self.values)
+        # the ratios follow new intervals
+        scale.range = Interval(0.0, 16.0)
+        self.assertEqual(scale(0.0), 4.0)
+        scale.domain = Interval(0.0, 1.0)
+        self.assertValues(scale([0.5, 2.0]), [8.0, 32.0])
+        self.assertRaises(ZeroDivisionError, Scale((1.0, 1.0)), 1.0)
+
+    def test_divide(self):
+        # shifted intervals start their parts at their own start
+        interval = Interval(10.0, 20.0)
+        self.assertEqual([(i.start, i.end) for i in interval.divide(4)],
+                [(10, 12.5), (12.5, 15), (15, 17.5), (17.5, 20)])
+        self.assertEqual([(i.start, i.end) for i in interval.divide(3.0)],
+                [(10, 13), (13, 16), (16, 19), (19, 20)])
+        self.assertEqual(list(interval.breakpoints(4)),
+                [10, 12.5, 15, 17.5, 20])
+        self.assertEqual(list(interval.breakpoints(3.0)), [10, 13, 16, 19, 20])
+        # millions of parts are only made when they are asked for
+        parts = Interval(-1.0, 1.0).divide(2 * 10 ** 6)
+        self.assertEqual(len(parts), 2 * 10 ** 6)
+        self.assertEqual(parts[10 ** 6].start, 0.0)
+        self.assertEqual(parts[-1].end, 1.0)
+        self.assertAlmostEqual(parts[-1].start, 1.0 - 1e-6)
+        self.assertEqual([i.start for i in parts[2:6:2]], [-0.999998,
+            -0.999996])
+        self.assertRaises(IndexError, parts.__getitem__, 2 * 10 ** 6)
+        self.assertEqual(len(Interval(5.0, 5.0).divide(1.0)), 0)
+        # 2.1 / 0.15 rounds up past 14, which must not add an empty part
+        parts = Interval(0, 2.1).divide(0.15)
+        self.assertEqual(len(parts), 14)
+        self.assertEqual(parts[-1].end, 2.1)
+        self.assertTrue(parts[-1].start < 2.1)
+        points = list(Interval(0, 2.1).breakpoints(0.15))
+        self.assertEqual(len(points), 15)
+        self.assertEqual(points[-1], 2.1)
+        self.assertTrue(points[-2] < 2.1)
+
+
+class TestIntervalTree(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(4)
+        # integer endpoints, so that many intervals share them
+        self.spans = [self.random_span() for n in range(600)]
+
+    def random_span(self):
+        start = float(random.randint(0, 40))
+        return start, start + random.choice([0, 1, 3, 8, 20, -2])
+
+    def brute_containing(self, spans, value):
+        return sorted(i for i, (s, e) in spans.items() if s <= value < e)
+
+    def brute_overlapping(self, spans, start, end):
+        return sorted(i for i, (s, e) in spans.items()
+                if s < e and start < end and s < end and start < e)
+
+    def test_queries(self):
+        tree = IntervalTree(self.spans[:400])
+        spans = dict(enumerate(self.spans[:400]))
+        self.assertEqual(len(tree), 400)
+        self.assertIsInstance(tree.intervals[0], Interval)
+        values = [random.uniform(-2, 62) for n in range(50)] + list(range(60))
+        for value in values:
+            self.assertEqual(tree.containing(value),
+                    self.brute_containing(spans, value))
+        queries = [self.random_span() for n in range(100)]
+        for start, end in queries:
+            self.assertEqual(tree.overlapping(Interval(start, end)),
+                    self.brute_overlapping(spans, start, end))
+        # batches give the same pairs as single queries
+        found = tree.containing_many(values)
+        self.assertEqual(list(zip(*found)), [(q, i) for q, value in
+            enumerate(values) for i in tree.containing(value)])
+        found = tree.overlapping_many(queries)
+        self.assertEqual(list(zip(*found)), [(q, i) for q, query in
+            enumerate(queries) for i in tree.overlapping(query)])
+
+    def test_insert_remove(self):
+        tree = IntervalTree()
+        self.assertEqual(tree.containing(1.0), [])
+        self.assertEqual(list(tree.overlapping_many([(0, 1)])[0]), [])
+        spans = {}
+        for span in self.spans:
+            index = tree.insert(span)
+            spans[index] = span
+            if index % 3 == 2:
+                tree.remove(index - 1)
+                del spans[index - 1]
+        self.assertEqual(len(tree), len(spans))
+        self.assertIsNone(tree.intervals[1])
+        self.assertRaises(KeyError, tree.remove, 1)
+        for value in range(-1, 62):
+            self.assertEqual(tree.containing(value),
+                    self.brute_containing(spans, value))
+        # removing most of the intervals rebuilds the index
+        for index in list(spans)[:300]:
+            tree.remove(index)
+            del spans[index]
+        self.assertEqual(len(tree._levels), 1)
+        for start, end in [(0, 5), (10, 10.5), (39, 70), (5, 4)]:
+            self.assertEqual(tree.overlapping((start, end)),
+                    self.brute_overlapping(spans, start, end))
+        found = tree.containing_many([4.0, 12.5])
+        self.assertEqual(list(found[1]), tree.containing(4.0) +
+                tree.containing(12.5))
+
+
+class TestIntervalWithoutNumpy(TestInterval):
+
+    def setUp(self):
+        self.numpy = intervals.numpy
+        intervals.numpy = None
+        TestInterval.setUp(self)
+
+    def tearDown(self):
+        intervals.numpy = self.numpy
+
+    def test_types(self):
+        self.assertIsInstance(Interval(4.0)([0.5]), array)
+        self.assertIsInstance(Scale()([0.5]), array)
+
+
+class TestIntervalTreeWithoutNumpy(TestIntervalTree):
+
+    def setUp(self):
+        self.numpy = intervals.numpy
+        intervals.numpy = None
+        TestIntervalTree.setUp(self)
+
+    def tearDown(self):
+        intervals.numpy = self.numpy
@@ -0,0 +1,101 @@
+import math
+import unittest
+
+from geometry import line, plane, vectors
+from geometry import (Line3d, LineSegment2d, Plane3d, PlaneSet, Point2d,
+        Point3d, Vector3d)
+from geometry.line import closest_parameters, intersect_segments
+
+
+class TestLineIntersections(unittest.TestCase):
+
+    def test_line_plane(self):
+        ground = Plane3d(Point3d(0, 0, 2), Vector3d(0, 0, 3))
+        ray = Line3d(Point3d(1, 1, 5), Point3d(2, 3, 4))
+        self.assertEqual(ground.intersect(ray), Point3d(4, 7, 2))
+        self.assertEqual(ray.intersect(ground), Point3d(4, 7, 2))
+        flat = Line3d(Vector3d(1, 1, 0), Point3d(0, 0, 5))
+        self.assertEqual(ground.intersect(flat), None)
+
+    def test_plane_plane(self):
+        # planes built from three points have Point3d normals
+        top = Plane3d(Point3d(0, 0, 5), Point3d(1, 0, 5), Point3d(0, 1, 5))
+        side = Plane3d(Point3d(3, 0, 0), Point3d(3, 1, 0), Point3d(3, 0, 1))
+        found = top.intersect(side)
+        self.assertTrue(isinstance(found, Line3d))
+        for t in (0, 1, -2.5):
+            point = found.pointAt(t)
+            self.assertAlmostEqual(point.z, 5)
+            self.assertAlmostEqual(point.x, 3)
+        self.assertEqual(top.intersect(Plane3d(Point3d(0, 0, 1),
+            Point3d(0, 1, 1), Point3d(1, 0, 1))), None)
+
+    def test_line_plane_batch(self):
+        ground = Plane3d(Point3d(0, 0, 2), Vector3d(0, 0, 3))
+        origins = [(1, 1, 5), (0, 0, 0), (0, 0, 5)]
+        directions = [(1, 2, -1), (0, 0, 4), (1, 1, 0)]
+        t, points = ground.intersect_lines(origins, directions)
+        self.assertEqual(list(t[:2]), [3, 0.5])
+        self.assertTrue(math.isnan(t[2]))
+        self.assertEqual(points[0], Vector3d(4, 7, 2))
+        self.assertEqual(points[1], Vector3d(0, 0, 2))
+        stack = PlaneSet([Plane3d(Point3d(0, 0, z), Vector3d(0, 0, 1))
+            for z in range(3)])
+        table = stack.intersect_lines(origins, directions)
+        self.assertEqual(len(table), 3)
+        for row, z in zip(table, range(3)):
+            self.assertEqual(list(row[:2]), [5 - z, z / 4.0])
+            self.assertTrue(math.isnan(row[2]))
+
+    def test_line_line(self):
+        a = Line3d(Vector3d(1, 0, 0), Point3d(0, 0, 0))
+        b = Line3d(Vector3d(0, 2, 0), Point3d(3, 5, 4))
+        self.assertEqual(a.closest_points(b), (Point3d(3, 0, 0),
+            Point3d(3, 0, 4)))
+        self.assertEqual(a.intersect(b), None)
+        c = Line3d(Point3d(3, -1, 0), Point3d(3, 1, 0))
+        self.assertEqual(a.intersect(c), Point3d(3, 0, 0))
+        parallel = Line3d(Vector3d(-2, 0, 0), Point3d(0, 1, 0))
+        self.assertEqual(a.closest_points(parallel), None)
+        s, t = closest_parameters([(0, 0, 0), (0, 0, 0)],
+                [(1, 0, 0), (1, 0, 0)], [(3, 5, 4), (0, 1, 0)],
+                [(0, 2, 0), (-2, 0, 0)])
+        self.assertEqual((s[0], t[0]), (3, -2.5))
+        self.assertTrue(math.isnan(s[1]) and math.isnan(t[1]))
+        point = Line3d(Point3d(1, 1, 1), Point3d(1, 1, 1))
+        self.assertRaises(ValueError, a.closest_points, point)
+        self.assertRaises(ValueError, point.intersect, a)
+        self.assertRaises(ValueError, closest_parameters, [(0, 0, 0)],
+                [(0, 0, 0)], [(1, 0, 0)], [(0, 1, 0)])
+
+    def test_segments(self):
+        a = LineSegment2d(Point2d(0, 0), Point2d(4, 4))
+        b = LineSegment2d(Point2d(0, 4), Point2d(4, 0))
+        c = LineSegment2d(Point2d(5, 0), Point2d(5, 9))
+        d = LineSegment2d(Point2d(4, 4), Point2d(6, 0))
+        self.assertEqual(a.intersect(b), Point2d(2, 2))
+        self.assertEqual(a.intersect(c), None)
+        self.assertEqual(a.intersect(d), Point2d(4, 4))
+        self.assertEqual(a.intersect(LineSegment2d(Point2d(1, 1),
+            Point2d(2, 2))), None)
+        hits, points = intersect_segments([(0, 0)] * 4, [(4, 4)] * 4,
+                [(0, 4), (5, 0), (4, 4), (1, 1)],
+                [(4, 0), (5, 9), (6, 0), (2, 2)])
+        self.assertEqual(list(hits), [True, False, True, False])
+        self.assertEqual(tuple(points[0]), (2, 2))
+        self.assertEqual(tuple(points[2]), (4, 4))
+        self.assertTrue(math.isnan(points[1].x))
+
+
+class TestLineIntersectionsWithoutNumpy(TestLineIntersections):
+
+    def setUp(self):
+        self.numpy = line.numpy
+        line.numpy = plane.numpy = vectors.numpy = None
+
+    def tearDown(self):
+        line.numpy = plane.numpy = vectors.numpy = self.numpy
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import unittest
+
+from geometry import matrix
+from geometry import Matrix, MatrixError, Tolerance
+
+
+class TestMatrix(unittest.TestCase):
+
+    def setUp(self):
+        self.a = Matrix([[1, 2, 3], [4, 5, 6]])
+        self.b = Matrix([[1, 0], [0, 1], [2, -1]])
+
+    def assertTablesAlmostEqual(self, m, table):
+        self.assertEqual(len(m), len(table))
+        for row, expected in zip(m, table):
+            self.assertEqual(len(row), len(expected))
+            for c, e in zip(row, expected):
+                self.assertAlmostEqual(c, e)
+
+    def test_construction(self):
+        self.assertTablesAlmostEqual(Matrix(), [[1, 0, 0], [0, 1, 0],
+            [0, 0, 1]])
+        self.assertEqual((self.a.rows(), self.a.cols()), (2, 3))
+        self.assertFalse(self.a.is_square())
+        self.assertRaises(MatrixError, Matrix, [[1, 2], [3]])
+
+    def test_product(self):
+        self.assertTablesAlmostEqual(self.a * self.b, [[7, -1], [16, -1]])
+        self.assertTablesAlmostEqual(self.b * self.a, [[1, 2, 3],
+            [4, 5, 6], [-2, -1, 0]])
+        self.assertRaises(MatrixError, lambda: self.a * self.a)
+
+    def test_elementwise(self):
+        self.assertTablesAlmostEqual(self.a * 2, [[2, 4, 6], [8, 10, 12]])
+        self.assertTablesAlmostEqual(self.a + self.a, [[2, 4, 6],
+            [8, 10, 12]])
+        self.assertTablesAlmostEqual(self.a - 1, [[0, 1, 2], [3, 4, 5]])
+        self.assertTablesAlmostEqual(self.a + 1 - self.a, [[1, 1, 1],
+            [1, 1, 1]])
+        self.assertRaises(MatrixError, lambda: self.a + self.b)
+
+    def test_transpose(self):
+        self.assertTablesAlmostEqual(self.a.transpose(), [[1, 4], [2, 5],
+            [3, 6]])
+        self.assertTablesAlmostEqual(list(self.a.iter_cols()), [[1, 4],
+            [2, 5], [3, 6]])
+        self.assertTablesAlmostEqual(self.a.transpose().transpose(), self.a)
+
+    def test_views(self):
+        m = Matrix([[1, 2, 3], [4, 5, 6], [7, 8, 9]])
+        self.assertEqual(m[1, 2], 6)
+        self.assertEqual(m[-1], (7, 8, 9))
+        self.assertTablesAlmostEqual(m[1:], [[4, 5, 6], [7, 8, 9]])
+        self.assertTablesAlmostEqual(m[:, 1], [[2], [5], [8]])
+        self.assertTablesAlmostEqual(m[0:2, 1:], [[2, 3], [5, 6]])
+        t = m.transpose()
+        self.assertEqual(t[0, 2], 7)
+        self.assertTablesAlmostEqual(t[1:, ::2], [[2, 8], [3, 9]])
+        self.assertTablesAlmostEqual(t.submatrix(-1), [[3, 6, 9]])
+        self.assertTablesAlmostEqual(m[1:].transpose() * m[1:, 0],
+                [[65], [76], [87]])
+        self.assertEqual((t[1:].rows(), t[1:].cols()), (2, 3))
+        self.assertRaises(MatrixError, lambda: m[3:])
+
+
+class TestMatrixWithoutNumpy(TestMatrix):
+
+    def setUp(self):
+        self.numpy = matrix.numpy
+        matrix.numpy = None
+        TestMatrix.setUp(self)
+
+    def tearDown(self):
+        matrix.numpy = self.numpy
+
+
+class TestLinearAlgebra(unittest.TestCase):
+
+    def setUp(self):
+        self.m = Matrix([[2, 1, 1], [4, -6, 0], [-2, 7, 2]])
+
+    def test_determinant(self):
+        self.assertAlmostEqual(self.m.det(), -16)
+        self.assertAlmostEqual(Matrix([[0, 1], [1, 0]]).det(), -1)
+        self.assertEqual(Matrix([[1, 2], [2, 4]]).det(), 0.0)
+        self.assertRaises(MatrixError, Matrix([[1, 2, 3]]).det)
+        # singular up to rounding, at any scale
+        for scale in (1.0, 1e-9, 1e9):
+            m = Matrix([[c * scale for c in row]
+                for row in [[1, 2, 3], [4, 5, 6], [7, 8, 9]]])
+            self.assertEqual(m.det(), 0.0)
+            self.assertRaises(MatrixError, m.inverse)
+        tiny = Matrix([[1e-9, 0], [0, 1e-9]])
+        self.assertAlmostEqual(tiny.det() / 1e-18, 1.0)
+        # rows of very different sizes are fine
+        for rows, det in (([[1e8, 0], [0, 1]], 1e8), ([[1, 0], [0, 1e-8]],
+                1e-8), ([[1e8, 1e8], [1, 2]], 1e8)):
+            m = Matrix(rows)
+            self.assertAlmostEqual(m.det() / det, 1.0)
+            product = m * m.inverse()
+            for i, row in enumerate(product):
+                for j, c in enumerate(row):
+                    self.assertAlmostEqual(c, 1.0 if i == j else 0.0)
+        self.assertEqual(Matrix([[1, 2], [0, 0]]).det(), 0.0)
+        # a looser tolerance treats nearly singular matrices as singular
+        nearly = Matrix([[1, 1], [1, 1 + 1e-6]])
+        self.assertNotEqual(nearly.det(), 0.0)
+        with Tolerance(absolute=1e-4):
+            self.assertEqual(nearly.det(), 0.0)
+            self.assertRaises(MatrixError, nearly.inverse)
+        self.assertNotEqual(nearly.det(), 0.0)
+
+    def test_solve(self):
+        x = self.m.solve([5, -2, 9])
+        for c, e in zip(x, [1, 1, 2]):
+            self.assertAlmostEqual(c, e)
+        # the factorization is cached on the matrix
+        self.assertTrue(self.m.lu is self.m.lu)
+        B = Matrix([[5, 4], [-2, 4], [9, 0]])
+        X = self.m.solve_many(B)
+        for row, expected in zip(self.m * X, B):
+            for c, e in zip(row, expected):
+                self.assertAlmostEqual(c, e)
+        self.assertRaises(MatrixError, Matrix([[1, 2], [2, 4]]).solve,
+                [1, 2])
+        self.assertRaises(MatrixError, self.m.solve, [1, 2])
+
+    def test_inverse(self):
+        product = self.m * self.m.inverse()
+        for i, row in enumerate(product):
+            for j, c in enumerate(row):
+                self.assertAlmostEqual(c, 1.0 if i == j else 0.0)
+
+
+class TestLinearAlgebraWithoutNumpy(TestLinearAlgebra):
+
+    def setUp(self):
+        self.numpy = matrix.numpy
+        matrix.numpy = None
+        TestLinearAlgebra.setUp(self)
+
+    def tearDown(self):
+        matrix.numpy = self.numpy
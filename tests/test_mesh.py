@@ -0,0 +1,92 @@
+import unittest
+
+from geometry import mesh, vectors, sparse
+from geometry import WingedEdgeMesh, Point3d
+
+
+def grid(size):
+    """a flat square grid of size x size cells, two triangles per cell"""
+    vertices = [(x, y, 0) for y in range(size + 1) for x in range(size + 1)]
+    faces = []
+    for y in range(size):
+        for x in range(size):
+            a = y * (size + 1) + x
+            b, c, d = a + 1, a + size + 2, a + size + 1
+            faces += [(a, b, c), (a, c, d)]
+    return vertices, faces
+
+
+class TestWingedEdgeMesh(unittest.TestCase):
+
+    def setUp(self):
+        self.grid = WingedEdgeMesh(*grid(2))
+        self.tetra = WingedEdgeMesh(
+                [(0, 0, 0), (1, 0, 0), (0, 1, 0), (0, 0, 1)],
+                [0, 2, 1, 0, 1, 3, 0, 3, 2, 1, 2, 3])
+
+    def test_counts(self):
+        self.assertEqual(self.grid.vertex_count(), 9)
+        self.assertEqual(self.grid.face_count(), 8)
+        self.assertEqual(self.grid.edge_count(), 16)
+        self.assertEqual(self.grid.boundary_count(), 8)
+        self.assertFalse(self.grid.is_closed())
+        self.assertTrue(self.tetra.is_closed())
+        self.assertEqual(self.tetra.edge_count(), 6)
+
+    def test_non_manifold(self):
+        # three triangles on the edge between vertices 0 and 1
+        vertices = [(0, 0, 0), (1, 0, 0), (0, 1, 0), (0, -1, 0), (0, 0, 1)]
+        faces = [0, 1, 2, 1, 0, 3, 0, 1, 4]
+        self.assertRaises(ValueError, WingedEdgeMesh, vertices, faces)
+        self.assertRaises(ValueError, WingedEdgeMesh, vertices,
+                [2, 1, 0, 1, 0, 3, 4, 1, 0])
+        self.assertEqual(WingedEdgeMesh(vertices, faces[:6]).edge_count(), 5)
+
+    def test_navigation(self):
+        m = self.tetra
+        for h in range(m.halfedge_count()):
+            twin = m.twin(h)
+            self.assertEqual(m.twin(twin), h)
+            self.assertEqual(m.origin(twin), m.target(h))
+            self.assertEqual(m.next(m.next(m.next(h))), h)
+            self.assertEqual(m.prev(m.next(h)), h)
+            self.assertEqual(m.face(m.next(h)), m.face(h))
+        self.assertEqual(m.face_vertices(1), (0, 1, 3))
+        self.assertEqual(m.face_points(1)[2], Point3d(0, 0, 1))
+
+    def test_rings(self):
+        # the center of the grid touches every other vertex but is interior
+        self.assertEqual(sorted(self.grid.vertex_ring(4)),
+                [0, 1, 3, 5, 7, 8])
+        self.assertEqual(len(list(self.grid.vertex_faces(4))), 6)
+        # a corner on the boundary
+        self.assertEqual(sorted(self.grid.vertex_ring(0)), [1, 3, 4])
+        self.assertEqual(sorted(self.grid.vertex_faces(0)), [0, 1])
+        self.assertEqual(sorted(self.tetra.vertex_ring(0)), [1, 2, 3])
+        self.assertEqual(sorted(self.tetra.face_ring(0)), [1, 2, 3])
+        self.assertEqual(sorted(self.grid.face_ring(0)), [1, 3])
+
+    def test_laplacian(self):
+        laplacian = self.grid.laplacian()
+        self.assertEqual(list(laplacian.diagonal()),
+                [3, 4, 2, 4, 6, 4, 2, 4, 3])
+        for total in laplacian.dot([1.0] * 9):
+            self.assertEqual(total, 0.0)
+
+    def test_from_triangles(self):
+        m = WingedEdgeMesh.from_triangles([
+            ((0, 0, 0), (1, 0, 0), (1, 1, 0)),
+            ((0, 0, 0), (1, 1, 0), (0, 1, 0))])
+        self.assertEqual(m.vertex_count(), 4)
+        self.assertEqual(m.edge_count(), 5)
+
+
+class TestWingedEdgeMeshWithoutNumpy(TestWingedEdgeMesh):
+
+    def setUp(self):
+        self.numpy = mesh.numpy
+        mesh.numpy = vectors.numpy = sparse.numpy = None
+        TestWingedEdgeMesh.setUp(self)
+
+    def tearDown(self):
+        mesh.numpy = vectors.numpy = sparse.numpy = self.numpy
@@ -0,0 +1,142 @@
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+from geometry import meshio, vectors, transform
+from geometry import WingedEdgeMesh, Transform3d
+
+
+# a unit cube made of twelve triangles
+CUBE_VERTICES = [(0, 0, 0), (1, 0, 0), (1, 1, 0), (0, 1, 0),
+        (0, 0, 1), (1, 0, 1), (1, 1, 1), (0, 1, 1)]
+CUBE_FACES = [0, 2, 1, 0, 3, 2, 4, 5, 6, 4, 6, 7, 0, 1, 5, 0, 5, 4,
+        1, 2, 6, 1, 6, 5, 2, 3, 7, 2, 7, 6, 3, 0, 4, 3, 4, 7]
+
+
+class TestMeshIO(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def path(self, name):
+        return os.path.join(self.folder, name)
+
+    def check_cube(self, vertices, faces):
+        self.assertEqual([tuple(v) for v in vertices.asList()], CUBE_VERTICES)
+        self.assertEqual(list(faces), CUBE_FACES)
+
+    def test_obj_round_trip(self):
+        meshio.write_mesh(self.path('cube.obj'), CUBE_VERTICES, CUBE_FACES)
+        self.check_cube(*meshio.read_mesh(self.path('cube.obj')))
+
+    def test_ply_round_trip(self):
+        meshio.write_mesh(self.path('cube.ply'), CUBE_VERTICES, CUBE_FACES)
+        self.check_cube(*meshio.read_ply(self.path('cube.ply')))
+        meshio.write_mesh(self.path('ascii.ply'), CUBE_VERTICES, CUBE_FACES,
+                binary=False)
+        self.check_cube(*meshio.read_ply(self.path('ascii.ply')))
+
+    def test_stl_round_trip(self):
+        meshio.write_mesh(self.path('cube.stl'), CUBE_VERTICES, CUBE_FACES)
+        self.assertEqual(os.path.getsize(self.path('cube.stl')), 84 + 50 * 12)
+        vertices, faces = meshio.read_stl(self.path('cube.stl'))
+        self.assertEqual(len(vertices), 36)
+        self.assertEqual(list(faces), list(range(36)))
+        corners = [tuple(vertices[i]) for i in range(3)]
+        self.assertEqual(corners, [CUBE_VERTICES[v] for v in CUBE_FACES[:3]])
+        with open(self.path('cube.stl'), 'rb') as f:
+            normal = struct.unpack_from('<3f', f.read(), 84)
+        self.assertEqual(normal, (0.0, 0.0, -1.0))
+
+    def test_obj_polygons(self):
+        with open(self.path('quads.obj'), 'w') as f:
+            f.write("# two quads\no quads\nv 0 0 0\nv 1 0 0\nv 1 1 0\n"
+                    "v 0 1 0\nv 2 0 0\nv 2 1 0\nvn 0 0 1\n"
+                    "f 1//1 2//1 3//1 4//1\nf -4 -2 -1 -3\n")
+        vertices, faces = meshio.read_obj(self.path('quads.obj'))
+        self.assertEqual(len(vertices), 6)
+        self.assertEqual(list(faces), [0, 1, 2, 0, 2, 3, 2, 4, 5, 2, 5, 3])
+
+    def test_ply_with_extra_properties(self):
+        header = ("ply\nformat binary_big_endian 1.0\ncomment test\n"
+                "element vertex 4\nproperty float x\nproperty float y\n"
+                "property float z\nproperty uchar red\n"
+                "element face 1\nproperty uchar flags\n"
+                "property list uchar int vertex_indices\nend_header\n")
+        with open(self.path('quad.ply'), 'wb') as f:
+            f.write(header.encode('ascii'))
+            for i, (x, y) in enumerate([(0, 0), (1, 0), (1, 1), (0, 1)]):
+                f.write(struct.pack('>3fB', x, y, 2, i))
+            f.write(struct.pack('>BB4i', 7, 4, 0, 1, 2, 3))
+        vertices, faces = meshio.read_ply(self.path('quad.ply'))
+        self.assertEqual(tuple(vertices[2]), (1, 1, 2))
+        self.assertEqual(list(faces), [0, 1, 2, 0, 2, 3])
+
+    def test_chunks(self):
+        for name in ('cube.obj', 'cube.ply', 'cube.stl'):
+            meshio.write_mesh(self.path(name), CUBE_VERTICES, CUBE_FACES)
+            chunks = list(meshio.iter_mesh(self.path(name), chunk_size=4))
+            self.assertTrue(len(chunks) > 2)
+            vertices, faces = meshio.read_mesh(self.path(name))
+            self.assertEqual(sum(len(v) for v, f in chunks), len(vertices))
+            self.assertEqual([i for v, f in chunks for i in f], list(faces))
+
+    def test_streaming_writer(self):
+        with meshio.mesh_writer(self.path('cube.ply')) as writer:
+            writer.write(CUBE_VERTICES[:4], CUBE_FACES[:6])
+            writer.write(CUBE_VERTICES[4:], CUBE_FACES[6:])
+        self.check_cube(*meshio.read_mesh(self.path('cube.ply')))
+        with meshio.mesh_writer(self.path('cube.stl')) as writer:
+            self.assertRaises(ValueError, writer.write, CUBE_VERTICES[:4],
+                    CUBE_FACES[6:9])
+
+    def test_transform_file(self):
+        meshio.write_mesh(self.path('cube.stl'), CUBE_VERTICES, CUBE_FACES)
+        move = Transform3d.translation((1, 2, 3))
+        meshio.transform_file(self.path('cube.stl'), self.path('moved.stl'),
+                move, chunk_size=5)
+        before, faces = meshio.read_mesh(self.path('cube.stl'))
+        after, moved_faces = meshio.read_mesh(self.path('moved.stl'))
+        self.assertEqual(list(faces), list(moved_faces))
+        self.assertEqual(after.asList(), move.apply(before).asList())
+
+    def test_mesh(self):
+        meshio.write_mesh(self.path('cube.ply'), CUBE_VERTICES, CUBE_FACES)
+        mesh = WingedEdgeMesh(*meshio.read_mesh(self.path('cube.ply')))
+        self.assertEqual(mesh.face_count(), 12)
+        self.assertTrue(mesh.is_closed())
+
+    def test_errors(self):
+        with open(self.path('bad.stl'), 'wb') as f:
+            f.write(b'solid ascii\nendsolid ascii\n')
+        self.assertRaises(meshio.MeshFormatError, meshio.read_stl,
+                self.path('bad.stl'))
+        self.assertRaises(meshio.MeshFormatError, meshio.read_mesh,
+                self.path('cube.xyz'))
+        for name in ('empty.stl', 'empty.ply'):
+            open(self.path(name), 'wb').close()
+            self.assertRaises(meshio.MeshFormatError, meshio.read_mesh,
+                    self.path(name))
+
+
+class TestMeshIOWithoutNumpy(TestMeshIO):
+
+    def setUp(self):
+        TestMeshIO.setUp(self)
+        self.numpy = meshio.numpy
+        for module in (meshio, vectors, transform):
+            module.numpy = None
+
+    def tearDown(self):
+        for module in (meshio, vectors, transform):
+            module.numpy = self.numpy
+        TestMeshIO.tearDown(self)
+
+
+if __name__ == '__main__':
+    unittest.main()
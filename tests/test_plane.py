@@ -0,0 +1,116 @@
+import unittest
+
+from geometry import plane, vectors
+from geometry import (Plane3d, PlaneSet, PointSet, Point3d, Vector3d,
+        Vector3dArray, Line3d, Tolerance)
+
+
+def cube_planes(size=1.0):
+    """the six planes around a cube centered on the origin, facing out"""
+    planes = []
+    for axis in range(3):
+        for sign in (1, -1):
+            normal = [0, 0, 0]
+            normal[axis] = sign
+            point = [0, 0, 0]
+            point[axis] = sign * size
+            planes.append(Plane3d(Point3d(*point), Vector3d(*normal)))
+    return PlaneSet(planes)
+
+
+class TestPlane3d(unittest.TestCase):
+
+    def setUp(self):
+        # z = 1, with a normal that is not a unit vector
+        self.plane = Plane3d(Point3d(0, 0, 1), Vector3d(0, 0, 2))
+        self.points = PointSet([(0, 0, 0), (1, 2, 3), (5, 5, 1)])
+
+    def test_single_point(self):
+        self.assertEqual(self.plane.signed_distance(Point3d(4, 4, 3)), 2)
+        self.assertEqual(self.plane.signed_distance(Point3d(0, 0, -1)), -2)
+        self.assertEqual(self.plane.project(Point3d(4, 5, 3)),
+                Point3d(4, 5, 1))
+        self.assertEqual(self.plane.side(Point3d(0, 0, 1.00000001)), 0)
+        self.assertEqual(self.plane.side(Point3d(0, 0, 0.9)), -1)
+        self.assertEqual(Point3d(3, 3, 4).distanceTo(self.plane), 3)
+        line = Line3d(Vector3d(0, 0, 5), Point3d(1, 1, 0))
+        self.assertAlmostEqual(Point3d(4, 5, 9).distanceTo(line), 5)
+
+    def test_many_points(self):
+        self.assertEqual(list(self.plane.signed_distance(self.points)),
+                [-1, 2, 0])
+        self.assertEqual(list(self.plane.side(self.points)), [-1, 1, 0])
+        projected = self.plane.project(self.points)
+        self.assertTrue(isinstance(projected, Vector3dArray))
+        self.assertEqual(projected.asList(), [Vector3d(0, 0, 1),
+            Vector3d(1, 2, 1), Vector3d(5, 5, 1)])
+        self.assertEqual(list(self.plane.side([(0, 0, 7), (0, 0, -7)])),
+                [1, -1])
+        tilted = Plane3d(Point3d(1, 2, 3), Point3d(2, 2, 4), Point3d(0, 5, 1))
+        for p in self.points:
+            self.assertAlmostEqual(tilted.signed_distance(tilted.project(p)),
+                    0)
+        self.assertEqual(list(tilted.side(tilted.project(self.points))),
+                [0, 0, 0])
+
+    def test_tolerance(self):
+        far = Plane3d(Point3d(0, 0, 1e9), Vector3d(0, 0, 1))
+        points = [(1e9, 1e9, 1e9 + 1e-5), (0, 0, 1e9 + 1e-2)]
+        self.assertEqual(list(far.side(points)), [1, 1])
+        with Tolerance(relative=1e-12):
+            self.assertEqual(list(far.side(points)), [0, 1])
+            self.assertEqual(far.side(Point3d(*points[0])), 0)
+            planes = PlaneSet([far])
+            self.assertEqual(list(planes.sides(points)[0]), [0, 1])
+            self.assertEqual(list(planes.contains(points)), [True, False])
+
+
+class TestPlaneSet(unittest.TestCase):
+
+    def setUp(self):
+        self.planes = cube_planes()
+        self.points = [(0, 0, 0), (0.5, -0.5, 0.9), (1, 1, 1), (2, 0, 0),
+                (0, 0, -1.5)]
+
+    def test_distances(self):
+        self.assertEqual(len(self.planes), 6)
+        distances = self.planes.signed_distances(self.points)
+        self.assertEqual(len(distances), 6)
+        self.assertEqual(list(distances[0]), [-1, -0.5, 0, 1, -1])
+        self.assertEqual(list(distances[5]), [-1, -1.9, -2, -1, 0.5])
+        sides = self.planes.sides(self.points)
+        self.assertEqual(list(sides[0]), [-1, -1, 0, 1, -1])
+        for plane, row in zip(self.planes, sides):
+            self.assertEqual(list(row), list(plane.side(self.points)))
+
+    def test_contains(self):
+        self.assertEqual(list(self.planes.contains(self.points)),
+                [True, True, True, False, False])
+        self.assertEqual(list(self.planes.contains([])), [])
+        self.assertEqual(list(PlaneSet().contains(self.points)), [True] * 5)
+
+
+class TestPlane3dWithoutNumpy(TestPlane3d):
+
+    def setUp(self):
+        self.numpy = plane.numpy
+        plane.numpy = vectors.numpy = None
+        TestPlane3d.setUp(self)
+
+    def tearDown(self):
+        plane.numpy = vectors.numpy = self.numpy
+
+
+class TestPlaneSetWithoutNumpy(TestPlaneSet):
+
+    def setUp(self):
+        self.numpy = plane.numpy
+        plane.numpy = vectors.numpy = None
+        TestPlaneSet.setUp(self)
+
+    def tearDown(self):
+        plane.numpy = vectors.numpy = self.numpy
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from geometry import pointfile, points, spatial, vectors
+from geometry import PointSet, PointFile, Point3d, Box3d
+
+
+class TestPointFile(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'points.bin')
+        random.seed(5)
+        self.points = PointSet([tuple(random.uniform(0, 10) for i in range(3))
+            for n in range(2000)])
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_round_trip(self):
+        pointfile.save(self.points, self.path)
+        with pointfile.load(self.path) as f:
+            self.assertEqual(len(f), 2000)
+            self.assertEqual(f.precision, 'float64')
+            self.assertTrue(f.has_index())
+            self.assertEqual(f[0], self.points[0])
+            self.assertEqual(f[-1], self.points[-1])
+            self.assertTrue(isinstance(f[5], Point3d))
+            self.assertEqual(list(f), self.points.pointList)
+            self.assertEqual(f[10:13].asList(), self.points.asArray()[10:13]
+                    .asList())
+            self.assertRaises(IndexError, f.__getitem__, 2000)
+            self.assertEqual(f.toPointSet().pointList, self.points.pointList)
+
+    def test_queries(self):
+        self.points.index
+        pointfile.save(self.points, self.path)
+        target = (5, 5, 5)
+        box = Box3d(2, 3, 4)
+        with PointFile(self.path) as f:
+            self.assertEqual(f.nearest(target, 5),
+                    self.points.nearest(target, 5))
+            self.assertEqual(f.within(target, 1.5),
+                    self.points.within(target, 1.5))
+            self.assertEqual(f.in_box(box), self.points.in_box(box))
+
+    def test_float32_without_index(self):
+        pointfile.save(self.points, self.path, precision='float32',
+                index=False)
+        size = os.path.getsize(self.path)
+        self.assertTrue(size < 2000 * 12 + 100)
+        with PointFile(self.path) as f:
+            self.assertEqual(f.precision, 'float32')
+            self.assertFalse(f.has_index())
+            self.assertTrue((f[7] - self.points[7]).length < 1e-5)
+            self.assertEqual(f.nearest((1, 1, 1))[0],
+                    self.points.nearest((1, 1, 1))[0])
+        pointfile.save(self.points, self.path, precision='float32')
+        with PointFile(self.path) as f:
+            brute = sorted(i for i, p in enumerate(f)
+                    if (p - Point3d(3, 3, 3)).length <= 2)
+            self.assertEqual(f.within((3, 3, 3), 2), brute)
+
+    def test_errors(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'x' * 100)
+        self.assertRaises(pointfile.PointFileError, PointFile, self.path)
+        self.assertRaises(pointfile.PointFileError, pointfile.save,
+                self.points, self.path, precision='float16')
+        open(self.path, 'wb').close()
+        self.assertRaises(pointfile.PointFileError, PointFile, self.path)
+        for index in (True, False):
+            pointfile.save(self.points, self.path, index=index)
+            with open(self.path, 'rb') as f:
+                data = f.read()
+            with open(self.path, 'wb') as f:
+                f.write(data[:-8])
+            self.assertRaises(pointfile.PointFileError, PointFile, self.path)
+
+    def test_slices(self):
+        # slices and chunks of float32 files only convert their own points
+        pointfile.save(self.points, self.path, precision='float32',
+                index=False)
+        with PointFile(self.path) as f:
+            part = f[100:103]
+            self.assertEqual(len(part), 3)
+            self.assertTrue((part[1] - self.points[101]).length < 1e-5)
+            self.assertEqual(len(f[1990:5000]), 10)
+            self.assertEqual(len(f[5:1:-1]), 4)
+            self.assertEqual(f[10:1:-3].asList(), [f[10], f[7], f[4]])
+            chunks = list(f.iter_chunks(300))
+            self.assertEqual([len(c) for c in chunks], [300] * 6 + [200])
+            self.assertEqual(chunks[-1][-1], f[-1])
+            self.assertEqual(len(list(f)), 2000)
+            self.assertTrue(f._array is None)
+
+
+class TestPointFileWithoutNumpy(TestPointFile):
+
+    def setUp(self):
+        self.numpy = pointfile.numpy
+        for module in (pointfile, points, spatial, vectors):
+            module.numpy = None
+        TestPointFile.setUp(self)
+
+    def tearDown(self):
+        for module in (pointfile, points, spatial, vectors):
+            module.numpy = self.numpy
+        TestPointFile.tearDown(self)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+import random
+
+from geometry import points, vectors
+from geometry import PointSet, Point3d
+from geometry.points import weld
+
+
+class TestPointSet(unittest.TestCase):
+
+    def test_unique_points(self):
+        s = PointSet([(0, 0, 0), (1, 2, 3), (0, 0, 0)])
+        self.assertEqual(len(s), 2)
+        self.assertEqual(s[(1, 2, 3)], 1)
+        self.assertTrue(Point3d(0, 0, 0) in s)
+        self.assertFalse((0, 0, 1e-9) in s)
+        self.assertFalse((1, 2) in s)
+        self.assertFalse(3 in s)
+        self.assertEqual(list(s.extend([(1, 2, 3), (4, 5, 6)])), [1, 2])
+        self.assertEqual(s.append((0, 0, 0)), 0)
+        self.assertEqual(len(s), 3)
+
+    def test_tolerance(self):
+        s = PointSet([(0, 0, 0), (1e-9, 0, 0), (1, 1, 1)], tolerance=1e-6)
+        self.assertEqual(len(s), 2)
+        self.assertEqual(s[(1.0000001, 1, 0.9999999)], 1)
+        self.assertTrue((0, 5e-7, 0) in s)
+        self.assertFalse((0, 2e-6, 0) in s)
+        self.assertEqual(s.append((-1e-7, -1e-7, -1e-7)), 0)
+        self.assertEqual(s.copy().tolerance, 1e-6)
+        self.assertFalse((1, 1) in s)
+        # a tolerance set later still finds the points already in the set
+        later = PointSet([(0, 0, 0), (1, 1, 1)])
+        later.tolerance = 1e-6
+        self.assertTrue((1, 1, 1.0000001) in later)
+        self.assertEqual(later.append((1e-7, 0, 0)), 0)
+        self.assertEqual(len(later), 2)
+
+    def test_weld(self):
+        random.seed(3)
+        base = [tuple(random.uniform(-10, 10) for i in range(3))
+                for n in range(500)]
+        noisy = [tuple(c + random.uniform(-1e-5, 1e-5) for c in p)
+                for p in base]
+        welded, remap = weld(base + noisy, 1e-3)
+        self.assertEqual(len(welded), 500)
+        self.assertEqual(list(remap), list(range(500)) * 2)
+        # faces can be remapped in bulk
+        faces = [(0, 500, 1), (501, 2, 502)]
+        self.assertEqual([[remap[i] for i in f] for f in faces],
+                [[0, 0, 1], [1, 2, 2]])
+
+
+class TestPointSetWithoutNumpy(TestPointSet):
+
+    def setUp(self):
+        self.numpy = points.numpy
+        points.numpy = vectors.numpy = None
+
+    def tearDown(self):
+        points.numpy = vectors.numpy = self.numpy
+
+
+class TestSetAlgebra(unittest.TestCase):
+
+    def setUp(self):
+        self.a = PointSet([(0, 0, 0), (1, 0, 0), (2, 0, 0), (3, 0, 0)])
+        self.b = PointSet([(3, 0, 0), (4, 0, 0), (-0.0, 0, 0), (5, 0, 0)])
+
+    def xs(self, pointset):
+        return [p.x for p in pointset]
+
+    def test_operators(self):
+        self.assertEqual(self.xs(self.a | self.b), [0, 1, 2, 3, 4, 5])
+        self.assertEqual(self.xs(self.a & self.b), [3, 0])
+        self.assertEqual(self.xs(self.a - self.b), [1, 2])
+        self.assertEqual(self.xs(self.a ^ self.b), [1, 2, 4, 5])
+        self.assertEqual((self.a | self.b)[(5, 0, 0)], 5)
+
+    def test_indices(self):
+        result, mine, theirs = self.a.union(self.b, return_indices=True)
+        self.assertEqual((list(mine), list(theirs)), ([0, 1, 2, 3], [1, 3]))
+        result, mine, theirs = self.a.intersection(self.b, True)
+        self.assertEqual((list(mine), list(theirs)), ([3, 0], [0, 2]))
+        result, mine, theirs = self.a.difference(self.b, True)
+        self.assertEqual((list(mine), list(theirs)), ([1, 2], []))
+        result, mine, theirs = self.a.symmetric_difference(self.b, True)
+        self.assertEqual((list(mine), list(theirs)), ([1, 2], [1, 3]))
+
+    def test_raw_coordinates(self):
+        coords = [(9, 0, 0), (1, 0, 0), (9, 0, 0)]
+        result, mine, theirs = self.a.union(coords, return_indices=True)
+        self.assertEqual(self.xs(result), [0, 1, 2, 3, 9])
+        self.assertEqual(list(theirs), [0])
+        self.assertEqual(self.xs(self.a & coords), [1])
+
+
+class TestSetAlgebraWithoutNumpy(TestSetAlgebra):
+
+    def setUp(self):
+        self.numpy = points.numpy
+        points.numpy = vectors.numpy = None
+        TestSetAlgebra.setUp(self)
+
+    def tearDown(self):
+        points.numpy = vectors.numpy = self.numpy
@@ -0,0 +1,133 @@
+import random
+import unittest
+from fractions import Fraction
+
+from geometry import predicates, vectors
+from geometry.predicates import (orient2d, orient3d, incircle, insphere,
+        orient2d_batch, orient3d_batch, incircle_batch, insphere_batch)
+
+
+def exact_orient2d(a, b, c):
+    a, b, c = [[Fraction(v) for v in p] for p in (a, b, c)]
+    return (a[0] - c[0]) * (b[1] - c[1]) - (a[1] - c[1]) * (b[0] - c[0])
+
+
+def determinant(rows):
+    """an exact determinant by cofactor expansion"""
+    if len(rows) == 1:
+        return rows[0][0]
+    return sum((-1) ** j * rows[0][j] * determinant([row[:j] + row[j + 1:]
+        for row in rows[1:]]) for j in range(len(rows)))
+
+
+def exact_orient3d(a, b, c, d):
+    d = [Fraction(v) for v in d]
+    return determinant([[Fraction(v) - w for v, w in zip(p, d)]
+        for p in (a, b, c)])
+
+
+def exact_incircle(a, b, c, d):
+    d = [Fraction(v) for v in d]
+    rows = [[Fraction(v) - w for v, w in zip(p, d)] for p in (a, b, c)]
+    return determinant([row + [row[0] ** 2 + row[1] ** 2] for row in rows])
+
+
+def exact_insphere(a, b, c, d, e):
+    e = [Fraction(v) for v in e]
+    rows = [[Fraction(v) - w for v, w in zip(p, e)] for p in (a, b, c, d)]
+    return determinant([row + [sum(v * v for v in row)] for row in rows])
+
+
+def sign(value):
+    value = float(value)
+    return (value > 0) - (value < 0)
+
+
+class TestPredicates(unittest.TestCase):
+
+    def test_orient2d(self):
+        self.assertTrue(orient2d((0, 0), (1, 0), (0, 1)) > 0)
+        self.assertTrue(orient2d((0, 0), (0, 1), (1, 0)) < 0)
+        self.assertEqual(orient2d((0, 0), (1, 1), (3, 3)), 0)
+        # a grid of nearly collinear points, many of which plain floating
+        # point gets wrong
+        b, c = (12.0, 12.0), (24.0, 24.0)
+        wrong = 0
+        for i in range(32):
+            for j in range(32):
+                a = (0.5 + i * 2.0 ** -53, 0.5 + j * 2.0 ** -53)
+                expected = sign(exact_orient2d(a, b, c))
+                self.assertEqual(sign(orient2d(a, b, c)), expected)
+                naive = ((a[0] - c[0]) * (b[1] - c[1]) -
+                        (a[1] - c[1]) * (b[0] - c[0]))
+                wrong += sign(naive) != expected
+        self.assertTrue(wrong > 0)
+
+    def test_orient3d(self):
+        a, b, c = (0, 0, 0), (1, 0, 0), (0, 1, 0)
+        self.assertTrue(orient3d(a, b, c, (0, 0, -1)) > 0)
+        self.assertTrue(orient3d(a, b, c, (0, 0, 1)) < 0)
+        self.assertEqual(orient3d(a, b, c, (5, 7, 0)), 0)
+        # points very close to the plane x + y + z = 1.5
+        b, c, d = (1.5, 0.0, 0.0), (0.0, 1.5, 0.0), (0.0, 0.0, 1.5)
+        for i in range(-16, 16):
+            for j in range(-16, 16):
+                a = (0.5 + i * 2.0 ** -53, 0.5 + j * 2.0 ** -53, 0.5)
+                self.assertEqual(sign(orient3d(a, b, c, d)),
+                        sign(exact_orient3d(a, b, c, d)))
+
+    def test_incircle(self):
+        a, b, c = (1, 0), (0, 1), (-1, 0)
+        self.assertTrue(incircle(a, b, c, (0, 0)) > 0)
+        self.assertTrue(incircle(a, b, c, (2, 2)) < 0)
+        self.assertEqual(incircle(a, b, c, (0, -1)), 0)
+        a, b, c = (0.6, 0.8), (-0.8, 0.6), (-0.6, -0.8)
+        for i in range(-16, 16):
+            for j in range(-16, 16):
+                d = (0.8 + i * 2.0 ** -52, -0.6 + j * 2.0 ** -52)
+                self.assertEqual(sign(incircle(a, b, c, d)),
+                        sign(exact_incircle(a, b, c, d)))
+
+    def test_insphere(self):
+        a, b, c, d = (1, 0, 0), (0, 1, 0), (-1, 0, 0), (0, 0, 1)
+        if orient3d(a, b, c, d) < 0:
+            a, b = b, a
+        self.assertTrue(insphere(a, b, c, d, (0, 0, 0)) > 0)
+        self.assertTrue(insphere(a, b, c, d, (0, 3, 0)) < 0)
+        self.assertEqual(insphere(a, b, c, d, (0, 0, -1)), 0)
+        for i in range(-8, 8):
+            for j in range(-8, 8):
+                e = (0.6 + i * 2.0 ** -52, 0.8 + j * 2.0 ** -52, 0.0)
+                self.assertEqual(sign(insphere(a, b, c, d, e)),
+                        sign(exact_insphere(a, b, c, d, e)))
+
+    def test_batch(self):
+        random.seed(6)
+        def points(dim, count=200):
+            # a coarse grid, so that many of the sets are degenerate
+            return [tuple(random.randint(0, 3) * 0.1 for k in range(dim))
+                    for n in range(count)]
+        for predicate, batch, dim, size in (
+                (orient2d, orient2d_batch, 2, 3),
+                (orient3d, orient3d_batch, 3, 4),
+                (incircle, incircle_batch, 2, 4),
+                (insphere, insphere_batch, 3, 5)):
+            groups = [points(dim) for k in range(size)]
+            expected = [sign(predicate(*row)) for row in zip(*groups)]
+            self.assertEqual([sign(v) for v in batch(*groups)], expected)
+            self.assertTrue(0 in expected)
+        self.assertEqual(len(orient2d_batch([], [], [])), 0)
+
+
+class TestPredicatesWithoutNumpy(TestPredicates):
+
+    def setUp(self):
+        self.numpy = predicates.numpy
+        predicates.numpy = vectors.numpy = None
+
+    def tearDown(self):
+        predicates.numpy = vectors.numpy = self.numpy
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+
+from geometry import sparse, vectors
+from geometry import (SparseMatrix, Matrix, MatrixError, Vector3dArray,
+        PointSet)
+
+
+def path_laplacian(size, shift=0.1):
+    """a symmetric positive definite matrix: the Laplacian of a path graph,
+    plus a small shift on the diagonal"""
+    rows, cols, values = [], [], []
+    for i in range(size - 1):
+        for a, b in ((i, i + 1), (i + 1, i)):
+            rows += [a, a]
+            cols += [b, a]
+            values += [-1.0, 1.0]
+    for i in range(size):
+        rows.append(i)
+        cols.append(i)
+        values.append(shift)
+    return SparseMatrix.from_triplets(rows, cols, values)
+
+
+class TestSparseMatrix(unittest.TestCase):
+
+    def setUp(self):
+        self.m = SparseMatrix.from_triplets(
+                [0, 1, 2, 0, 2, 0], [0, 2, 1, 2, 1, 0],
+                [1.0, 2.0, 3.0, 4.0, 5.0, 1.0])
+
+    def test_construction(self):
+        self.assertEqual(self.m.shape, (3, 3))
+        self.assertEqual(self.m.nnz, 4)
+        self.assertEqual(self.m.to_dense().table, ((2, 0, 4), (0, 0, 2),
+            (0, 8, 0)))
+        self.assertEqual(self.m.transpose().to_dense().table,
+                self.m.to_dense().transpose().table)
+        self.assertEqual(list(self.m.diagonal()), [2, 0, 0])
+        dense = Matrix([[0, 1], [2, 0], [0, 0]])
+        self.assertEqual(SparseMatrix.from_dense(dense).to_dense().table,
+                dense.table)
+        self.assertRaises(MatrixError, SparseMatrix.from_triplets, [3], [0],
+                [1.0], (3, 3))
+
+    def test_products(self):
+        self.assertEqual(list(self.m.dot([1, 2, 3])), [14, 6, 16])
+        points = Vector3dArray([(1, 0, 0), (0, 1, 0), (0, 0, 1)])
+        self.assertEqual((self.m * points).asList(),
+                Vector3dArray([(2, 0, 4), (0, 0, 2), (0, 8, 0)]).asList())
+        product = self.m * Matrix([[1], [1], [1]])
+        self.assertEqual(product.table, ((6,), (2,), (8,)))
+        self.assertEqual(list((self.m * 2).dot([1, 0, 0])), [4, 0, 0])
+        self.assertEqual(list((2 * self.m).dot([1, 0, 0])), [4, 0, 0])
+        self.assertRaises(TypeError, lambda: [1, 2, 3] * self.m)
+        # point sets give vector arrays, as points could be merged
+        moved = self.m * PointSet([(1, 0, 0), (0, 1, 0), (0, 0, 1)])
+        self.assertTrue(isinstance(moved, Vector3dArray))
+        self.assertEqual(moved.asList(), (self.m * points).asList())
+        self.assertRaises(MatrixError, self.m.dot, [1, 2])
+
+    def test_conjugate_gradient(self):
+        m = path_laplacian(50)
+        expected = Vector3dArray([(i, i * i / 50.0, 1.0) for i in range(50)])
+        b = m * expected
+        x = m.cg(b, tolerance=1e-12)
+        for v, w in zip(x, expected):
+            for c, d in zip(v, w):
+                self.assertAlmostEqual(c, d, places=6)
+        single = m.cg(m.dot([1.0] * 50))
+        for c in single:
+            self.assertAlmostEqual(c, 1.0, places=6)
+        self.assertRaises(MatrixError, m.cg, b, max_iterations=3)
+
+
+class TestSparseMatrixWithoutNumpy(TestSparseMatrix):
+
+    def setUp(self):
+        self.numpy = sparse.numpy
+        sparse.numpy = vectors.numpy = None
+        TestSparseMatrix.setUp(self)
+
+    def tearDown(self):
+        sparse.numpy = vectors.numpy = self.numpy
@@ -0,0 +1,183 @@
+import unittest
+import random
+
+from geometry import spatial, vectors
+from geometry import PointSet, Box3d
+from geometry.spatial import KDTree, BVH
+
+
+def squared_distance(a, b):
+    return sum((c - d) ** 2 for c, d in zip(a, b))
+
+
+class TestKDTree(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(5)
+        self.coords = [tuple(random.uniform(-50, 50) for i in range(3))
+                for n in range(2000)]
+        self.queries = [tuple(random.uniform(-60, 60) for i in range(3))
+                for n in range(20)]
+
+    def brute_nearest(self, coords, point, k):
+        found = sorted((squared_distance(p, point), i)
+                for i, p in enumerate(coords))
+        return [i for d, i in found[:k]]
+
+    def brute_within(self, coords, point, radius):
+        return [i for i, p in enumerate(coords)
+                if squared_distance(p, point) <= radius * radius]
+
+    def test_tree_queries(self):
+        tree = KDTree(self.coords, leafsize=8)
+        self.assertEqual(len(tree), 2000)
+        for q in self.queries:
+            found = tree.nearest(q, 4)
+            self.assertEqual([i for d, i in found],
+                    self.brute_nearest(self.coords, q, 4))
+            self.assertAlmostEqual(found[0][0],
+                    squared_distance(self.coords[found[0][1]], q))
+            self.assertEqual(tree.within(q, 15.0),
+                    self.brute_within(self.coords, q, 15.0))
+        bounds = [(-10, 20), (0, 50), (-50, 0)]
+        self.assertEqual(tree.in_box(bounds), [i for i, p in
+            enumerate(self.coords)
+            if all(s <= c < e for c, (s, e) in zip(p, bounds))])
+        self.assertEqual(KDTree([]).nearest((0, 0, 0)), [])
+
+    def test_pointset_queries(self):
+        points = PointSet(self.coords[:1500])
+        q = self.queries[0]
+        self.assertEqual(points.nearest(q, 3),
+                self.brute_nearest(self.coords[:1500], q, 3))
+        # points added after the index is built are still found
+        points.extend(self.coords[1500:])
+        for q in self.queries:
+            self.assertEqual(points.nearest(q, 3),
+                    self.brute_nearest(self.coords, q, 3))
+            self.assertEqual(points.within(q, 20.0),
+                    self.brute_within(self.coords, q, 20.0))
+        points.append((0.0, 0.0, 0.0))
+        self.assertEqual(points.nearest((0.1, 0.0, 0.0)), [2000])
+        box = Box3d(30, 30, 30)
+        self.assertEqual(points.in_box(box), [i for i, p in
+            enumerate(points) if all(0 <= c < 30 for c in p)])
+
+
+class TestKDTreeWithoutNumpy(TestKDTree):
+
+    def setUp(self):
+        self.numpy = spatial.numpy
+        spatial.numpy = vectors.numpy = None
+        TestKDTree.setUp(self)
+
+    def tearDown(self):
+        spatial.numpy = vectors.numpy = self.numpy
+
+
+def overlap(a, b):
+    return all(s < oe and os < e for s, e, os, oe in zip(
+        a[0], a[1], b[0], b[1]))
+
+
+def random_boxes(count, size):
+    lowers = [tuple(random.uniform(0, 10) for i in range(3))
+            for n in range(count)]
+    uppers = [tuple(c + random.uniform(0, size) for c in p) for p in lowers]
+    return lowers, uppers
+
+
+class TestBVH(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(9)
+        self.lowers, self.uppers = random_boxes(500, 1.0)
+        # a few boxes that can't be split apart
+        self.lowers[:12] = [self.lowers[0]] * 12
+        self.uppers[:12] = [self.uppers[0]] * 12
+        self.boxes = list(zip(self.lowers, self.uppers))
+
+    def brute_pairs(self, boxes):
+        return [(i, j) for i in range(len(boxes))
+                for j in range(i + 1, len(boxes))
+                if overlap(boxes[i], boxes[j])]
+
+    def test_box_queries(self):
+        tree = BVH((self.lowers, self.uppers), leafsize=3, bins=8)
+        self.assertEqual(len(tree), 500)
+        self.assertEqual(sorted(tree.order), list(range(500)))
+        queries = list(zip(*random_boxes(30, 3.0)))
+        found = tree.overlapping_many(([q[0] for q in queries],
+            [q[1] for q in queries]))
+        self.assertEqual(list(zip(*found)), [(q, i)
+            for q, query in enumerate(queries)
+            for i, box in enumerate(self.boxes) if overlap(query, box)])
+        box = Box3d.fromCorners(*queries[0])
+        self.assertEqual(tree.overlapping(box), [i for i, b in
+            enumerate(self.boxes) if overlap(queries[0], b)])
+        # boxes that only touch don't overlap
+        lower, upper = self.boxes[0]
+        touching = ((upper[0],) + lower[1:], (upper[0] + 1.0,) + upper[1:])
+        found = tree.overlapping(Box3d.fromCorners(*touching))
+        self.assertFalse(set(found) & set(range(12)))
+        self.assertEqual(found, [i for i, b in enumerate(self.boxes)
+            if overlap(touching, b)])
+
+    def test_rays(self):
+        tree = BVH(([box.lower for box in self.box_objects()],
+            self.uppers))
+        origin, direction = (-1.0, 5.0, 5.0), (1.0, 0.0, 0.0)
+        expected = sorted((max(0.0, l[0] + 1.0), i) for i, (l, u) in
+                enumerate(self.boxes) if l[1] <= 5 <= u[1] and
+                l[2] <= 5 <= u[2])
+        found = tree.ray(origin, direction)
+        self.assertEqual([i for t, i in found], [i for t, i in expected])
+        for (t, i), (s, j) in zip(found, expected):
+            self.assertAlmostEqual(t, s)
+        near = tree.ray(origin, direction, limit=4.0)
+        self.assertEqual(near, [hit for hit in found if hit[0] <= 4.0])
+        rays, hits, entries = tree.rays([origin, (5.0, 5.0, 5.0)],
+                [direction, (0.0, 0.0, -1.0)])
+        self.assertEqual([i for r, i in zip(rays, hits) if r == 1],
+                [i for i, (l, u) in enumerate(self.boxes) if
+                    l[0] <= 5 <= u[0] and l[1] <= 5 <= u[1] and l[2] <= 5])
+
+    def box_objects(self):
+        return [Box3d.fromCorners(l, u) for l, u in self.boxes]
+
+    def test_pairs_and_refit(self):
+        tree = BVH(self.box_objects(), leafsize=2)
+        i, j = tree.pairs()
+        self.assertEqual(list(zip(i, j)), self.brute_pairs(self.boxes))
+        # move every box, and refit the tree instead of building a new one
+        lowers = [tuple(c + random.uniform(-2, 2) for c in p)
+                for p in self.lowers]
+        uppers = [tuple(c + s - l for c, s, l in zip(p, u, q))
+                for p, u, q in zip(lowers, self.uppers, self.lowers)]
+        starts = list(tree.starts)
+        tree.refit((lowers, uppers))
+        self.assertEqual(list(tree.starts), starts)
+        moved = list(zip(lowers, uppers))
+        i, j = tree.pairs()
+        self.assertEqual(list(zip(i, j)), self.brute_pairs(moved))
+        self.assertEqual(tree.overlapping(Box3d.fromCorners(*moved[7])),
+                [k for k, box in enumerate(moved) if overlap(moved[7], box)])
+        self.assertRaises(ValueError, tree.refit, (lowers[1:], uppers[1:]))
+
+    def test_empty(self):
+        tree = BVH(([], []))
+        self.assertEqual(len(tree), 0)
+        self.assertEqual(tree.overlapping(Box3d()), [])
+        self.assertEqual(tree.ray((0, 0, 0), (1, 1, 1)), [])
+        self.assertEqual(len(tree.pairs()[0]), 0)
+
+
+class TestBVHWithoutNumpy(TestBVH):
+
+    def setUp(self):
+        self.numpy = spatial.numpy
+        spatial.numpy = vectors.numpy = None
+        TestBVH.setUp(self)
+
+    def tearDown(self):
+        spatial.numpy = vectors.numpy = self.numpy
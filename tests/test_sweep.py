@@ -0,0 +1,80 @@
+import random
+import unittest
+
+from geometry import LineSegment2d, Point2d
+from geometry.predicates import orient2d
+from geometry.sweep import find_intersections
+
+
+def brute_force(segments):
+    """all the pairs of segments that touch, checked one pair at a time"""
+    pairs = set()
+    for i, (a, b) in enumerate(segments):
+        for j in range(i + 1, len(segments)):
+            c, d = segments[j]
+            o1, o2 = orient2d(a, b, c), orient2d(a, b, d)
+            o3, o4 = orient2d(c, d, a), orient2d(c, d, b)
+            if o1 == o2 == o3 == o4 == 0:
+                # collinear (or points): compare the projections on both axes
+                if all(max(min(a[k], b[k]), min(c[k], d[k])) <=
+                        min(max(a[k], b[k]), max(c[k], d[k]))
+                        for k in (0, 1)):
+                    pairs.add((i, j))
+            elif o1 * o2 <= 0 and o3 * o4 <= 0:
+                pairs.add((i, j))
+    return pairs
+
+
+class TestFindIntersections(unittest.TestCase):
+
+    def pairs(self, segments):
+        found = find_intersections(segments)
+        pairs = set((i, j) for i, j, p in found)
+        self.assertEqual(len(pairs), len(found))
+        return pairs
+
+    def test_crossing(self):
+        segments = [LineSegment2d(Point2d(0, 0), Point2d(4, 4)),
+                LineSegment2d(Point2d(0, 4), Point2d(4, 0)),
+                LineSegment2d(Point2d(5, 0), Point2d(5, 9))]
+        self.assertEqual(find_intersections(segments),
+                [(0, 1, Point2d(2, 2))])
+        self.assertEqual(find_intersections([]), [])
+
+    def test_exact_crossing(self):
+        found = find_intersections([((0, 0), (3, 1)), ((0, 1), (3, 0))])
+        self.assertEqual(found, [(0, 1, Point2d(1.5, 0.5))])
+        found = find_intersections([((0.1, 0.2), (0.7, 0.3)),
+            ((0.3, 0.0), (0.4, 0.9))])
+        point = found[0][2]
+        # where y = 0.2 + (x - 0.1) / 6 meets y = 9 * (x - 0.3)
+        self.assertAlmostEqual(point.x, 2.8833333333333333 / (9 - 1 / 6.0))
+        self.assertAlmostEqual(point.y, 9 * (point.x - 0.3))
+
+    def test_degenerate(self):
+        # a star of segments through one point, a vertical segment through
+        # it, shared endpoints and a collinear overlap
+        segments = [((0, 0), (2, 2)), ((0, 2), (2, 0)), ((1, 0), (1, 3)),
+                ((0, 1), (2, 1)), ((2, 2), (3, 0)), ((2, 1), (3, 1)),
+                ((2.5, 1), (4, 1)), ((1, 1), (1, 1))]
+        found = find_intersections(segments)
+        for i, j, point in found:
+            if point == Point2d(1, 1):
+                self.assertTrue(i in (0, 1, 2, 3, 7))
+        self.assertEqual(self.pairs(segments), brute_force(segments))
+
+    def test_random(self):
+        random.seed(4)
+        for trial in range(100):
+            size = random.choice([3, 4, 1000])
+            segments = [tuple((random.randint(0, size), random.randint(0,
+                size)) for k in range(2)) for n in range(random.randint(1,
+                    25))]
+            self.assertEqual(self.pairs(segments), brute_force(segments))
+        segments = [((random.random(), random.random()),
+            (random.random(), random.random())) for n in range(60)]
+        self.assertEqual(self.pairs(segments), brute_force(segments))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import threading
+
+from geometry import core
+from geometry.core import (Tolerance, current_tolerance, is_close, is_zero,
+        isRoughlyZero, DEFAULT_TOLERANCE)
+
+
+class TestTolerance(unittest.TestCase):
+
+    def test_default(self):
+        self.assertIs(current_tolerance(), DEFAULT_TOLERANCE)
+        self.assertTrue(isRoughlyZero(1e-8))
+        self.assertFalse(isRoughlyZero(1e-6))
+        self.assertTrue(is_close(1.0, 1.0 + 1e-9))
+        # an absolute tolerance says nothing at large magnitudes
+        self.assertFalse(is_close(1e12, 1e12 + 1e-3))
+
+    def test_relative(self):
+        tolerance = Tolerance(relative=1e-9)
+        self.assertTrue(tolerance.is_close(1e12, 1e12 + 1e-3))
+        self.assertFalse(tolerance.is_close(1.0, 1.0 + 1e-6))
+        self.assertFalse(tolerance.is_zero(1e-12))
+        self.assertTrue(tolerance.is_zero(1e-12, scale=1e4))
+
+    def test_ulps(self):
+        tolerance = Tolerance(ulps=4)
+        x = 0.1 + 0.2
+        self.assertTrue(tolerance.is_close(x, 0.3))
+        self.assertFalse(tolerance.is_close(1.0, 1.0 + 1e-12))
+        self.assertTrue(tolerance.is_close(1e300, 1e300 * (1 + 4e-16)))
+        self.assertEqual(core._ulp(1.0), 2.0 ** -52)
+
+    def test_context(self):
+        with Tolerance(absolute=1e-3) as tolerance:
+            self.assertIs(current_tolerance(), tolerance)
+            self.assertTrue(isRoughlyZero(1e-4))
+            with Tolerance(absolute=0.0):
+                self.assertFalse(isRoughlyZero(1e-300))
+            self.assertIs(current_tolerance(), tolerance)
+        self.assertIs(current_tolerance(), DEFAULT_TOLERANCE)
+
+    def test_thread_local(self):
+        seen = []
+        with Tolerance(absolute=1.0):
+            thread = threading.Thread(
+                    target=lambda: seen.append(current_tolerance()))
+            thread.start()
+            thread.join()
+        self.assertEqual(seen, [DEFAULT_TOLERANCE])
+
+    def test_arrays(self):
+        values = [0.0, 1e-9, -1e-9, 1e-3, -1.0]
+        self.assertEqual(list(is_zero(values)),
+                [True, True, True, False, False])
+        self.assertEqual(list(is_close([1.0, 2.0, 3.0], [1.0, 2.1, 3.0])),
+                [True, False, True])
+        self.assertEqual(list(is_close([1.0, 2.0], 2.0)), [False, True])
+        tolerance = Tolerance(relative=1e-6)
+        self.assertEqual(list(is_zero([1e-3, 1e-3], [1e4, 1.0],
+            tolerance=tolerance)), [True, False])
+        self.assertEqual(list(is_close([1e9, 1.0], [1e9 + 1, 1.001],
+            tolerance=tolerance)), [True, False])
+
+
+class TestToleranceWithoutNumpy(TestTolerance):
+
+    def setUp(self):
+        self.numpy = core.numpy
+        core.numpy = None
+
+    def tearDown(self):
+        core.numpy = self.numpy
@@ -0,0 +1,100 @@
+import unittest
+import math
+
+from geometry import transform, vectors
+from geometry import (Transform2d, Transform3d, Point2d, Point3d, Vector2d,
+        Vector3d, Vector3dArray, PointSet, Matrix, MatrixError)
+
+
+class TestTransform3d(unittest.TestCase):
+
+    def assertCoordsAlmostEqual(self, a, b):
+        for c, d in zip(a, b):
+            self.assertAlmostEqual(c, d)
+
+    def test_points_and_vectors(self):
+        move = Transform3d.translation((1, 2, 3))
+        self.assertCoordsAlmostEqual(move * Point3d(1, 1, 1), (2, 3, 4))
+        self.assertIsInstance(move * Point3d(1, 1, 1), Point3d)
+        # vectors are not translated
+        self.assertCoordsAlmostEqual(move * Vector3d(1, 1, 1), (1, 1, 1))
+        turn = Transform3d.rotation((0, 0, 1), math.pi / 2)
+        self.assertCoordsAlmostEqual(turn * Point3d(1, 0, 5), (0, 1, 5))
+        turn = Transform3d.rotation((0, 0, 2), math.pi, center=(1, 1, 0))
+        self.assertCoordsAlmostEqual(turn * Point3d(2, 1, 0), (0, 1, 0))
+        grow = Transform3d.scaling(2, center=(1, 1, 1))
+        self.assertCoordsAlmostEqual(grow * Point3d(2, 2, 2), (3, 3, 3))
+
+    def test_composition(self):
+        a = Transform3d.translation((1, 0, 0))
+        b = Transform3d.rotation((0, 0, 1), math.pi / 2)
+        c = Transform3d.scaling(1, 2, 3)
+        chain = a.then(b).then(c)
+        p = Point3d(1, 2, 3)
+        self.assertCoordsAlmostEqual(chain * p, c * (b * (a * p)))
+        self.assertCoordsAlmostEqual(chain.inverse() * (chain * p), p)
+        product = chain.asMatrix() * Matrix([[1], [2], [3], [1]])
+        self.assertCoordsAlmostEqual([r[0] for r in product][:3], chain * p)
+        self.assertEqual(Transform3d(chain.asMatrix()), chain)
+        self.assertAlmostEqual(chain.determinant(), 6)
+        self.assertRaises(MatrixError, Transform3d.scaling(0).inverse)
+
+    def test_apply(self):
+        chain = Transform3d.rotation((1, 1, 0), 0.3).then(
+                Transform3d.translation((4, 5, 6)))
+        coords = [(1, 2, 3), (-1, 0, 2), (0, 0, 0)]
+        moved = chain.apply(coords)
+        self.assertIsInstance(moved, Vector3dArray)
+        for p, q in zip(coords, moved):
+            self.assertCoordsAlmostEqual(q, chain * Point3d(*p))
+        for v, w in zip(coords, chain.apply_vectors(coords)):
+            self.assertCoordsAlmostEqual(w, chain * Vector3d(*v))
+        points = chain.apply(PointSet(coords))
+        self.assertIsInstance(points, PointSet)
+        self.assertCoordsAlmostEqual(points[2], (4, 5, 6))
+
+
+class TestTransform2d(unittest.TestCase):
+
+    def test_transform2d(self):
+        chain = Transform2d.rotation(math.pi / 2, center=(1, 0)).then(
+                Transform2d.scaling(2, 3))
+        p = chain * Point2d(2, 0)
+        self.assertAlmostEqual(p.x, 2)
+        self.assertAlmostEqual(p.y, 3)
+        v = chain * Vector2d(1, 0)
+        self.assertAlmostEqual(v.x, 0)
+        self.assertAlmostEqual(v.y, 3)
+        back = chain.inverse() * p
+        self.assertAlmostEqual(back.x, 2)
+        self.assertAlmostEqual(back.y, 0)
+        moved = list(chain.apply([(2, 0), (1, 1)]))
+        self.assertAlmostEqual(moved[1].x, -0.0)
+        self.assertAlmostEqual(moved[1].y, 0.0)
+        self.assertEqual(Transform2d(chain.asMatrix()), chain)
+
+    def test_3d_input(self):
+        shift = Transform2d.translation((10, 0))
+        points = PointSet([(1, 2, 3), (4, 5, 6)])
+        self.assertRaises(ValueError, shift.apply, points)
+        self.assertRaises(ValueError, shift.apply_vectors,
+                Vector3dArray([(1, 2, 3), (4, 5, 6)]))
+        self.assertRaises(ValueError, shift.apply, Point3d(1, 2, 3))
+        # lists of 3d points, whose coordinates add up to whole 2d rows
+        self.assertRaises(ValueError, shift.apply, [Point3d(1, 2, 3),
+            Point3d(4, 5, 6)])
+        self.assertRaises(ValueError, shift.apply_vectors, [(1, 2, 3),
+            (4, 5, 6)])
+        self.assertRaises(TypeError, lambda: shift * Point3d(1, 2, 3))
+        self.assertEqual(list(shift.apply([(1, 2), (4, 5)])),
+                [Vector2d(11, 2), Vector2d(14, 5)])
+
+
+class TestTransformWithoutNumpy(TestTransform3d, TestTransform2d):
+
+    def setUp(self):
+        self.numpy = transform.numpy
+        transform.numpy = vectors.numpy = None
+
+    def tearDown(self):
+        transform.numpy = vectors.numpy = self.numpy
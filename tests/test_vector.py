@@ -120,7 +120,16 @@ class TestVectors(unittest.TestCase):
 class TestPoints(TestVectors):
 
     def test_point_constructor(self):
-        pass
+        p = Point3d(1, 2, 3)
+        self.assertEqual(p.coords, (1, 2, 3))
+        self.assertEqual(Point2d(y=4).coords, (0.0, 4))
+        self.assertEqual(len(self.gen.point().coords), 3)
+        self.assertEqual(p - Point3d(1, 1, 1), Point3d(0, 1, 2))
+
+    def test_slots(self):
+        for v in (Vector2d(), Vector3d(), Point2d(), Point3d()):
+            self.assertFalse(hasattr(v, '__dict__'))
+            self.assertRaises(AttributeError, setattr, v, 'w', 1.0)
 
     def test_point_operators(self):
         pass
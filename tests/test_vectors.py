@@ -0,0 +1,89 @@
+import unittest
+import math
+
+from geometry import vectors
+from geometry import (Vector2d, Vector3d, Vector2dArray, Vector3dArray,
+        PointSet)
+
+
+class TestVectorArrays(unittest.TestCase):
+
+    def setUp(self):
+        self.coords = [(1.0, 0.0, 0.0), (0.0, 2.0, 0.0), (3.0, 4.0, 0.0)]
+        self.others = [(0.0, 1.0, 0.0), (0.0, 0.0, 1.0), (1.0, 1.0, 1.0)]
+        self.a = Vector3dArray(Vector3d(*c) for c in self.coords)
+        self.b = Vector3dArray(self.others)
+
+    def assertVectorsAlmostEqual(self, array, vectors):
+        self.assertEqual(len(array), len(vectors))
+        for v, w in zip(array, vectors):
+            for c, d in zip(v, w):
+                self.assertAlmostEqual(c, d)
+
+    def test_conversion(self):
+        self.assertEqual(len(self.a), 3)
+        self.assertEqual(self.a.asList(), [Vector3d(*c) for c in self.coords])
+        self.assertEqual(self.a[-1], Vector3d(3.0, 4.0, 0.0))
+        self.assertEqual(self.a[1:].asList(), self.a.asList()[1:])
+        self.assertEqual(Vector3dArray(self.a), self.a)
+        self.assertRaises(IndexError, lambda: self.a[3])
+        self.assertRaises(ValueError, Vector3dArray, [(1.0, 2.0)])
+        # each row must have the right number of coordinates, even when
+        # they add up to whole vectors
+        self.assertRaises(ValueError, Vector3dArray, [(1, 2), (3, 4), (5, 6)])
+        self.assertRaises(ValueError, Vector2dArray, [Vector3d(1, 2, 3),
+            Vector3d(4, 5, 6)])
+        # arrays and point sets keep their own dimension
+        self.assertRaises(ValueError, Vector2dArray, self.a)
+        self.assertRaises(ValueError, vectors.pack, PointSet(self.coords), 2)
+        self.assertEqual(len(vectors.pack(PointSet(self.coords), 3)), 9)
+
+    def test_elementwise(self):
+        added = [[c + d for c, d in zip(v, w)]
+                for v, w in zip(self.coords, self.others)]
+        self.assertVectorsAlmostEqual(self.a + self.b, added)
+        self.assertVectorsAlmostEqual(self.a + self.b - self.b, self.coords)
+        self.assertVectorsAlmostEqual(self.a - Vector3d(1.0, 0.0, 0.0),
+                [(0, 0, 0), (-1, 2, 0), (2, 4, 0)])
+        self.assertVectorsAlmostEqual(self.a * 2, [(2, 0, 0), (0, 4, 0),
+            (6, 8, 0)])
+        self.assertRaises(ValueError, lambda: self.a + self.b[1:])
+
+    def test_products(self):
+        self.assertEqual(list(self.a.dot(self.b)), [0.0, 0.0, 7.0])
+        self.assertEqual(list(self.a * self.b), [0.0, 0.0, 7.0])
+        crossed = [Vector3d(*v).cross(Vector3d(*w))
+                for v, w in zip(self.coords, self.others)]
+        self.assertVectorsAlmostEqual(self.a.cross(self.b), crossed)
+        self.assertVectorsAlmostEqual(self.a.cross(Vector3d(0, 0, 1)),
+                [(0, -1, 0), (2, 0, 0), (4, -3, 0)])
+
+    def test_lengths_and_angles(self):
+        self.assertEqual(list(self.a.length), [1.0, 2.0, 5.0])
+        for length in self.a.normalized().length:
+            self.assertAlmostEqual(length, 1.0)
+        angles = self.a.angleTo(self.b)
+        for angle, v, w in zip(angles, self.coords, self.others):
+            self.assertAlmostEqual(angle, Vector3d(*v).angleTo(Vector3d(*w)))
+        self.assertAlmostEqual(self.a.angleTo(Vector3d(1, 0, 0))[1],
+                math.pi / 2)
+        zero = Vector3dArray([(0, 0, 0)])
+        self.assertRaises(ZeroDivisionError, zero.normalized)
+
+    def test_vector2d_array(self):
+        a = Vector2dArray([Vector2d(3, 4), Vector2d(-6, -8)])
+        self.assertEqual(list(a.length), [5.0, 10.0])
+        self.assertEqual(a[1], Vector2d(-6.0, -8.0))
+        self.assertAlmostEqual(a.angleTo(Vector2d(3, 4))[1], math.pi)
+
+
+class TestVectorArraysWithoutNumpy(TestVectorArrays):
+    """Runs the same tests against the pure python fallback"""
+
+    def setUp(self):
+        self.numpy = vectors.numpy
+        vectors.numpy = None
+        TestVectorArrays.setUp(self)
+
+    def tearDown(self):
+        vectors.numpy = self.numpy